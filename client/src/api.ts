@@ -19,10 +19,38 @@ axiosAuthorizedApi.interceptors.request.use((config) => {
   return config;
 });
 
+// Новый access-токен по refresh-токену; false, если получить не удалось
+export const refreshAccessToken = async (): Promise<boolean> => {
+  const refresh = localStorage.getItem("refresh");
+  if (!refresh) {
+    return false;
+  }
+  try {
+    const response = await axiosApi.post<{ access: string }>(
+      "/api/token/refresh/",
+      { refresh },
+    );
+    localStorage.setItem("token", response.data.access);
+    return true;
+  } catch {
+    localStorage.removeItem("refresh");
+    return false;
+  }
+};
+
+// Access-токен живёт недолго: при 401 получаем новый по refresh-токену
+// и один раз повторяем запрос
 axiosAuthorizedApi.interceptors.response.use(
   (response) => response,
-  (error) => {
-    if (error.response.status === 401) {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && !request._retried) {
+      request._retried = true;
+      if (await refreshAccessToken()) {
+        return axiosAuthorizedApi(request);
+      }
+    }
+    if (error.response?.status === 401) {
       localStorage.removeItem("token");
     }
   },
@@ -40,9 +68,10 @@ type ChangePasswordRequest = {
   new_password: string;
 };
 
+// Смена пароля отзывает все старые токены и возвращает новые
 const changePassword = async (
   credentials: ChangePasswordRequest,
-): Promise<unknown> => {
+): Promise<LoginResponse> => {
   const response = await axiosAuthorizedApi.post(
     "/api/change-password/",
     credentials,
@@ -54,7 +83,9 @@ export const useChangePassword = (onSuccess?: () => void) => {
   const { message } = App.useApp();
   return useMutation({
     mutationFn: changePassword,
-    onSuccess: () => {
+    onSuccess: (tokens) => {
+      localStorage.setItem("token", tokens.access);
+      localStorage.setItem("refresh", tokens.refresh);
       message.success("Пароль успешно изменен");
       onSuccess?.();
     },
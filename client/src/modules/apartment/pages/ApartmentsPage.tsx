@@ -1,11 +1,16 @@
-import { Empty, Skeleton, Typography } from "antd";
+import { Button, Empty, Skeleton, Typography } from "antd";
 import { Layout } from "@/components/Layout";
 import { ApartmentItemCard } from "@/modules/application/pages/ProfilePage";
 import { useGetApartments } from "@/modules/application/pages/apartments";
 
 export const ApartmentsPage = () => {
-  const { data: apartments, isLoading: isApartmentsLoading } =
-    useGetApartments();
+  const {
+    data: apartments,
+    isLoading: isApartmentsLoading,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useGetApartments();
 
   if (isApartmentsLoading) {
     return (
@@ -41,12 +46,24 @@ export const ApartmentsPage = () => {
             id={item.id}
             isLiked={false}
             title={item.address}
-            price={`от ${item.apartment_types[0]?.cost_per_square_meter} ₸/м²`}
+            price={`от ${item.min_cost_per_square_meter ?? "—"} ₸/м²`}
             label={item.name}
-            image={item.images[0]}
+            image={item.thumbnail ?? ""}
           />
         ))}
       </div>
+
+      {hasNextPage && (
+        <div className="mt-5 flex justify-center">
+          <Button
+            size="large"
+            loading={isFetchingNextPage}
+            onClick={() => fetchNextPage()}
+          >
+            Показать ещё
+          </Button>
+        </div>
+      )}
     </Layout>
   );
 };
@@ -1,7 +1,10 @@
 import { MessageOutlined } from "@ant-design/icons";
 import { App, Button, Typography, Upload } from "antd";
 import { FC } from "react";
-import { axiosAuthorizedApi } from "@/api";
+import {
+  UploadResult,
+  uploadDirect,
+} from "@/modules/application/pages/upload";
 
 const { Title } = Typography;
 
@@ -9,37 +12,24 @@ const { Dragger } = Upload;
 
 interface DocumentUploadProps {
   onSubmit: () => void;
-  setDocumentLink: (documentLink: string) => void;
+  setDocument: (document: UploadResult) => void;
 }
 
 export const DocumentUpload: FC<DocumentUploadProps> = ({
   onSubmit,
-  setDocumentLink,
+  setDocument,
 }) => {
   const { message } = App.useApp();
   const customUploadRequest = async (options: any) => {
     const { onSuccess, onError, file, onProgress } = options;
 
-    const formData = new FormData();
-    const config = {
-      headers: { "content-type": "multipart/form-data" },
-      onUploadProgress: (event: any) => {
-        onProgress({ percent: (event.loaded / event.total) * 100 });
-      },
-    };
-
     try {
-      formData.append("file", file);
-      const res = await axiosAuthorizedApi.post<{ path: string }>(
-        `/api/upload/`,
-        formData,
-        config,
+      const res = await uploadDirect(file, (percent) =>
+        onProgress({ percent }),
       );
 
-      const resumeLink = res.data.path;
-
-      onSuccess(resumeLink);
-      setDocumentLink(resumeLink);
+      onSuccess(res.path);
+      setDocument(res);
       message.success("Документ успешно загружен");
     } catch (updateError) {
       console.log("updateError", updateError);
@@ -10,6 +10,7 @@ import { ConfirmationWait } from "../components/ConfirmationWait";
 import { DocumentUpload } from "../components/DocumentUpload";
 import { MockEspModal } from "../components/MockEspModal";
 import { useCreateApplication } from "./application";
+import { UploadResult } from "./upload";
 
 const { Title } = Typography;
 
@@ -39,7 +40,8 @@ export const ApplicationSignPage: FC<ApplicationSignPageProps> = ({}) => {
   const [isAgree, setIsAgree] = useState<boolean | null>(null);
   const { message } = App.useApp();
   const [loading, setLoading] = useState(false);
-  const [documentLink, setDocumentLink] = useState<string | null>(null);
+  const [uploadedDocument, setUploadedDocument] =
+    useState<UploadResult | null>(null);
   const [createdApplication, setCreatedApplication] =
     useState<Application | null>(getFromLocalStorage("application"));
 
@@ -66,24 +68,25 @@ export const ApplicationSignPage: FC<ApplicationSignPageProps> = ({}) => {
       ) : step === 2 ? (
         <DocumentUpload
           onSubmit={() => {
-            if (!documentLink) {
+            if (!uploadedDocument) {
               message.error("Необходимо загрузить документ");
               return;
             }
             setStep(3);
             navigate(`${location.pathname}?step=3`, { replace: true });
           }}
-          setDocumentLink={setDocumentLink}
+          setDocument={setUploadedDocument}
         />
       ) : step === 3 ? (
         <ConfirmationWait
           onSubmit={() => {
-            if (!documentLink) {
+            if (!uploadedDocument) {
               message.error("Необходимо загрузить документ");
               return;
             }
             createApplication({
-              document_url: `${import.meta.env.VITE_API_URL}/media/${documentLink}`,
+              document: uploadedDocument.id,
+              document_url: `${import.meta.env.VITE_API_URL}/media/${uploadedDocument.path}`,
               creation_date: new Date().toISOString().split("T")[0],
             });
           }}
@@ -11,6 +11,7 @@ import { FC, useEffect, useState } from "react";
 import { Outlet, useLocation, useNavigate } from "react-router-dom";
 import { Footer } from "@/components/Footer";
 import { Header } from "@/components/Header";
+import { useApplicationUpdates } from "./realtime";
 
 type MenuItem = Required<MenuProps>["items"][number];
 
@@ -19,6 +20,7 @@ interface PersonalCabinetLayoutProps {}
 export const PersonalCabinetLayout: FC<PersonalCabinetLayoutProps> = ({}) => {
   const navigate = useNavigate();
   const { modal } = App.useApp();
+  useApplicationUpdates();
   const items: MenuItem[] = [
     {
       key: "profile",
@@ -54,6 +56,7 @@ export const PersonalCabinetLayout: FC<PersonalCabinetLayoutProps> = ({}) => {
           content: "Вы уверены, что хотите выйти?",
           onOk: () => {
             localStorage.removeItem("token");
+            localStorage.removeItem("refresh");
             navigate("/login");
           },
         });
@@ -69,7 +69,12 @@ const NoApplicationFound = () => {
 };
 
 export const ProfilePage = () => {
-  const { data: apartments } = useGetApartments();
+  const {
+    data: apartments,
+    hasNextPage,
+    fetchNextPage,
+    isFetchingNextPage,
+  } = useGetApartments();
   const { data: applications, isLoading } = useGetApplications();
   const [debouncedLoading, setDebouncedLoading] = useState(true);
   const { data: profile, isLoading: isProfileLoading } = useGetProfile();
@@ -152,11 +157,20 @@ export const ProfilePage = () => {
                 id={item.id}
                 isLiked={false}
                 title={item.address}
-                price={`от ${item.apartment_types[0]?.cost_per_square_meter} ₸/м²`}
+                price={`от ${item.min_cost_per_square_meter ?? "—"} ₸/м²`}
                 label={item.name}
-                image={item.images[0]}
+                image={item.thumbnail ?? ""}
               />
             ))}
+            {hasNextPage && (
+              <Button
+                className="shrink-0 self-center"
+                loading={isFetchingNextPage}
+                onClick={() => fetchNextPage()}
+              >
+                Показать ещё
+              </Button>
+            )}
           </div>
         </div>
       </div>
@@ -1,16 +1,33 @@
-import { useQuery } from "@tanstack/react-query";
+import { useInfiniteQuery, useQuery } from "@tanstack/react-query";
 import { axiosAuthorizedApi } from "@/api";
-import { Apartment } from "@/types";
+import { Apartment, ApartmentListItem, CursorPage } from "@/types";
 
-const getApartments = async () => {
-  const response = await axiosAuthorizedApi.get("/api/apartments/");
+const getApartments = async (cursor: string | null) => {
+  const response = await axiosAuthorizedApi.get<
+    CursorPage<ApartmentListItem>
+  >("/api/apartments/", { params: cursor ? { cursor } : undefined });
   return response.data;
 };
 
+// Сервер отдаёт каталог страницами по курсору (apartments/pagination.py):
+// из ссылки next нужен только сам курсор, адрес API задан в axios
+const nextCursor = (page: CursorPage<ApartmentListItem>) =>
+  page.next ? new URL(page.next).searchParams.get("cursor") : null;
+
+// Страницы подгружаются по fetchNextPage, data — все загруженные квартиры
 export const useGetApartments = () => {
-  return useQuery<Apartment[]>({
+  return useInfiniteQuery<
+    CursorPage<ApartmentListItem>,
+    Error,
+    ApartmentListItem[],
+    string[],
+    string | null
+  >({
     queryKey: ["apartments"],
-    queryFn: () => getApartments(),
+    queryFn: ({ pageParam }) => getApartments(pageParam),
+    initialPageParam: null,
+    getNextPageParam: nextCursor,
+    select: (data) => data.pages.flatMap((page) => page.results),
   });
 };
 
@@ -0,0 +1,101 @@
+import { useQueryClient } from "@tanstack/react-query";
+import { useEffect } from "react";
+import { refreshAccessToken } from "@/api";
+
+// Сервер (apartments/realtime.py) говорит на Socket.IO только через
+// websocket, поэтому хватает нескольких типов пакетов протокола Engine.IO 4
+const OPEN = "0";
+const PING = "2";
+const PONG = "3";
+const MESSAGE = "4";
+const SOCKET_CONNECT = "0";
+const SOCKET_EVENT = "2";
+const SOCKET_CONNECT_ERROR = "4";
+
+const MAX_RECONNECT_DELAY = 30000;
+
+const socketURL = () => {
+  const url = new URL(import.meta.env.VITE_API_URL, window.location.href);
+  url.protocol = url.protocol === "https:" ? "wss:" : "ws:";
+  url.pathname = url.pathname.replace(/\/$/, "") + "/socket.io/";
+  url.search = "?EIO=4&transport=websocket";
+  return url.toString();
+};
+
+// Держит соединение с сервером, пока смонтирован компонент, и перечитывает
+// список заявок, когда сервер сообщает об изменении одной из них
+export const useApplicationUpdates = () => {
+  const queryClient = useQueryClient();
+
+  useEffect(() => {
+    let socket: WebSocket | null = null;
+    let timer: ReturnType<typeof setTimeout> | undefined;
+    let attempts = 0;
+    let refreshed = false;
+    let stopped = false;
+
+    const reconnect = (delay?: number) => {
+      if (stopped) {
+        return;
+      }
+      clearTimeout(timer);
+      timer = setTimeout(
+        connect,
+        delay ?? Math.min(1000 * 2 ** attempts++, MAX_RECONNECT_DELAY),
+      );
+    };
+
+    const onEvent = (name: string) => {
+      if (name === "application" || name === "application_deleted") {
+        queryClient.invalidateQueries({ queryKey: ["applications"] });
+      } else if (name === "tokens_revoked") {
+        // Пароль сменили: подключаемся заново с новым токеном
+        socket?.close();
+      }
+    };
+
+    const onMessage = async ({ data }: MessageEvent<string>) => {
+      if (data === PING) {
+        socket?.send(PONG);
+      } else if (data.startsWith(OPEN)) {
+        const token = localStorage.getItem("token");
+        socket?.send(MESSAGE + SOCKET_CONNECT + JSON.stringify({ token }));
+      } else if (data.startsWith(MESSAGE + SOCKET_CONNECT)) {
+        attempts = 0;
+        refreshed = false;
+      } else if (data.startsWith(MESSAGE + SOCKET_EVENT)) {
+        const [name] = JSON.parse(data.slice(2));
+        onEvent(name);
+      } else if (data.startsWith(MESSAGE + SOCKET_CONNECT_ERROR)) {
+        // Токен истёк: обновляем его один раз, иначе ждём как при обрыве
+        const closed = socket;
+        if (closed) {
+          closed.onclose = null;
+          closed.close();
+        }
+        if (!refreshed && (await refreshAccessToken())) {
+          refreshed = true;
+          reconnect(0);
+        } else {
+          reconnect();
+        }
+      }
+    };
+
+    const connect = () => {
+      if (!localStorage.getItem("token")) {
+        return;
+      }
+      socket = new WebSocket(socketURL());
+      socket.onmessage = onMessage;
+      socket.onclose = () => reconnect();
+    };
+
+    connect();
+    return () => {
+      stopped = true;
+      clearTimeout(timer);
+      socket?.close();
+    };
+  }, [queryClient]);
+};
@@ -0,0 +1,139 @@
+import axios, { isAxiosError } from "axios";
+import { axiosAuthorizedApi } from "@/api";
+
+// Должен быть не больше UPLOAD_CHUNK_MAX_SIZE на сервере
+const CHUNK_SIZE = 4 * 1024 * 1024;
+const MAX_RETRIES = 5;
+
+export type UploadResult = {
+  id: number;
+  file_url: string;
+  path: string;
+};
+
+type UploadSession = {
+  id: string;
+  received: number;
+  file: UploadResult | null;
+};
+
+const sha256 = async (file: File): Promise<string> => {
+  const digest = await crypto.subtle.digest(
+    "SHA-256",
+    await file.arrayBuffer(),
+  );
+  return Array.from(new Uint8Array(digest))
+    .map((byte) => byte.toString(16).padStart(2, "0"))
+    .join("");
+};
+
+const wait = (ms: number) => new Promise((resolve) => setTimeout(resolve, ms));
+
+// После обрыва связи спрашиваем сервер, сколько байт он уже получил
+const getReceived = async (id: string): Promise<number> => {
+  const response = await axiosAuthorizedApi.get<UploadSession>(
+    `/api/uploads/${id}/`,
+  );
+  return response.data.received;
+};
+
+/**
+ * Загружает файл частями через /api/uploads/. При ошибке сети часть
+ * повторяется с того места, до которого её успел принять сервер.
+ */
+export const uploadResumable = async (
+  file: File,
+  onProgress?: (percent: number) => void,
+): Promise<UploadResult> => {
+  const session = await axiosAuthorizedApi.post<UploadSession>(
+    "/api/uploads/",
+    { filename: file.name, size: file.size, checksum: await sha256(file) },
+  );
+  // Такой файл уже загружался: сервер отдаёт его сразу, без передачи
+  if (session.data.file) {
+    onProgress?.(100);
+    return session.data.file;
+  }
+  const { id } = session.data;
+
+  let offset = 0;
+  let retries = 0;
+  while (offset < file.size) {
+    try {
+      const response = await axiosAuthorizedApi.put<UploadSession>(
+        `/api/uploads/${id}/chunk/`,
+        file.slice(offset, offset + CHUNK_SIZE),
+        {
+          params: { offset },
+          headers: { "content-type": "application/octet-stream" },
+        },
+      );
+      offset = response.data.received;
+      retries = 0;
+      onProgress?.((offset / file.size) * 100);
+    } catch (error) {
+      if (retries >= MAX_RETRIES) {
+        throw error;
+      }
+      retries += 1;
+      await wait(1000 * 2 ** retries);
+      offset =
+        isAxiosError(error) && error.response?.status === 409
+          ? error.response.data.received
+          : await getReceived(id);
+    }
+  }
+
+  const response = await axiosAuthorizedApi.post<UploadResult>(
+    `/api/uploads/${id}/finalize/`,
+  );
+  return response.data;
+};
+
+type DirectUpload = UploadSession & {
+  upload: {
+    method: string;
+    url: string;
+    headers: Record<string, string>;
+  } | null;
+};
+
+/**
+ * Загружает файл напрямую в хранилище по подписанной ссылке из
+ * /api/direct-uploads/ и подтверждает загрузку. Если передан
+ * applicationId, файл привязывается к заявке.
+ */
+export const uploadDirect = async (
+  file: File,
+  onProgress?: (percent: number) => void,
+  applicationId?: string,
+): Promise<UploadResult> => {
+  const session = await axiosAuthorizedApi.post<DirectUpload>(
+    "/api/direct-uploads/",
+    { filename: file.name, size: file.size, checksum: await sha256(file) },
+  );
+  // Такой файл уже загружался: передавать его не нужно
+  if (session.data.file) {
+    onProgress?.(100);
+    return session.data.file;
+  }
+  const { id, upload } = session.data;
+
+  if (upload) {
+    // Без Authorization: ссылка уже подписана, лишний заголовок S3 отвергнет
+    await axios.request({
+      method: upload.method,
+      url: upload.url,
+      data: file,
+      headers: upload.headers,
+      onUploadProgress: (event) =>
+        onProgress?.((event.loaded / (event.total || file.size)) * 100),
+    });
+  }
+
+  const response = await axiosAuthorizedApi.post<UploadResult>(
+    `/api/direct-uploads/${id}/confirm/`,
+    { application: applicationId },
+  );
+  return response.data;
+};
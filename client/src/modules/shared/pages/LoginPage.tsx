@@ -15,6 +15,7 @@ export default function LoginPage() {
       setIsLoading(true);
       const response = await login(values);
       localStorage.setItem("token", response.access);
+      localStorage.setItem("refresh", response.refresh);
       navigate("/profile");
     } catch (error) {
       console.error(error);
@@ -5,6 +5,23 @@ export interface LoginRequest {
 
 export interface LoginResponse {
   access: string;
+  refresh: string;
+}
+
+export interface CursorPage<T> {
+  next: string | null;
+  previous: string | null;
+  results: T[];
+}
+
+export interface ApartmentListItem {
+  id: string;
+  name: string;
+  address: string;
+  thumbnail: string | null;
+  min_price: number | null;
+  max_price: number | null;
+  min_cost_per_square_meter: number | null;
 }
 
 export interface Apartment {
@@ -54,6 +71,7 @@ export interface Application {
   status: string;
   creation_date: string;
   document_url: string;
+  document?: number | null;
 }
 
 export interface Profile {
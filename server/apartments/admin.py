@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.utils.html import format_html
 from django.db.models import JSONField
 from django_json_widget.widgets import JSONEditorWidget
-from .models import Apartment, Builder, UploadedFile, Application, UserProfile
+from . import images, search
+from .models import Apartment, ApartmentUnitType, Builder, UploadedFile, Application, UserProfile
 
 @admin.register(Builder)
 class BuilderAdmin(admin.ModelAdmin):
@@ -19,10 +20,17 @@ class BuilderAdmin(admin.ModelAdmin):
 class ApartmentTypeInline(admin.TabularInline):
     verbose_name = "Тип квартиры"
     verbose_name_plural = "Типы квартир"
-    model = None  # This is virtual, apartment_types is stored as JSONField
-    
+    model = ApartmentUnitType  # Read-only copy, the source of truth is the apartment_types JSONField
+    extra = 0
+    fields = ('label', 'room_count', 'min_area', 'max_area', 'cost_per_square_meter',
+              'available_count', 'min_price', 'max_price')
+    readonly_fields = fields
+
     def has_add_permission(self, request, obj=None):
         return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
     
     def has_delete_permission(self, request, obj=None):
         return False
@@ -34,6 +42,8 @@ class ApartmentAdmin(admin.ModelAdmin):
     }
 
     list_display = ('name', 'address', 'material', 'floor', 'builder', 'home_type')
+    list_select_related = ('builder',)
+    inlines = [ApartmentTypeInline]
     list_filter = ('material', 'home_type', 'builder', 'security', 'has_balcony')
     search_fields = ('name', 'address', 'description')
 
@@ -55,18 +65,26 @@ class ApartmentAdmin(admin.ModelAdmin):
         })
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # Полнотекстовый индекс вместо icontains по трём текстовым полям
+        if not search_term:
+            return queryset, False
+        return search.search(queryset, search_term), False
+
 @admin.register(UploadedFile)
 class UploadedFileAdmin(admin.ModelAdmin):
-    list_display = ('__str__', 'uploaded_at', 'file_preview', 'file_url')
+    list_display = ('__str__', 'user', 'uploaded_at', 'file_preview', 'file_url')
     readonly_fields = ('file', 'uploaded_at', 'file_preview', 'file_url')
     ordering = ('-uploaded_at',)
     
+    list_select_related = ('blob', 'user')
+
     def file_preview(self, obj):
-        file_url = obj.file.url
-        filename = obj.file.name.lower()
-        if filename.endswith(('.jpg', '.jpeg', '.png', '.gif')):
-            return format_html('<img src="{}" width="100" />', file_url)
-        return "Не изображение"
+        if not images.is_image(obj.file.name):
+            return "Не изображение"
+        # Уменьшенная копия, пока она не построена — оригинал
+        file_url = images.derivative_urls(obj.blob).get('thumbnail', obj.file.url)
+        return format_html('<img src="{}" width="100" loading="lazy" />', file_url)
     file_preview.short_description = "Превью"
     
     def file_url(self, obj):
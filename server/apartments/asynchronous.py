@@ -0,0 +1,169 @@
+"""
+Асинхронные read-эндпоинты для работы под ASGI (SERVER_MODE=asgi).
+
+Под ASGI синхронный view выполняется в отдельном потоке: Django выделяет
+его каждому запросу (ThreadSensitiveContext), и запрос медленного клиента
+занимает поток пула всё время обработки. AsyncReadMixin делает GET/HEAD
+view асинхронными: аутентификация по закэшированному токену, проверка прав
+и сериализация идут в цикле событий, запросы к БД — через асинхронный ORM
+(aget, aaggregate, async for), так что процесс uvicorn держит тысячи
+медленных клиентов, не держа поток на каждого.
+Остальные методы (POST, PUT, ...) выполняются прежним синхронным кодом DRF
+через sync_to_async.
+
+Асинхронный обработчик — корутина a<действие> (alist, aretrieve) для
+ViewSet'ов и a<метод> (aget) для APIView. Миксин ставится последним перед
+классом DRF, чтобы ConditionalGetMixin и CachedCatalogMixin оборачивали его
+alist/aretrieve так же, как list/retrieve.
+
+Под WSGI такие view тоже работают: Django выполняет их через async_to_sync.
+
+Потоковые ответы (выгрузка каталога, файлы) строятся синхронными
+генераторами, а синхронное тело StreamingHttpResponse Django под ASGI
+сначала целиком читает в память. streaming_content() отдаёт под ASGI
+асинхронный генератор, который берёт куски по одному в потоке.
+"""
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.core.exceptions import ValidationError
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404
+from rest_framework.response import Response
+
+ASYNC_METHODS = ('GET', 'HEAD')
+
+
+class AsyncReadMixin:
+    @classmethod
+    def as_view(cls, *args, **initkwargs):
+        sync_view = super().as_view(*args, **initkwargs)
+        actions = getattr(sync_view, 'actions', None)
+        handler = actions.get('get') if actions is not None else 'get'
+        if not handler or not iscoroutinefunction(getattr(cls, f'a{handler}', None)):
+            # Например, @action(detail=False) без асинхронной реализации
+            return sync_view
+        sync_handler = sync_to_async(sync_view)
+
+        @wraps(sync_view)
+        async def view(request, *args, **kwargs):
+            if request.method in ASYNC_METHODS:
+                # dispatch() вернёт корутину adispatch(), см. ниже
+                return await sync_view(request, *args, **kwargs)
+            return await sync_handler(request, *args, **kwargs)
+
+        return view
+
+    def _async_handler(self, method):
+        action_map = getattr(self, 'action_map', None)
+        if action_map is not None:
+            name = action_map.get(method)
+        else:
+            name = 'get' if method == 'head' else method
+        handler = getattr(self, f'a{name}', None) if name else None
+        return handler if iscoroutinefunction(handler) else None
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method in ASYNC_METHODS and self._async_handler(request.method.lower()):
+            return self.adispatch(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
+    async def adispatch(self, request, *args, **kwargs):
+        """То же, что APIView.dispatch, с асинхронными аутентификацией и обработчиком."""
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            # request.user уже известен, initial() не обращается к БД
+            self.initial(request, *args, **kwargs)
+            handler = self._async_handler(request.method.lower())
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """Request._authenticate() с aauthenticate(), если он есть у аутентификатора."""
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth_tuple = await authenticator.aauthenticate(request)
+                else:
+                    user_auth_tuple = await sync_to_async(authenticator.authenticate)(request)
+            except Exception:
+                request._not_authenticated()
+                raise
+            if user_auth_tuple is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth_tuple
+                return
+        request._not_authenticated()
+
+    async def afilter_queryset(self, queryset):
+        if not self.filter_backends:
+            return queryset
+        # Фильтры проверяют параметры запросами к БД (?builder= ищет застройщика)
+        return await sync_to_async(self.filter_queryset)(queryset)
+
+    async def aget_object(self):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        filter_kwargs = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**filter_kwargs)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+    async def alist(self, request, *args, **kwargs):
+        queryset = await self.afilter_queryset(self.get_queryset())
+        if self.paginator is not None:
+            # Пагинаторы DRF синхронны; выборка страницы выполняется в потоке
+            # БД через sync_to_async — так же исполняет запросы асинхронный ORM
+            page = await sync_to_async(self.paginate_queryset)(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer([obj async for obj in queryset], many=True)
+        return Response(serializer.data)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        instance = await self.aget_object()
+        serializer = self.get_serializer(instance)
+        return Response(serializer.data)
+
+
+async def _aiterate(iterator, thread_sensitive):
+    next_chunk = sync_to_async(next, thread_sensitive=thread_sensitive)
+    done = object()
+    try:
+        while (chunk := await next_chunk(iterator, done)) is not done:
+            yield chunk
+    finally:
+        # Клиент мог отключиться раньше: генератор закрывает файл или курсор
+        if hasattr(iterator, 'close'):
+            await sync_to_async(iterator.close, thread_sensitive=thread_sensitive)()
+
+
+def is_asgi(request):
+    """Запрос пришёл через ASGI (request — HttpRequest или Request DRF)."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+def streaming_content(request, iterator, thread_sensitive=True):
+    """
+    Тело StreamingHttpResponse: под ASGI — асинхронный генератор поверх
+    iterator, под WSGI — сам iterator. Итератор, читающий из БД, должен
+    выполняться в потоке соединения (thread_sensitive=True); чтение файла
+    можно вести в любом потоке пула.
+    """
+    if not is_asgi(request):
+        return iterator
+    return _aiterate(iter(iterator), thread_sensitive)
@@ -0,0 +1,306 @@
+"""
+JWT-аутентификация без запросов к БД в установившемся режиме.
+
+JWTAuthentication из simplejwt на каждый запрос проверяет подпись токена и
+загружает User, а profile_view затем отдельно загружает UserProfile.
+CachedJWTAuthentication хранит в памяти процесса два LRU-кэша с TTL:
+проверенный токен (по его строке) и снимок пользователя вместе с профилем
+(по id). Повторные запросы с тем же токеном не делают запросов к БД.
+
+Снимок пользователя сбрасывается сигналами при сохранении и удалении User
+и UserProfile (в том числе при смене пароля). Изменения в обход сигналов
+(QuerySet.update) и изменения в других процессах видны не позже чем через
+JWT_AUTH_CACHE_TTL секунд.
+
+Отзыв токенов. Access-токены короткие, новые выдаются по refresh-токену.
+Каждый токен несёт версию UserProfile.token_version; revoke_tokens()
+увеличивает её, и токены со старой версией отклоняются. Версия берётся из
+снимка пользователя, поэтому проверка не стоит запроса к БД. Чтобы другие
+воркеры gunicorn узнали об отзыве, revoke_tokens() увеличивает общую эпоху
+отзыва в кэше AUTH_CACHE_ALIAS; каждый процесс сверяет её не чаще раза в
+AUTH_REVOCATION_SYNC_INTERVAL секунд и при изменении сбрасывает снимки.
+
+Вход (login_view) проходит через ProfileModelBackend: пользователь
+загружается вместе с профилем, и версия токенов для новой пары не стоит
+отдельного запроса.
+
+Для асинхронных view (asynchronous.py) есть aauthenticate(): при попадании
+в кэш он не уходит из цикла событий, промах загружает пользователя через
+асинхронный ORM.
+"""
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import caches
+from django.db.models import F
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from .models import UserProfile
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш ограниченного размера с временем жизни записей."""
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires = item
+            if expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+tokens = LRUCache(getattr(settings, 'JWT_AUTH_CACHE_SIZE', 10000), getattr(settings, 'JWT_AUTH_CACHE_TTL', 60))
+users = LRUCache(getattr(settings, 'JWT_AUTH_CACHE_SIZE', 10000), getattr(settings, 'JWT_AUTH_CACHE_TTL', 60))
+
+
+TOKEN_VERSION_CLAIM = 'ver'
+EPOCH_KEY = 'auth:revocation-epoch'
+
+
+class _RevocationSync:
+    epoch = None
+    checked_at = float('-inf')
+
+
+def invalidate_user(user_id):
+    users.delete(user_id)
+
+
+def clear():
+    tokens.clear()
+    users.clear()
+    _RevocationSync.epoch = None
+    _RevocationSync.checked_at = float('-inf')
+
+
+def get_shared_cache():
+    return caches[getattr(settings, 'AUTH_CACHE_ALIAS', 'default')]
+
+
+def _revocation_check_due():
+    now = time.monotonic()
+    if now - _RevocationSync.checked_at < getattr(settings, 'AUTH_REVOCATION_SYNC_INTERVAL', 1):
+        return False
+    _RevocationSync.checked_at = now
+    return True
+
+
+def _apply_epoch(epoch):
+    if epoch != _RevocationSync.epoch:
+        users.clear()
+        _RevocationSync.epoch = epoch
+
+
+def sync_revocations():
+    """
+    Сбрасывает снимки пользователей, если в другом процессе отзывали токены.
+    Общий кэш читается не чаще раза в AUTH_REVOCATION_SYNC_INTERVAL секунд.
+    """
+    if _revocation_check_due():
+        _apply_epoch(get_shared_cache().get(EPOCH_KEY, 0))
+
+
+async def async_sync_revocations():
+    if _revocation_check_due():
+        _apply_epoch(await get_shared_cache().aget(EPOCH_KEY, 0))
+
+
+def cached_profile(user):
+    """Профиль, загруженный вместе с пользователем, или None."""
+    return user._state.fields_cache.get('profile')
+
+
+def _token_version(user):
+    profile = cached_profile(user)
+    return profile.token_version if profile is not None else 0
+
+
+class ProfileModelBackend(ModelBackend):
+    """
+    ModelBackend, загружающий пользователя вместе с профилем одним запросом:
+    tokens_for_user берёт версию токенов из него, и вход стоит один запрос.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        user_model = get_user_model()
+        if username is None:
+            username = kwargs.get(user_model.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        try:
+            user = user_model._default_manager.select_related('profile').get(
+                **{user_model.USERNAME_FIELD: username})
+        except user_model.DoesNotExist:
+            # Хэширование и для несуществующего пользователя: время ответа
+            # не выдаёт, есть ли такое имя
+            user_model().set_password(password)
+            return None
+        if user.check_password(password) and self.user_can_authenticate(user):
+            return user
+        return None
+
+
+def tokens_for_user(user):
+    """Пара refresh/access-токенов с текущей версией токенов пользователя."""
+    refresh = RefreshToken.for_user(user)
+    if 'profile' in user._state.fields_cache:
+        version = _token_version(user)
+    else:
+        version = UserProfile.objects.get(user=user).token_version
+    # Access-токен копирует claim из refresh-токена
+    refresh[TOKEN_VERSION_CLAIM] = version
+    return refresh
+
+
+def revoke_tokens(user):
+    """Отзывает все выданные пользователю токены (смена пароля, выход отовсюду)."""
+    UserProfile.objects.filter(user=user).update(token_version=F('token_version') + 1)
+    profile = cached_profile(user)
+    if profile is not None:
+        # Новую пару для этого же экземпляра выдаёт tokens_for_user
+        profile.refresh_from_db(fields=['token_version'])
+    invalidate_user(user.pk)
+    cache = get_shared_cache()
+    cache.add(EPOCH_KEY, 0, timeout=None)
+    try:
+        cache.incr(EPOCH_KEY)
+    except ValueError:
+        # Ключ мог быть вытеснен между add и incr
+        cache.set(EPOCH_KEY, 1, timeout=None)
+
+
+def refresh_access_token(raw_token):
+    """
+    Новый access-токен по refresh-токену. TokenError — токен неверен или
+    истёк, AuthenticationFailed — пользователь неактивен или токен отозван.
+    """
+    refresh = RefreshToken(raw_token)
+    sync_revocations()
+    CachedJWTAuthentication().get_user(refresh)
+    return refresh.access_token
+
+
+def _snapshot(user):
+    """
+    Копия закэшированного пользователя для одного запроса: view может менять
+    request.user (например, пароль), и это не должно попасть в кэш.
+    """
+    copied = copy.copy(user)
+    # Профиль, загруженный через select_related, лежит в кэше связей экземпляра
+    profile = cached_profile(user)
+    if profile is not None:
+        profile = copy.copy(profile)
+        copied._state.fields_cache['profile'] = profile
+        profile._state.fields_cache['user'] = copied
+    return copied
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def authenticate(self, request):
+        sync_revocations()
+        return super().authenticate(request)
+
+    async def aauthenticate(self, request):
+        await async_sync_revocations()
+        header = self.get_header(request)
+        if header is None:
+            return None
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    def get_validated_token(self, raw_token):
+        validated_token = tokens.get(raw_token)
+        if validated_token is None:
+            validated_token = super().get_validated_token(raw_token)
+            # Токен не должен пережить в кэше собственный срок действия
+            tokens.set(raw_token, validated_token, ttl=validated_token['exp'] - time.time())
+        return validated_token
+
+    def _user_lookup(self, validated_token):
+        try:
+            return {api_settings.USER_ID_FIELD: validated_token[api_settings.USER_ID_CLAIM]}
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = users.get(user_id)
+        if user is None:
+            try:
+                # Профиль загружается тем же запросом
+                user = self.user_model.objects.select_related('profile').get(**self._user_lookup(validated_token))
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            users.set(user_id, user)
+        return self._check_user(user, validated_token)
+
+    async def aget_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        user = users.get(user_id)
+        if user is None:
+            try:
+                user = await self.user_model.objects.select_related('profile').aget(
+                    **self._user_lookup(validated_token))
+            except self.user_model.DoesNotExist:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            users.set(user_id, user)
+        return self._check_user(user, validated_token)
+
+    def _check_user(self, user, validated_token):
+        # Те же проверки, что в JWTAuthentication.get_user; пользователь из кэша
+        # проверяется заново, так как токен мог быть выдан до смены пароля
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and (
+                validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password)):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        # Токены, выданные до появления версий, считаются версией 0
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != _token_version(user):
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        return _snapshot(user)
@@ -0,0 +1,168 @@
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.response import Response
+
+from baspana_project.metrics import CACHE_REQUESTS
+
+from .conditional import VALIDATOR_HEADERS
+
+STATS_KEYS = ('hits', 'misses')
+
+
+def get_cache():
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_version_cache():
+    """
+    Кэш номеров версий. Ответы могут лежать в памяти каждого воркера, но
+    версии должны быть общими: иначе инвалидация видна только процессу,
+    обработавшему запись, а остальные отдают старый каталог до TIMEOUT.
+    """
+    return caches[getattr(settings, 'CATALOG_VERSION_CACHE_ALIAS', getattr(settings, 'CATALOG_CACHE_ALIAS', 'default'))]
+
+
+def _version_key(namespace):
+    return f'catalog:version:{namespace}'
+
+
+def _incr(cache, key):
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключ мог быть вытеснен между add и incr
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+async def _aincr(cache, key):
+    await cache.aadd(key, 0, timeout=None)
+    try:
+        return await cache.aincr(key)
+    except ValueError:
+        await cache.aset(key, 1, timeout=None)
+        return 1
+
+
+def invalidate(namespace):
+    """
+    Сбрасывает все закэшированные ответы пространства имён.
+
+    Ключи не перечисляются и не удаляются: увеличивается номер версии,
+    входящий в каждый ключ, а старые записи вытесняются по TIMEOUT.
+    Так инвалидация работает одинаково для любого бэкенда кэша.
+    """
+    _incr(get_version_cache(), _version_key(namespace))
+
+
+def record(outcome):
+    _incr(get_cache(), f'catalog:stats:{outcome}')
+    CACHE_REQUESTS.labels(outcome).inc()
+
+
+async def arecord(outcome):
+    await _aincr(get_cache(), f'catalog:stats:{outcome}')
+    CACHE_REQUESTS.labels(outcome).inc()
+
+
+def get_stats():
+    cache = get_cache()
+    values = cache.get_many([f'catalog:stats:{name}' for name in STATS_KEYS])
+    stats = {name: values.get(f'catalog:stats:{name}', 0) for name in STATS_KEYS}
+    total = stats['hits'] + stats['misses']
+    stats['hit_ratio'] = stats['hits'] / total if total else 0.0
+    return stats
+
+
+class CachedCatalogMixin:
+    """
+    Read-through кэш для list/retrieve каталожных ViewSet'ов.
+
+    Ответ кэшируется целиком (сериализованные данные и валидаторы
+    ETag/Last-Modified) по ключу из версий cache_namespaces, действия,
+    аргументов URL и query-параметров.
+    Версии сбрасываются сигналами post_save/post_delete (см. signals.py).
+    alist/aretrieve — то же для асинхронных view (см. asynchronous.py).
+    """
+    cache_namespaces = ()
+
+    def _cache_key_from(self, request, version_keys, versions):
+        params = urlencode(sorted(request.query_params.lists()), doseq=True)
+        raw = '|'.join([
+            self.basename,
+            self.action,
+            urlencode(sorted(self.kwargs.items())),
+            params,
+            *(f'{key}={versions.get(key, 0)}' for key in version_keys),
+        ])
+        return 'catalog:response:' + hashlib.md5(raw.encode()).hexdigest()
+
+    def _cache_key(self, request):
+        version_keys = [_version_key(namespace) for namespace in self.cache_namespaces]
+        return self._cache_key_from(request, version_keys, get_version_cache().get_many(version_keys))
+
+    async def _acache_key(self, request):
+        version_keys = [_version_key(namespace) for namespace in self.cache_namespaces]
+        return self._cache_key_from(request, version_keys, await get_version_cache().aget_many(version_keys))
+
+    def _hit(self, entry):
+        data, headers = entry
+        response = Response(data)
+        for name, value in headers.items():
+            response[name] = value
+        response['X-Cache'] = 'HIT'
+        return response
+
+    def _entry(self, response):
+        # Валидаторы ConditionalGetMixin кэшируются вместе с телом: иначе
+        # ETag и закэшированный ответ могли бы относиться к разным снимкам
+        if hasattr(self, 'set_validators'):
+            self.set_validators(response)
+        headers = {name: response[name] for name in VALIDATOR_HEADERS if response.has_header(name)}
+        return response.data, headers
+
+    def _cached_response(self, request, handler, *args, **kwargs):
+        cache = get_cache()
+        key = self._cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            record('hits')
+            return self._hit(entry)
+
+        record('misses')
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            cache.set(key, self._entry(response))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    async def _acached_response(self, request, handler, *args, **kwargs):
+        cache = get_cache()
+        key = await self._acache_key(request)
+        entry = await cache.aget(key)
+        if entry is not None:
+            await arecord('hits')
+            return self._hit(entry)
+
+        await arecord('misses')
+        response = await handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            await cache.aset(key, self._entry(response))
+        response['X-Cache'] = 'MISS'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(request, super().retrieve, *args, **kwargs)
+
+    async def alist(self, request, *args, **kwargs):
+        return await self._acached_response(request, super().alist, *args, **kwargs)
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return await self._acached_response(request, super().aretrieve, *args, **kwargs)
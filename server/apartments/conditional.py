@@ -0,0 +1,77 @@
+import hashlib
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+VALIDATOR_HEADERS = ('ETag', 'Last-Modified')
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы (ETag / Last-Modified) для list/retrieve.
+
+    Валидаторы выводятся из самого ответа, а не из отдельного запроса к БД:
+    ETag — хэш сериализованных данных, Last-Modified — максимум полей
+    last_modified_fields у строк, попавших в ответ (страницы или объекта).
+    CachedCatalogMixin хранит их вместе с телом, поэтому ответ из кэша и его
+    валидаторы относятся к одному снимку, а 304 на попадание в кэш не стоит
+    ни одного запроса. Если клиент прислал совпадающий If-None-Match или
+    If-Modified-Since, возвращается 304 Not Modified без тела.
+
+    alist/aretrieve — то же для асинхронных view (см. asynchronous.py).
+    """
+    last_modified_fields = ('updated_at',)
+    _last_modified = None
+
+    def _row_modified(self, instance):
+        timestamps = []
+        for field in self.last_modified_fields:
+            value = instance
+            for name in field.split('__'):
+                value = getattr(value, name, None)
+            if value is not None:
+                timestamps.append(value)
+        return max(timestamps, default=None)
+
+    def get_serializer(self, *args, **kwargs):
+        if args:
+            instances = args[0] if kwargs.get('many') else [args[0]]
+            timestamps = [ts for ts in map(self._row_modified, instances) if ts is not None]
+            self._last_modified = max(timestamps, default=None)
+        return super().get_serializer(*args, **kwargs)
+
+    def set_validators(self, response):
+        """Проставляет валидаторы свежему ответу 200, если их ещё нет."""
+        if response.status_code != 200 or response.has_header('ETag'):
+            return
+        # Время изменения входит в хэш: сохранение застройщика меняет ETag
+        # квартир, даже если сериализованные поля остались прежними
+        raw = json.dumps([self.request.get_full_path(), response.data, self._last_modified],
+                         cls=DjangoJSONEncoder, sort_keys=True)
+        response['ETag'] = quote_etag(hashlib.md5(raw.encode()).hexdigest())
+        if self._last_modified is not None:
+            response['Last-Modified'] = http_date(self._last_modified.timestamp())
+
+    def _conditional_response(self, request, response):
+        if response.status_code != 200:
+            return response
+        self.set_validators(response)
+        last_modified = parse_http_date_safe(response.get('Last-Modified', ''))
+        response = get_conditional_response(request, etag=response['ETag'], last_modified=last_modified,
+                                            response=response)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(request, super().list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(request, super().retrieve(request, *args, **kwargs))
+
+    async def alist(self, request, *args, **kwargs):
+        return self._conditional_response(request, await super().alist(request, *args, **kwargs))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        return self._conditional_response(request, await super().aretrieve(request, *args, **kwargs))
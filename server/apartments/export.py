@@ -0,0 +1,84 @@
+"""
+Потоковая выгрузка каталога квартир в CSV и NDJSON.
+
+Строки читаются из БД через .iterator(chunk_size=...) и сразу превращаются
+в текст, поэтому потребление памяти не зависит от размера каталога.
+Используется эндпоинтом /api/apartments/export/ и командой export_catalog.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+FORMATS = ('csv', 'ndjson')
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+DEFAULT_CHUNK_SIZE = 2000
+
+APARTMENT_FIELDS = [
+    'id', 'name', 'address', 'object_code', 'floor', 'building_count', 'material',
+    'start_date', 'end_date', 'description', 'has_balcony', 'is_balcony_glazed',
+    'building_start_date', 'home_type', 'bathroom_type', 'security', 'parking_type',
+    'elevator_type', 'images', 'available_programs', 'conditions', 'builder_id', 'builder_name',
+]
+UNIT_TYPE_FIELDS = [
+    'label', 'room_count', 'min_area', 'max_area', 'cost_per_square_meter',
+    'available_count', 'scheme_url',
+]
+
+
+def get_fieldnames(flatten_unit_types=False):
+    if flatten_unit_types:
+        return APARTMENT_FIELDS + [f'unit_{name}' for name in UNIT_TYPE_FIELDS]
+    return APARTMENT_FIELDS + ['apartment_types']
+
+
+def iter_rows(queryset, flatten_unit_types=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Выдаёт словари по одному на квартиру или, при flatten_unit_types,
+    по одному на каждый элемент apartment_types.
+    """
+    queryset = queryset.select_related('builder').order_by('pk')
+    for apartment in queryset.iterator(chunk_size=chunk_size):
+        row = {name: getattr(apartment, name) for name in APARTMENT_FIELDS if name != 'builder_name'}
+        row['builder_name'] = apartment.builder.name
+        if not flatten_unit_types:
+            row['apartment_types'] = apartment.apartment_types
+            yield row
+            continue
+        for unit_type in apartment.apartment_types or [{}]:
+            if not isinstance(unit_type, dict):
+                continue
+            yield {**row, **{f'unit_{name}': unit_type.get(name) for name in UNIT_TYPE_FIELDS}}
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows, fieldnames):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fieldnames)
+    for row in rows:
+        yield writer.writerow([
+            json.dumps(value, ensure_ascii=False, cls=DjangoJSONEncoder)
+            if isinstance(value, (list, dict)) else value
+            for value in (row.get(name) for name in fieldnames)
+        ])
+
+
+def iter_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_export(queryset, output_format='ndjson', flatten_unit_types=False, chunk_size=DEFAULT_CHUNK_SIZE):
+    rows = iter_rows(queryset, flatten_unit_types, chunk_size)
+    if output_format == 'csv':
+        return iter_csv(rows, get_fieldnames(flatten_unit_types))
+    return iter_ndjson(rows)
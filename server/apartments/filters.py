@@ -0,0 +1,66 @@
+from django_filters import rest_framework as filters
+from django_filters.constants import EMPTY_VALUES
+
+from . import search
+from .models import Apartment, ApartmentUnitType
+
+
+class ApartmentFilter(filters.FilterSet):
+    """
+    Фильтры каталога квартир.
+
+    Все поля фильтрации покрыты индексами (см. Apartment.Meta.indexes).
+    Диапазоны задаются как ?floor_min=&floor_max=,
+    ?start_date_after=&start_date_before=, ?end_date_after=&end_date_before=.
+
+    Фильтры rooms, price_min/price_max, area_min/area_max и available
+    применяются к ApartmentUnitType и должны выполняться для одного и того же
+    типа квартиры: ?rooms=2&price_max=30000000&area_min=60 вернёт ЖК,
+    в которых есть двухкомнатная квартира до 30 млн ₸ площадью от 60 м².
+
+    ?q= — полнотекстовый поиск по названию, адресу и описанию (см. search.py),
+    результаты сортируются по релевантности.
+    """
+    UNIT_TYPE_FILTERS = ('rooms', 'price_min', 'price_max', 'area_min', 'area_max', 'available')
+
+    floor = filters.RangeFilter()
+    start_date = filters.DateFromToRangeFilter()
+    end_date = filters.DateFromToRangeFilter()
+
+    rooms = filters.NumberFilter(field_name='room_count')
+    price_min = filters.NumberFilter(field_name='max_price', lookup_expr='gte')
+    price_max = filters.NumberFilter(field_name='min_price', lookup_expr='lte')
+    area_min = filters.NumberFilter(field_name='max_area', lookup_expr='gte')
+    area_max = filters.NumberFilter(field_name='min_area', lookup_expr='lte')
+    available = filters.BooleanFilter(method='filter_available')
+    q = filters.CharFilter(method='filter_search')
+
+    class Meta:
+        model = Apartment
+        fields = ['material', 'home_type', 'security', 'parking_type', 'builder',
+                  'floor', 'start_date', 'end_date']
+
+    def filter_available(self, queryset, name, value):
+        if value:
+            return queryset.filter(available_count__gt=0)
+        return queryset
+
+    def filter_search(self, queryset, name, value):
+        return search.search(queryset, value)
+
+    def filter_queryset(self, queryset):
+        unit_types = ApartmentUnitType.objects.all()
+        has_unit_type_filters = False
+        for name, value in self.form.cleaned_data.items():
+            if name in self.UNIT_TYPE_FILTERS:
+                if value not in EMPTY_VALUES:
+                    unit_types = self.filters[name].filter(unit_types, value)
+                    has_unit_type_filters = True
+            else:
+                queryset = self.filters[name].filter(queryset, value)
+        if has_unit_type_filters:
+            # Некоррелированный IN, а не EXISTS: для коррелированного подзапроса
+            # SQLite выбирает индекс (room_count, min_price) и просматривает его
+            # заново для каждой квартиры
+            queryset = queryset.filter(pk__in=unit_types.values('apartment_id'))
+        return queryset
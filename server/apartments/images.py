@@ -0,0 +1,98 @@
+"""
+Производные изображений: уменьшенные копии и WebP для загруженных картинок.
+
+Для каждого FileBlob с изображением строятся варианты из VARIANTS и
+сохраняются рядом с оригиналом (blobs/ab/cd/<sha256>.thumbnail.webp и т. д.).
+Пути записываются в FileBlob.derivatives, отдаются FileUploadSerializer
+и используются для превью в админке.
+
+Построение ставится в очередь фоновых задач (jobs.py) сигналом при
+создании FileBlob и выполняется воркером run_workers, а не в запросе
+загрузки. Пропущенные варианты строит команда generate_image_derivatives.
+"""
+import io
+import logging
+import os
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from . import jobs
+from .models import FileBlob
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.bmp', '.tif', '.tiff')
+# Имя варианта -> максимальная сторона в пикселях (None — исходный размер)
+VARIANTS = {
+    'thumbnail': 320,
+    'medium': 1280,
+    'webp': None,
+}
+WEBP_QUALITY = 80
+
+
+def is_image(name):
+    return os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS
+
+
+def variant_path(name, variant):
+    return f'{os.path.splitext(name)[0]}.{variant}.webp'
+
+
+def _render(image, max_size):
+    image = image.copy()
+    if max_size:
+        image.thumbnail((max_size, max_size), Image.Resampling.LANCZOS)
+    output = io.BytesIO()
+    image.save(output, 'WEBP', quality=WEBP_QUALITY, method=4)
+    return output.getvalue()
+
+
+def generate(blob):
+    """
+    Строит все варианты для blob и сохраняет их пути в blob.derivatives.
+    Файлы, которые не удалось открыть как изображение, пропускаются.
+    """
+    try:
+        with default_storage.open(blob.file.name, 'rb') as f:
+            image = Image.open(f)
+            image = ImageOps.exif_transpose(image)
+            image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as e:
+        logger.warning('Cannot build derivatives for %s: %s', blob.file.name, e)
+        return {}
+
+    derivatives = {}
+    for variant, max_size in VARIANTS.items():
+        name = variant_path(blob.file.name, variant if max_size else 'full')
+        # Имя определяется содержимым, поэтому готовый файл можно не пересобирать
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(_render(image, max_size)))
+        derivatives[variant] = name
+    FileBlob.objects.filter(pk=blob.pk).update(derivatives=derivatives)
+    blob.derivatives = derivatives
+    return derivatives
+
+
+@jobs.task('images.build_derivatives')
+def build_derivatives(blob_id):
+    blob = FileBlob.objects.filter(pk=blob_id).first()
+    # Blob мог быть удалён сборщиком мусора, пока задача ждала в очереди
+    if blob is not None:
+        generate(blob)
+
+
+def schedule(blob):
+    jobs.enqueue('images.build_derivatives', {'blob_id': blob.pk})
+
+
+def derivative_urls(blob, request=None):
+    if blob is None or not blob.derivatives:
+        return {}
+    urls = {}
+    for variant, name in blob.derivatives.items():
+        url = default_storage.url(name)
+        urls[variant] = request.build_absolute_uri(url) if request else url
+    return urls
@@ -0,0 +1,206 @@
+"""
+Пакетный импорт каталога (застройщики и квартиры) из CSV, JSON и NDJSON.
+
+Файл читается потоково, каждая запись проверяется правилами
+BuilderSerializer / ApartmentSerializer, а затем записи пачками
+сохраняются через bulk_create(update_conflicts=True) — upsert по
+естественному ключу (Builder.name, Apartment.object_code). Каждая пачка
+пишется в отдельной транзакции.
+
+bulk_create не вызывает сигналы, поэтому производные данные (типы квартир,
+поисковый индекс, кэш каталога) обновляются здесь же явно.
+"""
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from itertools import islice
+
+from django.db import transaction
+from rest_framework import serializers
+
+from . import cache, search
+from .models import Apartment, ApartmentUnitType, Builder
+from .serializers import ApartmentSerializer, BuilderSerializer
+
+FORMATS = ('csv', 'json', 'ndjson')
+DEFAULT_BATCH_SIZE = 1000
+JSON_READ_SIZE = 64 * 1024
+# Колонки CSV, в которых лежит JSON (так их пишет export.iter_csv)
+CSV_JSON_COLUMNS = ('images', 'available_programs', 'conditions', 'apartment_types')
+
+
+def detect_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension == 'jsonl':
+        return 'ndjson'
+    if extension not in FORMATS:
+        raise ValueError(f'Cannot detect format of {path}, pass it explicitly')
+    return extension
+
+
+def iter_json_array(stream, read_size=JSON_READ_SIZE):
+    """Потоково разбирает JSON-массив объектов, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+    while True:
+        # Пропускаем пробелы, запятые и скобки массива
+        while position < len(buffer) and buffer[position] in ' \t\r\n,[]':
+            if buffer[position] == '[':
+                started = True
+            position += 1
+        if position >= len(buffer):
+            if eof:
+                return
+            buffer = stream.read(read_size)
+            position = 0
+            eof = not buffer
+            continue
+        if not started:
+            raise ValueError('Expected a JSON array of objects')
+        try:
+            item, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+        position = end
+
+
+def iter_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_csv(stream):
+    for row in csv.DictReader(stream):
+        # Пустая ячейка означает «значение по умолчанию», а не пустую строку
+        row = {key: value for key, value in row.items() if value != ''}
+        for column in CSV_JSON_COLUMNS:
+            if column in row:
+                row[column] = json.loads(row[column])
+        yield row
+
+
+def iter_records(stream, input_format):
+    if input_format == 'csv':
+        return iter_csv(stream)
+    if input_format == 'json':
+        return iter_json_array(stream)
+    return iter_ndjson(stream)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class BuilderImportSerializer(BuilderSerializer):
+    class Meta(BuilderSerializer.Meta):
+        # Существующий застройщик с тем же именем обновляется, а не отклоняется
+        extra_kwargs = {'name': {'validators': []}}
+
+
+class ApartmentImportSerializer(ApartmentSerializer):
+    """
+    ApartmentSerializer без запросов к БД на каждую строку.
+
+    Застройщик задаётся builder_id или builder_name и ищется в словарях
+    context['builder_ids'] / context['builder_names'], загруженных заранее.
+    """
+    builder_id = serializers.IntegerField(required=False)
+    builder_name = serializers.CharField(required=False)
+
+    class Meta(ApartmentSerializer.Meta):
+        fields = ApartmentSerializer.Meta.fields + ['builder_name']
+        extra_kwargs = {'object_code': {'validators': []}}
+
+    def validate(self, attrs):
+        builder_id = attrs.pop('builder_id', None)
+        builder_name = attrs.pop('builder_name', None)
+        if builder_id is None and builder_name:
+            builder_id = self.context['builder_names'].get(builder_name)
+        if builder_id not in self.context['builder_ids']:
+            raise serializers.ValidationError({'builder_id': ['Застройщик не найден.']})
+        attrs['builder_id'] = builder_id
+        return attrs
+
+
+@dataclass
+class ImportResult:
+    rows: int = 0
+    saved: int = 0
+    errors: list = field(default_factory=list)
+
+
+def _validate(records, serializer_class, context, result, max_errors):
+    # Один экземпляр сериализатора на все строки, как в ListSerializer:
+    # построение полей ModelSerializer дороже самой проверки записи
+    serializer = serializer_class(context=context)
+    valid = []
+    for record in records:
+        result.rows += 1
+        try:
+            valid.append(serializer.run_validation(record))
+        except serializers.ValidationError as e:
+            if len(result.errors) < max_errors:
+                result.errors.append((result.rows, e.detail))
+    return valid
+
+
+def _dedupe(items, key):
+    # В одной пачке upsert не может дважды затронуть одну строку
+    return list({item[key]: item for item in items}.values())
+
+
+def import_builders(records, batch_size=DEFAULT_BATCH_SIZE, max_errors=100, on_batch=None):
+    result = ImportResult()
+    update_fields = [f for f in BuilderSerializer.Meta.fields if f != 'name'] + ['updated_at']
+    for batch in batched(records, batch_size):
+        rows = _dedupe(_validate(batch, BuilderImportSerializer, {}, result, max_errors), 'name')
+        with transaction.atomic():
+            Builder.objects.bulk_create(
+                [Builder(**data) for data in rows],
+                update_conflicts=True, unique_fields=['name'], update_fields=update_fields,
+            )
+        result.saved += len(rows)
+        if on_batch:
+            on_batch(result)
+    cache.invalidate('builders')
+    return result
+
+
+def import_apartments(records, batch_size=DEFAULT_BATCH_SIZE, max_errors=100, on_batch=None):
+    result = ImportResult()
+    builder_names = dict(Builder.objects.values_list('name', 'id'))
+    context = {'builder_names': builder_names, 'builder_ids': set(builder_names.values())}
+    update_fields = [
+        f.name for f in Apartment._meta.concrete_fields
+        if not f.primary_key and f.name != 'object_code'
+    ]
+    for batch in batched(records, batch_size):
+        rows = _dedupe(_validate(batch, ApartmentImportSerializer, context, result, max_errors), 'object_code')
+        with transaction.atomic():
+            Apartment.objects.bulk_create(
+                [Apartment(**data) for data in rows],
+                update_conflicts=True, unique_fields=['object_code'], update_fields=update_fields,
+            )
+            apartments = list(Apartment.objects.filter(object_code__in=[row['object_code'] for row in rows])
+                              .only('name', 'address', 'description', 'apartment_types'))
+            ApartmentUnitType.rebuild(apartments)
+            search.index_apartments(apartments)
+        result.saved += len(rows)
+        if on_batch:
+            on_batch(result)
+    cache.invalidate('apartments')
+    return result
@@ -0,0 +1,127 @@
+"""
+Очередь фоновых задач в БД.
+
+Задача — функция, зарегистрированная декоратором @task('имя'); enqueue()
+создаёт строку Job в текущей транзакции, поэтому воркер увидит задачу
+только после её фиксации (и не увидит, если транзакция откатится).
+
+Воркеры запускает команда run_workers. Задача забирается условным
+UPDATE ... WHERE status='queued', так что два воркера не возьмут одну
+задачу на любой СУБД. При ошибке задача повторяется с экспоненциальной
+задержкой; задачи воркера, который упал посреди выполнения, возвращаются
+в очередь через JOB_TIMEOUT, пока не исчерпаны попытки.
+"""
+import datetime
+import logging
+import random
+import traceback
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+BACKOFF_BASE = 10
+BACKOFF_MAX = 3600
+CLAIM_BATCH = 10
+
+_registry = {}
+
+
+def task(name):
+    def register(func):
+        _registry[name] = func
+        return func
+    return register
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=5):
+    if name not in _registry:
+        raise KeyError(f'Unknown job {name!r}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        max_attempts=max_attempts,
+        run_after=timezone.now() + datetime.timedelta(seconds=delay),
+    )
+
+
+def backoff(attempts):
+    """Задержка перед повтором: 10 с, 20 с, 40 с, ... не больше часа, ±25%."""
+    delay = min(BACKOFF_BASE * 2 ** (attempts - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.75, 1.25)
+
+
+def requeue_stale(timeout=None):
+    """
+    Возвращает в очередь задачи, зависшие в running дольше timeout, и
+    возвращает их число. Задача, исчерпавшая попытки, помечается failed:
+    если она сама роняет воркер (нехватка памяти, падение в Pillow), иначе
+    она выполнялась бы бесконечно.
+    """
+    if timeout is None:
+        timeout = datetime.timedelta(seconds=getattr(settings, 'JOB_TIMEOUT', 600))
+    stale = Job.objects.filter(status='running', locked_at__lt=timezone.now() - timeout)
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', locked_by='', locked_at=None,
+        last_error='Воркер не завершил задачу за JOB_TIMEOUT, попытки исчерпаны',
+    )
+    if failed:
+        logger.error('%s stale jobs failed permanently after max attempts', failed)
+    return stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def claim(worker_id):
+    """Забирает одну готовую к выполнению задачу или возвращает None."""
+    now = timezone.now()
+    candidates = (Job.objects.filter(status='queued', run_after__lte=now)
+                  .order_by('run_after', 'pk').values_list('pk', flat=True)[:CLAIM_BATCH])
+    for pk in candidates:
+        claimed = Job.objects.filter(pk=pk, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1,
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+    return None
+
+
+def execute(job):
+    func = _registry.get(job.name)
+    try:
+        if func is None:
+            raise KeyError(f'Unknown job {job.name!r}')
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        if job.attempts < job.max_attempts:
+            job.status = 'queued'
+            job.run_after = timezone.now() + datetime.timedelta(seconds=backoff(job.attempts))
+            logger.warning('Job %s failed (attempt %s/%s), retrying', job, job.attempts, job.max_attempts)
+        else:
+            job.status = 'failed'
+            logger.error('Job %s failed permanently:\n%s', job, error)
+        job.last_error = error
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    job.save(update_fields=['status', 'run_after', 'last_error', 'locked_by', 'locked_at', 'updated_at'])
+    return job.status
+
+
+def run_pending(worker_id='inline', limit=None):
+    """Выполняет готовые задачи в текущем процессе. Возвращает их число."""
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker_id)
+        if job is None:
+            break
+        execute(job)
+        count += 1
+    return count
@@ -0,0 +1,232 @@
+"""
+Бенчмарк API: задержка (p50/p95), число запросов к БД и пик выделенной
+памяти для каждого маршрута apartments/urls.py на наборах данных разного
+размера. Модуль использует тестовый клиент и утилиты django.test, поэтому
+лежит в management, а не в самом приложении.
+
+Данные генерируются командой generate_load_data во временной тестовой БД.
+Результаты сравниваются с сохранённой базовой линией (BASELINE_PATH):
+число запросов не должно расти, а задержка и память — превышать базовую
+линию больше чем на допуск. Запуск — команда benchmark_api.
+"""
+import io
+import json
+import math
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass, field
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from apartments import cache
+from apartments.models import Apartment, Application, Builder
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+DEFAULT_SIZES = (100, 1000, 10000)
+DEFAULT_ITERATIONS = 30
+BENCH_USERNAME = 'benchmark'
+BENCH_PASSWORD = 'benchmark-password'
+
+# Допуски при сравнении с базовой линией
+LATENCY_TOLERANCE = 0.5
+LATENCY_SLACK_MS = 5.0
+MEMORY_TOLERANCE = 0.5
+MEMORY_SLACK_KB = 64.0
+
+
+@dataclass
+class Route:
+    name: str
+    method: str
+    path: str
+    data: object = None
+    format: str = None
+    authenticated: bool = True
+
+    def request(self, client, context):
+        data = self.data(context) if callable(self.data) else self.data
+        return getattr(client, self.method)(self.path.format(**context), data, format=self.format)
+
+
+def _upload_data(context):
+    return {'file': SimpleUploadedFile('document.txt', b'x' * 64 * 1024, content_type='text/plain')}
+
+
+ROUTES = [
+    Route('login', 'post', '/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD},
+          format='json', authenticated=False),
+    Route('profile', 'get', '/api/profile/'),
+    Route('apartments-list', 'get', '/api/apartments/'),
+    Route('apartments-list-filtered', 'get', '/api/apartments/?rooms=2&price_max=40000000&material=brick'),
+    Route('apartments-search', 'get', '/api/apartments/?q=алматы'),
+    Route('apartments-detail', 'get', '/api/apartments/{apartment_id}/'),
+    Route('builders-list', 'get', '/api/builders/'),
+    Route('builders-detail', 'get', '/api/builders/{builder_id}/'),
+    Route('applications-list', 'get', '/api/applications/'),
+    Route('files-list', 'get', '/api/files/'),
+    Route('upload', 'post', '/api/upload/', _upload_data, format='multipart'),
+]
+
+
+@dataclass
+class Measurement:
+    route: str
+    size: int
+    status: int
+    queries: int
+    p50_ms: float
+    p95_ms: float
+    peak_kb: float
+
+    @property
+    def key(self):
+        return f'{self.route}@{self.size}'
+
+    def as_dict(self):
+        return {'queries': self.queries, 'p50_ms': round(self.p50_ms, 2),
+                'p95_ms': round(self.p95_ms, 2), 'peak_kb': round(self.peak_kb, 1)}
+
+
+@dataclass
+class Report:
+    measurements: list = field(default_factory=list)
+    violations: list = field(default_factory=list)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def seed(size):
+    call_command(
+        'generate_load_data',
+        builders=max(size // 100, 1), apartments=size, users=max(size // 10, 1),
+        applications=size, seed=0, stdout=io.StringIO(),
+    )
+    user = get_user_model().objects.create_user(username=BENCH_USERNAME, password=BENCH_PASSWORD)
+    Application.objects.bulk_create(
+        Application(user=user, name='Постановка на учет', status='in_progress',
+                    creation_date='2025-01-01')
+        for _ in range(10)
+    )
+    return {
+        'apartment_id': Apartment.objects.order_by('pk').values_list('pk', flat=True).first(),
+        'builder_id': Builder.objects.order_by('pk').values_list('pk', flat=True).first(),
+    }
+
+
+def _client(token=None):
+    client = APIClient()
+    if token:
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def measure(route, size, context, token, iterations, warm_cache=False):
+    client = _client(token if route.authenticated else None)
+    timings = []
+    for _ in range(iterations):
+        if not warm_cache:
+            cache.get_cache().clear()
+        started = time.perf_counter()
+        route.request(client, context)
+        timings.append((time.perf_counter() - started) * 1000)
+
+    # Отдельный прогон под tracemalloc: он сам замедляет выполнение
+    if not warm_cache:
+        cache.get_cache().clear()
+    tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            response = route.request(client, context)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return Measurement(
+        route=route.name, size=size, status=response.status_code, queries=len(queries),
+        p50_ms=percentile(timings, 0.5), p95_ms=percentile(timings, 0.95), peak_kb=peak / 1024,
+    )
+
+
+def compare(measurement, baseline):
+    """Возвращает список нарушений бюджета относительно базовой линии."""
+    expected = baseline.get(measurement.key)
+    if expected is None:
+        return []
+    violations = []
+    if measurement.queries > expected['queries']:
+        violations.append(f'{measurement.key}: {measurement.queries} queries > budget {expected["queries"]}')
+    latency_budget = expected['p95_ms'] * (1 + LATENCY_TOLERANCE) + LATENCY_SLACK_MS
+    if measurement.p95_ms > latency_budget:
+        violations.append(f'{measurement.key}: p95 {measurement.p95_ms:.1f}ms > budget {latency_budget:.1f}ms')
+    memory_budget = expected['peak_kb'] * (1 + MEMORY_TOLERANCE) + MEMORY_SLACK_KB
+    if measurement.peak_kb > memory_budget:
+        violations.append(f'{measurement.key}: peak {measurement.peak_kb:.0f}KB > budget {memory_budget:.0f}KB')
+    return violations
+
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(measurements, path=BASELINE_PATH):
+    # Замеры, не вошедшие в прогон (--sizes/--routes), остаются прежними
+    baseline = load_baseline(path)
+    baseline.update({m.key: m.as_dict() for m in measurements})
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def run_size(size, iterations=DEFAULT_ITERATIONS, routes=None, baseline=None, warm_cache=False,
+             on_measurement=None):
+    """Заполняет текущую (пустую) БД данными размера size и замеряет маршруты."""
+    report = Report()
+    context = seed(size)
+    token = _client().post('/api/login/', {'username': BENCH_USERNAME, 'password': BENCH_PASSWORD},
+                           format='json').data['access']
+    for route in ROUTES:
+        if routes and route.name not in routes:
+            continue
+        measurement = measure(route, size, context, token, iterations, warm_cache)
+        report.measurements.append(measurement)
+        report.violations.extend(compare(measurement, baseline or {}))
+        if on_measurement:
+            on_measurement(measurement)
+    return report
+
+
+def run(sizes=DEFAULT_SIZES, **kwargs):
+    """Для каждого размера создаёт отдельную временную БД и вызывает run_size."""
+    report = Report()
+    test_settings = connection.settings_dict['TEST']
+    test_name = test_settings['NAME']
+    with tempfile.TemporaryDirectory() as tmp:
+        if connection.vendor == 'sqlite':
+            # Файл, а не in-memory БД: ближе к рабочей нагрузке, и его можно пересоздать
+            test_settings['NAME'] = os.path.join(tmp, 'benchmark.sqlite3')
+        try:
+            for size in sizes:
+                old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+                try:
+                    size_report = run_size(size, **kwargs)
+                finally:
+                    connection.creation.destroy_test_db(old_name, verbosity=0)
+                report.measurements.extend(size_report.measurements)
+                report.violations.extend(size_report.violations)
+        finally:
+            # Иначе следующий create_test_db в процессе указал бы на удалённый каталог
+            test_settings['NAME'] = test_name
+    return report
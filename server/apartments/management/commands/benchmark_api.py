@@ -0,0 +1,54 @@
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from apartments.management import benchmark
+
+
+class Command(BaseCommand):
+    help = ('Measures p50/p95 latency, query count and peak memory of every API route '
+            'on generated datasets and compares them with the stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', default=','.join(map(str, benchmark.DEFAULT_SIZES)),
+                            help='Comma-separated apartment counts, e.g. 100,1000,10000')
+        parser.add_argument('--iterations', type=int, default=benchmark.DEFAULT_ITERATIONS)
+        parser.add_argument('--routes', help='Comma-separated route names (default: all)')
+        parser.add_argument('--baseline', default=benchmark.BASELINE_PATH)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Store this run in the baseline instead of checking it')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Keep the catalog cache between requests (default: measure cold)')
+
+    def handle(self, *args, **options):
+        sizes = [int(size) for size in options['sizes'].split(',')]
+        routes = options['routes'].split(',') if options['routes'] else None
+        baseline = {} if options['update_baseline'] else benchmark.load_baseline(options['baseline'])
+
+        self.stdout.write(f'{"route":<28}{"size":>7}{"status":>7}{"queries":>9}{"p50 ms":>9}'
+                          f'{"p95 ms":>9}{"peak KB":>10}')
+
+        def on_measurement(m):
+            self.stdout.write(f'{m.route:<28}{m.size:>7}{m.status:>7}{m.queries:>9}{m.p50_ms:>9.1f}'
+                              f'{m.p95_ms:>9.1f}{m.peak_kb:>10.0f}')
+
+        setup_test_environment()
+        try:
+            with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+                report = benchmark.run(
+                    sizes, iterations=options['iterations'], routes=routes, baseline=baseline,
+                    warm_cache=options['warm_cache'], on_measurement=on_measurement,
+                )
+        finally:
+            teardown_test_environment()
+
+        if options['update_baseline']:
+            benchmark.save_baseline(report.measurements, options['baseline'])
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {options["baseline"]}'))
+            return
+        if report.violations:
+            for violation in report.violations:
+                self.stderr.write(violation)
+            raise CommandError(f'{len(report.violations)} budget(s) exceeded')
+        self.stdout.write(self.style.SUCCESS('All routes within budget'))
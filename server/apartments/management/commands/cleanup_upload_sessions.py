@@ -0,0 +1,28 @@
+import datetime
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apartments import uploads
+from apartments.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Deletes resumable and direct upload sessions (and their temp files) not touched for --max-age-hours'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-age-hours', type=int, default=24)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - datetime.timedelta(hours=options['max_age_hours'])
+        # Завершённые сессии тоже: владелец файла записан в UploadedFile.user
+        sessions = UploadSession.objects.filter(updated_at__lt=cutoff)
+        count = 0
+        for session in sessions.iterator():
+            uploads.remove_part(session)
+            if session.direct:
+                default_storage.delete(uploads.staging_name(session))
+            count += 1
+        sessions.delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {count} upload sessions'))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+
+from apartments import export
+from apartments.models import Apartment
+
+
+class Command(BaseCommand):
+    help = 'Streams the apartment catalog as CSV or NDJSON with constant memory usage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-format', choices=export.FORMATS, default='ndjson')
+        parser.add_argument('--output', '-o', help='Output file path (defaults to stdout)')
+        parser.add_argument('--flatten-unit-types', action='store_true',
+                            help='Emit one row per apartment_types entry')
+        parser.add_argument('--chunk-size', type=int, default=export.DEFAULT_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        lines = export.iter_export(
+            Apartment.objects.all(),
+            options['output_format'],
+            options['flatten_unit_types'],
+            options['chunk_size'],
+        )
+        if not options['output']:
+            for line in lines:
+                self.stdout.write(line, ending='')
+            return
+
+        count = 0
+        with open(options['output'], 'w', encoding='utf-8', newline='') as f:
+            for line in lines:
+                f.write(line)
+                count += 1
+        self.stdout.write(self.style.SUCCESS(f'Wrote {count} lines to {options["output"]}'))
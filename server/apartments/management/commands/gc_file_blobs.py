@@ -0,0 +1,22 @@
+import datetime
+
+from django.core.management.base import BaseCommand
+
+from apartments import uploads
+
+
+class Command(BaseCommand):
+    help = ('Deletes stored file contents no upload refers to any more. '
+            'Blobs are kept for --grace-hours after their last reference is removed.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--grace-hours', type=int, default=24)
+        parser.add_argument('--adopt-legacy', action='store_true',
+                            help='First move uploads stored before deduplication to content-addressed blobs')
+
+    def handle(self, *args, **options):
+        if options['adopt_legacy']:
+            adopted = uploads.adopt_legacy_uploads()
+            self.stdout.write(f'Moved {adopted} legacy uploads to content-addressed storage')
+        deleted, freed = uploads.collect_garbage(datetime.timedelta(hours=options['grace_hours']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} unreferenced blobs, freed {freed} bytes'))
@@ -0,0 +1,25 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from apartments import images
+from apartments.models import FileBlob
+
+
+class Command(BaseCommand):
+    help = 'Builds thumbnails and WebP variants for stored images that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Rebuild derivatives for every image')
+
+    def handle(self, *args, **options):
+        blobs = FileBlob.objects.all() if options['force'] else FileBlob.objects.filter(derivatives={})
+        built = 0
+        for blob in blobs.iterator():
+            if not images.is_image(blob.file.name):
+                continue
+            if options['force']:
+                for name in blob.derivatives.values():
+                    default_storage.delete(name)
+            if images.generate(blob):
+                built += 1
+        self.stdout.write(self.style.SUCCESS(f'Built derivatives for {built} images'))
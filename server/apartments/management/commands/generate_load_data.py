@@ -0,0 +1,190 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from apartments import cache, search
+from apartments.importer import batched
+from apartments.models import Apartment, ApartmentUnitType, Application, Builder, UserProfile
+
+User = get_user_model()
+
+CITIES = ['Алматы', 'Астана', 'Шымкент', 'Караганда', 'Актобе', 'Атырау', 'Павлодар', 'Усть-Каменогорск']
+STREETS = ['проспект Абая', 'улица Толе би', 'проспект Туран', 'улица Сатпаева', 'проспект Мангилик Ел',
+           'улица Жандосова', 'проспект Аль-Фараби', 'улица Кабанбай батыра']
+NAME_WORDS = ['Green', 'Nova', 'Sky', 'Park', 'Garden', 'City', 'Residence', 'Тау', 'Әлем', 'Нұр',
+              'Samal', 'Baspana', 'Comfort', 'River', 'Central', 'Ақсай']
+PROGRAMS = ['Ипотека под 7%', 'Рассрочка на 2 года', 'Программа "Молодая семья"', 'Отбасы банк',
+            'Специальные условия для льготников']
+CONDITIONS = ['Первоначальный взнос от 20%', 'Документы удостоверения личности', 'Подтверждение дохода',
+              'Справка об отсутствии жилья']
+APPLICATION_STATUSES = [choice for choice, _ in Application.STATUS_CHOICES]
+USER_PASSWORD = 'loadtest-password'
+# Фиксированная точка отсчёта, чтобы данные не зависели от даты запуска
+BASE_DATE = datetime.date(2025, 1, 1)
+
+
+def _choices(field_choices):
+    return [choice for choice, _ in field_choices]
+
+
+class Command(BaseCommand):
+    help = ('Generates a large deterministic dataset with bulk inserts for load testing. '
+            'Re-running with the same --seed skips rows that already exist (except applications).')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--builders', type=int, default=100)
+        parser.add_argument('--apartments', type=int, default=10000)
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--applications', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.prefix = f'load{options["seed"]}'
+        self.batch_size = options['batch_size']
+
+        builder_ids = self._timed('builders', self._create_builders, options['builders'])
+        self._timed('apartments', self._create_apartments, options['apartments'], builder_ids)
+        user_ids = self._timed('users', self._create_users, options['users'])
+        self._timed('applications', self._create_applications, options['applications'], user_ids)
+
+        cache.invalidate('builders')
+        cache.invalidate('apartments')
+
+    def _timed(self, label, method, count, *args):
+        started = time.monotonic()
+        result = method(count, *args)
+        elapsed = time.monotonic() - started
+        rate = count / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(f'Created {count} {label} in {elapsed:.1f}s ({rate:.0f} rows/s)'))
+        return result
+
+    def _create_builders(self, count):
+        names = []
+        for batch in batched(range(count), self.batch_size):
+            builders = [
+                Builder(
+                    name=f'{self.prefix} Builder {i}',
+                    contacts=f'{self.rng.choice(CITIES)}, {self.rng.choice(STREETS)}, {self.rng.randint(1, 200)}',
+                    phone_number=f'+7 (7{self.rng.randint(0, 99):02d}) {self.rng.randint(100, 999)}-'
+                                 f'{self.rng.randint(10, 99)}-{self.rng.randint(10, 99)}',
+                    site=f'https://builder{i}.{self.prefix}.kz',
+                    email=f'info@builder{i}.{self.prefix}.kz',
+                )
+                for i in batch
+            ]
+            Builder.objects.bulk_create(builders, ignore_conflicts=True)
+            names.extend(builder.name for builder in builders)
+        return list(Builder.objects.filter(name__in=names).values_list('id', flat=True))
+
+    def _apartment(self, i, builder_ids):
+        rng = self.rng
+        start_date = datetime.date(2022, 1, 1) + datetime.timedelta(days=rng.randint(0, 1000))
+        has_balcony = rng.random() < 0.7
+        apartment_types = []
+        for room_count in sorted(rng.sample(range(1, 6), rng.randint(1, 4))):
+            min_area = 20 + room_count * rng.randint(15, 25)
+            apartment_types.append({
+                'label': f'{room_count}-комнатная',
+                'room_count': room_count,
+                'min_area': min_area,
+                'max_area': min_area + rng.randint(5, 30),
+                'cost_per_square_meter': rng.randrange(250000, 900000, 5000),
+                'available_count': rng.randint(0, 40),
+                'scheme_url': f'https://example.com/schemes/{i}/{room_count}.png',
+            })
+        city = rng.choice(CITIES)
+        return Apartment(
+            name=f'ЖК {rng.choice(NAME_WORDS)} {rng.choice(NAME_WORDS)} {i}',
+            address=f'{city}, {rng.choice(STREETS)}, {rng.randint(1, 300)}',
+            images=[f'https://example.com/images/{i}/{n}.webp' for n in range(rng.randint(1, 5))],
+            object_code=f'{self.prefix}-{i:08d}',
+            floor=rng.randint(3, 30),
+            building_count=rng.randint(1, 12),
+            material=rng.choice(_choices(Apartment.MATERIAL_CHOICES)),
+            start_date=start_date,
+            end_date=start_date + datetime.timedelta(days=rng.randint(365, 1500)),
+            available_programs=rng.sample(PROGRAMS, rng.randint(1, 3)),
+            conditions=rng.sample(CONDITIONS, rng.randint(1, 4)),
+            description=f'Жилой комплекс в городе {city}. ' * rng.randint(1, 5),
+            has_balcony=has_balcony,
+            is_balcony_glazed=has_balcony and rng.random() < 0.6,
+            building_start_date=start_date - datetime.timedelta(days=rng.randint(30, 400)),
+            home_type=rng.choice(_choices(Apartment.HOME_TYPE_CHOICES)),
+            bathroom_type=rng.choice(_choices(Apartment.BATHROOM_TYPE_CHOICES)),
+            security=rng.choice(_choices(Apartment.SECURITY_CHOICES)),
+            parking_type=rng.choice(_choices(Apartment.PARKING_TYPE_CHOICES)),
+            elevator_type=rng.choice(_choices(Apartment.ELEVATOR_TYPE_CHOICES)),
+            apartment_types=apartment_types,
+            builder_id=rng.choice(builder_ids),
+        )
+
+    def _create_apartments(self, count, builder_ids):
+        if count and not builder_ids:
+            builder_ids = list(Builder.objects.values_list('id', flat=True))
+            if not builder_ids:
+                raise CommandError('Apartments need at least one builder, pass --builders')
+        for batch in batched(range(count), self.batch_size):
+            apartments = [self._apartment(i, builder_ids) for i in batch]
+            with transaction.atomic():
+                Apartment.objects.bulk_create(apartments, ignore_conflicts=True)
+                # Сигналы при bulk_create не срабатывают, производные данные пишем сами
+                saved = list(Apartment.objects.filter(object_code__in=[a.object_code for a in apartments])
+                             .only('name', 'address', 'description', 'apartment_types'))
+                ApartmentUnitType.rebuild(saved)
+                search.index_apartments(saved)
+
+    def _create_users(self, count):
+        # Один хэш на всех: PBKDF2 на каждого пользователя занял бы часы
+        password = make_password(USER_PASSWORD)
+        user_ids = []
+        for batch in batched(range(count), self.batch_size):
+            users = [
+                User(
+                    username=f'{self.prefix}_user{i}',
+                    email=f'user{i}@{self.prefix}.kz',
+                    first_name=self.rng.choice(['Айгерим', 'Нурлан', 'Алия', 'Ерлан', 'Дана', 'Асель']),
+                    last_name=self.rng.choice(['Ахметова', 'Садыков', 'Жумабаева', 'Омаров', 'Ким']),
+                    password=password,
+                )
+                for i in batch
+            ]
+            with transaction.atomic():
+                # bulk_create не отправляет post_save, поэтому профили создаём пачкой сами
+                User.objects.bulk_create(users, ignore_conflicts=True)
+                ids = list(User.objects.filter(username__in=[u.username for u in users]).values_list('id', flat=True))
+                profiles = [
+                    UserProfile(
+                        user_id=user_id,
+                        address=f'{self.rng.choice(CITIES)}, {self.rng.choice(STREETS)}',
+                        phone_number=f'+7 (7{self.rng.randint(0, 99):02d}) {self.rng.randint(1000000, 9999999)}',
+                        iin=f'{self.rng.randint(0, 10 ** 12 - 1):012d}',
+                    )
+                    for user_id in ids
+                ]
+                UserProfile.objects.bulk_create(profiles, ignore_conflicts=True)
+            user_ids.extend(ids)
+        return user_ids
+
+    def _create_applications(self, count, user_ids):
+        if count and not user_ids:
+            user_ids = list(User.objects.values_list('id', flat=True))
+            if not user_ids:
+                raise CommandError('Applications need at least one user, pass --users')
+        for batch in batched(range(count), self.batch_size):
+            Application.objects.bulk_create(
+                Application(
+                    user_id=self.rng.choice(user_ids),
+                    name='Постановка на учет',
+                    status=self.rng.choice(APPLICATION_STATUSES),
+                    creation_date=BASE_DATE - datetime.timedelta(days=self.rng.randint(0, 730)),
+                    document_url=f'https://example.com/documents/{self.prefix}/{i}.pdf',
+                )
+                for i in batch
+            )
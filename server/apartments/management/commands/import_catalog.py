@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apartments import importer
+
+
+class Command(BaseCommand):
+    help = 'Streams builders or apartments from CSV/JSON/NDJSON and upserts them in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Input file')
+        parser.add_argument('--model', choices=('builders', 'apartments'), default='apartments')
+        parser.add_argument('--input-format', choices=importer.FORMATS,
+                            help='Defaults to the file extension (.csv, .json, .ndjson/.jsonl)')
+        parser.add_argument('--batch-size', type=int, default=importer.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--max-errors', type=int, default=100,
+                            help='How many validation errors to keep and report')
+
+    def handle(self, *args, **options):
+        try:
+            input_format = options['input_format'] or importer.detect_format(options['path'])
+        except ValueError as e:
+            raise CommandError(e)
+
+        import_records = (
+            importer.import_builders if options['model'] == 'builders' else importer.import_apartments
+        )
+        started = time.monotonic()
+
+        def on_batch(result):
+            if options['verbosity'] > 1:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{result.rows} rows, {result.rows / elapsed:.0f} rows/s')
+
+        with open(options['path'], encoding='utf-8', newline='') as f:
+            result = import_records(
+                importer.iter_records(f, input_format),
+                batch_size=options['batch_size'],
+                max_errors=options['max_errors'],
+                on_batch=on_batch,
+            )
+
+        elapsed = time.monotonic() - started
+        for row, errors in result.errors:
+            self.stderr.write(f'Row {row}: {errors}')
+        rate = result.rows / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {result.saved} of {result.rows} {options["model"]} '
+            f'in {elapsed:.1f}s ({rate:.0f} rows/s), {result.rows - result.saved} skipped.'
+        ))
@@ -0,0 +1,82 @@
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from apartments import jobs
+
+STALE_CHECK_INTERVAL = 60
+
+
+def worker_loop(stop, poll_interval):
+    # Ctrl+C получает вся группа процессов; останавливает воркеры родитель через stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    worker_id = f'{socket.gethostname()}:{os.getpid()}'
+    while not stop.is_set():
+        close_old_connections()
+        job = jobs.claim(worker_id)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        jobs.execute(job)
+
+
+class Command(BaseCommand):
+    help = ('Runs background jobs from the database queue in a pool of worker processes. '
+            'Each process takes one job at a time; failed jobs are retried with exponential backoff.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=int(os.environ.get('JOB_WORKER_PROCESSES', 2)))
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds an idle worker waits before checking the queue again')
+        parser.add_argument('--once', action='store_true',
+                            help='Run the jobs that are due now in this process and exit')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            jobs.requeue_stale()
+            count = jobs.run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Processed {count} jobs'))
+            return
+
+        stop = multiprocessing.Event()
+        # Обработчик только ставит флаг: stop.set() внутри обработчика может
+        # зависнуть на замке, который держит прерванный им stop.wait()
+        stopping = []
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *args: stopping.append(signum))
+
+        def start_worker():
+            process = multiprocessing.Process(target=worker_loop, args=(stop, options['poll_interval']))
+            process.start()
+            return process
+
+        # Дочерние процессы не должны унаследовать открытое соединение с БД
+        connections.close_all()
+        workers = [start_worker() for _ in range(options['processes'])]
+        self.stdout.write(f'Started {len(workers)} workers: {", ".join(str(w.pid) for w in workers)}')
+
+        last_stale_check = 0
+        while not stopping:
+            if time.monotonic() - last_stale_check > STALE_CHECK_INTERVAL:
+                requeued = jobs.requeue_stale()
+                if requeued:
+                    self.stdout.write(f'Requeued {requeued} stale jobs')
+                connections.close_all()
+                last_stale_check = time.monotonic()
+            for i, worker in enumerate(workers):
+                if not worker.is_alive():
+                    self.stderr.write(f'Worker {worker.pid} exited with code {worker.exitcode}, restarting')
+                    workers[i] = start_worker()
+            time.sleep(1)
+
+        self.stdout.write('Stopping workers after their current jobs...')
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS('Workers stopped'))
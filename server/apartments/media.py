@@ -0,0 +1,156 @@
+"""
+Отдача загруженных файлов авторизованным пользователям.
+
+GET /api/files/<id>/download/ (?variant=thumbnail для производных
+изображений, ?download=1 — сохранить как вложение) отдаёт содержимое
+UploadedFile с поддержкой Range: ответ 206 с нужным диапазоном, чтобы
+браузер мог докачивать документы и перематывать видео.
+
+Если задан MEDIA_SENDFILE ('nginx' или 'apache'), Django только проверяет
+доступ и возвращает заголовок X-Accel-Redirect / X-Sendfile, а байты
+(вместе с Range) отдаёт прокси — воркер освобождается сразу. Для S3
+(storage.py) есть 'redirect' — переадресация на подписанную ссылку.
+Без них под ASGI файл читается блоками через asynchronous.streaming_content.
+"""
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+from rest_framework.negotiation import BaseContentNegotiation
+
+from . import asynchronous
+
+READ_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class IgnoreClientContentNegotiation(BaseContentNegotiation):
+    """Файл отдаётся при любом Accept; ошибки — первым рендерером (JSON)."""
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def parse_range(header, size):
+    """
+    Разбирает Range: bytes=a-b / a- / -n и возвращает (start, end)
+    включительно. None — заголовок не поддерживается (несколько диапазонов
+    или другие единицы) и отдаётся весь файл; ValueError — диапазон за
+    пределами файла (416).
+    """
+    match = RANGE_RE.match(header.strip())
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # Последние N байт
+        length = int(last)
+        if length == 0:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError(header)
+    return start, end
+
+
+def _read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(READ_SIZE, length))
+            if not block:
+                break
+            length -= len(block)
+            yield block
+    finally:
+        f.close()
+
+
+def _sendfile_response(name):
+    backend = getattr(settings, 'MEDIA_SENDFILE', '')
+    response = HttpResponse()
+    if backend == 'nginx':
+        response['X-Accel-Redirect'] = settings.MEDIA_SENDFILE_PREFIX.rstrip('/') + '/' + name
+    elif backend == 'apache':
+        response['X-Sendfile'] = default_storage.path(name)
+    elif backend == 'redirect':
+        # Объектное хранилище: клиент качает по подписанной ссылке напрямую
+        return HttpResponseRedirect(default_storage.url(name))
+    else:
+        return None
+    # Content-Type и Content-Length выставит прокси по самому файлу
+    del response['Content-Type']
+    return response
+
+
+def _file_response(request, name, etag):
+    size = default_storage.size(name)
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    header = request.META.get('HTTP_RANGE')
+    # If-Range: диапазон действует, только если файл не изменился
+    if header and etag and request.META.get('HTTP_IF_RANGE', etag) != etag:
+        header = None
+
+    try:
+        byte_range = parse_range(header, size) if header else None
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    f = default_storage.open(name, 'rb')
+    if byte_range is None and not asynchronous.is_asgi(request):
+        # Под WSGI FileResponse отдаёт файл через wsgi.file_wrapper
+        response = FileResponse(f, content_type=content_type)
+    else:
+        start, end = byte_range or (0, size - 1)
+        # Файл читается в любом потоке пула, не занимая поток БД
+        content = asynchronous.streaming_content(request, _read_range(f, start, end - start + 1),
+                                                 thread_sensitive=False)
+        response = StreamingHttpResponse(content, status=206 if byte_range else 200, content_type=content_type)
+        response['Content-Length'] = end - start + 1
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve(request, uploaded_file, variant=None):
+    blob = uploaded_file.blob
+    if variant:
+        if blob is None or variant not in blob.derivatives:
+            raise Http404('Нет такого варианта файла')
+        name = blob.derivatives[variant]
+    else:
+        name = uploaded_file.file.name
+    if not default_storage.exists(name):
+        raise Http404('Файл не найден')
+
+    # Содержимое blob адресуется SHA-256, поэтому сумма — готовый сильный ETag
+    etag = quote_etag(f'{blob.pk}-{variant}' if variant else blob.pk) if blob else None
+    last_modified = int(uploaded_file.uploaded_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = _sendfile_response(name)
+    if response is None:
+        response = _file_response(request, name, etag)
+
+    if etag:
+        response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    response['Content-Disposition'] = content_disposition_header(bool(request.GET.get('download')),
+                                                                 os.path.basename(name))
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -0,0 +1,71 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:48
+
+import django.db.models.deletion
+from decimal import Decimal, InvalidOperation
+from django.db import migrations, models
+
+
+def _to_decimal(value):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(0)
+    # NaN и бесконечность не помещаются в DecimalField
+    return number if number.is_finite() else Decimal(0)
+
+
+def populate_unit_types(apps, schema_editor):
+    Apartment = apps.get_model('apartments', 'Apartment')
+    ApartmentUnitType = apps.get_model('apartments', 'ApartmentUnitType')
+    unit_types = []
+    for apartment in Apartment.objects.only('id', 'apartment_types').iterator():
+        for data in apartment.apartment_types or []:
+            if not isinstance(data, dict):
+                continue
+            min_area = _to_decimal(data.get('min_area'))
+            max_area = _to_decimal(data.get('max_area'))
+            cost = _to_decimal(data.get('cost_per_square_meter'))
+            unit_types.append(ApartmentUnitType(
+                apartment_id=apartment.id,
+                label=str(data.get('label') or '')[:255],
+                room_count=max(int(_to_decimal(data.get('room_count'))), 0),
+                min_area=min_area,
+                max_area=max_area,
+                cost_per_square_meter=cost,
+                available_count=max(int(_to_decimal(data.get('available_count'))), 0),
+                min_price=min_area * cost,
+                max_price=max_area * cost,
+            ))
+    ApartmentUnitType.objects.bulk_create(unit_types, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0010_apartment_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ApartmentUnitType',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('label', models.CharField(blank=True, max_length=255, verbose_name='Название')),
+                ('room_count', models.PositiveSmallIntegerField(verbose_name='Количество комнат')),
+                ('min_area', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Минимальная площадь')),
+                ('max_area', models.DecimalField(decimal_places=2, max_digits=8, verbose_name='Максимальная площадь')),
+                ('cost_per_square_meter', models.DecimalField(decimal_places=2, max_digits=14, verbose_name='Стоимость за м²')),
+                ('available_count', models.PositiveIntegerField(default=0, verbose_name='Доступно квартир')),
+                ('min_price', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Минимальная стоимость')),
+                ('max_price', models.DecimalField(decimal_places=2, max_digits=16, verbose_name='Максимальная стоимость')),
+                ('apartment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unit_types', to='apartments.apartment', verbose_name='Квартира')),
+            ],
+            options={
+                'verbose_name': 'Тип квартиры',
+                'verbose_name_plural': 'Типы квартир',
+                'ordering': ['apartment', 'room_count'],
+                'indexes': [models.Index(fields=['room_count', 'min_price'], name='unit_type_rooms_price_idx'), models.Index(fields=['min_price'], name='unit_type_min_price_idx'), models.Index(fields=['max_area'], name='unit_type_max_area_idx')],
+            },
+        ),
+        migrations.RunPython(populate_unit_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,71 @@
+from django.db import migrations
+
+SQLITE_TABLE = 'apartments_apartment_search'
+POSTGRES_TABLE = 'apartments_apartmentsearch'
+
+
+def normalize(text):
+    return (text or '').lower().replace('ё', 'е')
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    Apartment = apps.get_model('apartments', 'Apartment')
+    rows = [
+        (apartment.pk, normalize(apartment.name), normalize(apartment.address),
+         normalize(apartment.description))
+        for apartment in Apartment.objects.only('name', 'address', 'description').iterator()
+    ]
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SQLITE_TABLE} USING fts5("
+            f"name, address, description, "
+            f"tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {SQLITE_TABLE} (rowid, name, address, description) VALUES (%s, %s, %s, %s)",
+                rows,
+            )
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(
+            f"CREATE TABLE {POSTGRES_TABLE} ("
+            f"apartment_id bigint PRIMARY KEY REFERENCES apartments_apartment (id) ON DELETE CASCADE, "
+            f"document tsvector NOT NULL)"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX {POSTGRES_TABLE}_document_gin ON {POSTGRES_TABLE} USING gin (document)"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {POSTGRES_TABLE} (apartment_id, document) VALUES (%s, "
+                f"setweight(to_tsvector('russian', %s), 'A') || "
+                f"setweight(to_tsvector('russian', %s), 'B') || "
+                f"setweight(to_tsvector('russian', %s), 'C'))",
+                rows,
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+    elif connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {POSTGRES_TABLE}")
+
+
+class Migration(migrations.Migration):
+    """
+    Таблица полнотекстового индекса квартир (см. apartments/search.py).
+
+    Модели у таблицы нет: её структура зависит от СУБД, а заполняется она
+    сырым SQL из сигналов Apartment.
+    """
+
+    dependencies = [
+        ('apartments', '0012_apartment_updated_at_builder_updated_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
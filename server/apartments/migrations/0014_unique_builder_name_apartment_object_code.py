@@ -0,0 +1,44 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:57
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def _rename_duplicates(model, field, max_length):
+    """
+    Оставляет значение field у записи с меньшим id, остальным дописывает
+    их id: данные не теряются, а уникальный индекс создаётся без ошибки.
+    Переименованные записи стоит проверить и объединить вручную.
+    """
+    duplicates = (model.objects.values(field).annotate(count=Count('id'))
+                  .filter(count__gt=1).values_list(field, flat=True))
+    for value in list(duplicates):
+        for pk in model.objects.filter(**{field: value}).order_by('id').values_list('id', flat=True)[1:]:
+            suffix = f' [{pk}]'
+            model.objects.filter(pk=pk).update(**{field: value[:max_length - len(suffix)] + suffix})
+
+
+def rename_duplicates(apps, schema_editor):
+    _rename_duplicates(apps.get_model('apartments', 'Apartment'), 'object_code', 100)
+    _rename_duplicates(apps.get_model('apartments', 'Builder'), 'name', 255)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0013_apartment_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(rename_duplicates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='apartment',
+            name='object_code',
+            field=models.CharField(max_length=100, unique=True, verbose_name='Код объекта'),
+        ),
+        migrations.AlterField(
+            model_name='builder',
+            name='name',
+            field=models.CharField(max_length=255, unique=True, verbose_name='Название'),
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:18
+
+import apartments.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0015_upload_session'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='uploadedfile',
+            name='file',
+            field=models.FileField(max_length=255, upload_to=apartments.models.upload_path, verbose_name='Файл'),
+        ),
+        migrations.CreateModel(
+            name='FileBlob',
+            fields=[
+                ('sha256', models.CharField(max_length=64, primary_key=True, serialize=False, verbose_name='SHA-256')),
+                ('file', models.FileField(max_length=255, upload_to='', verbose_name='Файл')),
+                ('size', models.PositiveBigIntegerField(verbose_name='Размер, байт')),
+                ('ref_count', models.PositiveIntegerField(default=0, verbose_name='Число ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создан')),
+                ('released_at', models.DateTimeField(blank=True, null=True, verbose_name='Последняя ссылка удалена')),
+            ],
+            options={
+                'verbose_name': 'Содержимое файла',
+                'verbose_name_plural': 'Содержимое файлов',
+                'indexes': [models.Index(fields=['ref_count', 'released_at'], name='file_blob_gc_idx')],
+            },
+        ),
+        migrations.AddField(
+            model_name='uploadedfile',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='uploaded_files', to='apartments.fileblob', verbose_name='Содержимое'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0016_file_blob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fileblob',
+            name='derivatives',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Производные изображения'),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0018_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='document',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='applications', to='apartments.uploadedfile', verbose_name='Подтверждающий документ'),
+        ),
+        migrations.AddField(
+            model_name='uploadsession',
+            name='direct',
+            field=models.BooleanField(default=False, verbose_name='Прямая загрузка в хранилище'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_owners(apps, schema_editor):
+    """
+    Владелец файлов, загруженных до появления UploadedFile.user: автор
+    сессии загрузки, а если её уже нет — заявитель заявки с этим документом.
+    """
+    UploadedFile = apps.get_model('apartments', 'UploadedFile')
+    UploadSession = apps.get_model('apartments', 'UploadSession')
+    Application = apps.get_model('apartments', 'Application')
+    unowned = UploadedFile.objects.filter(user__isnull=True)
+    sessions = UploadSession.objects.filter(uploaded_file=OuterRef('pk'), user__isnull=False)
+    unowned.update(user=Subquery(sessions.values('user')[:1]))
+    applications = Application.objects.filter(document=OuterRef('pk'), user__isnull=False)
+    unowned.update(user=Subquery(applications.values('user')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('apartments', '0021_uploadedfile_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_owners, migrations.RunPython.noop),
+    ]
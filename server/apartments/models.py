@@ -1,7 +1,9 @@
 from django.db import models
+from decimal import Decimal, InvalidOperation
 import os
 import uuid
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 
 User = get_user_model()
 
@@ -10,8 +12,55 @@ def upload_path(instance, filename):
     filename = f"{uuid.uuid4()}.{ext}"
     return os.path.join('uploads', filename)
 
+def blob_path(sha256, filename):
+    # blobs/ab/cd/abcd…: не больше 256 подкаталогов на уровень
+    ext = os.path.splitext(filename)[1].lower()
+    return os.path.join('blobs', sha256[:2], sha256[2:4], f"{sha256}{ext}")
+
+class FileBlob(models.Model):
+    """
+    Содержимое файла, хранящееся один раз по адресу из SHA-256.
+
+    На один blob ссылаются несколько UploadedFile; ref_count — число
+    ссылок. Blob без ссылок удаляет gc_file_blobs, не раньше чем через
+    период ожидания после released_at (см. uploads.collect_garbage).
+    """
+    sha256 = models.CharField(max_length=64, primary_key=True, verbose_name="SHA-256")
+    file = models.FileField(max_length=255, verbose_name="Файл")
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    ref_count = models.PositiveIntegerField(default=0, verbose_name="Число ссылок")
+    derivatives = models.JSONField(default=dict, blank=True, verbose_name="Производные изображения")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создан")
+    released_at = models.DateTimeField(null=True, blank=True, verbose_name="Последняя ссылка удалена")
+
+    def __str__(self):
+        return f"{self.sha256[:12]} ({self.ref_count})"
+
+    class Meta:
+        verbose_name = "Содержимое файла"
+        verbose_name_plural = "Содержимое файлов"
+        indexes = [
+            models.Index(fields=['ref_count', 'released_at'], name='file_blob_gc_idx'),
+        ]
+
 class UploadedFile(models.Model):
-    file = models.FileField(upload_to=upload_path, verbose_name="Файл")
+    file = models.FileField(upload_to=upload_path, max_length=255, verbose_name="Файл")
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='uploaded_files',
+        verbose_name="Владелец"
+    )
+    blob = models.ForeignKey(
+        FileBlob,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name='uploaded_files',
+        verbose_name="Содержимое"
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата загрузки")
     
     def __str__(self):
@@ -22,13 +71,54 @@ class UploadedFile(models.Model):
         verbose_name_plural = "Загруженные файлы"
         ordering = ['-uploaded_at']
 
+class UploadSession(models.Model):
+    """
+    Возобновляемая загрузка файла по частям (см. uploads.py).
+
+    Части дописываются во временный файл, received — сколько байт уже
+    получено; после finalize создаётся UploadedFile. При прямой загрузке
+    (direct) клиент отправляет файл в хранилище сам, по подписанной ссылке.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='upload_sessions',
+        verbose_name="Пользователь"
+    )
+    filename = models.CharField(max_length=255, verbose_name="Имя файла")
+    size = models.PositiveBigIntegerField(verbose_name="Размер, байт")
+    checksum = models.CharField(max_length=64, blank=True, verbose_name="SHA-256")
+    received = models.PositiveBigIntegerField(default=0, verbose_name="Получено, байт")
+    direct = models.BooleanField(default=False, verbose_name="Прямая загрузка в хранилище")
+    uploaded_file = models.OneToOneField(
+        UploadedFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_session',
+        verbose_name="Загруженный файл"
+    )
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Обновлена")
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+    class Meta:
+        verbose_name = "Сессия загрузки"
+        verbose_name_plural = "Сессии загрузки"
+
 class Builder(models.Model):
     icon = models.URLField(blank=True, verbose_name="Иконка")
-    name = models.CharField(max_length=255, verbose_name="Название")
+    name = models.CharField(max_length=255, unique=True, verbose_name="Название")
     contacts = models.TextField(verbose_name="Контакты")
     phone_number = models.CharField(max_length=20, verbose_name="Номер телефона")
     site = models.URLField(blank=True, verbose_name="Веб-сайт")
     email = models.EmailField(verbose_name="Email")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
 
     def __str__(self):
         return self.name
@@ -78,7 +168,7 @@ class Apartment(models.Model):
     name = models.CharField(max_length=255, verbose_name="Название")
     address = models.TextField(verbose_name="Адрес")
     images = models.JSONField(default=list, verbose_name="Изображения")
-    object_code = models.CharField(max_length=100, verbose_name="Код объекта")
+    object_code = models.CharField(max_length=100, unique=True, verbose_name="Код объекта")
     floor = models.PositiveIntegerField(verbose_name="Этаж")
     building_count = models.PositiveIntegerField(verbose_name="Количество зданий")
     material = models.CharField(max_length=50, choices=MATERIAL_CHOICES, verbose_name="Материал")
@@ -97,6 +187,7 @@ class Apartment(models.Model):
     elevator_type = models.CharField(max_length=50, choices=ELEVATOR_TYPE_CHOICES, verbose_name="Тип лифта")
     apartment_types = models.JSONField(default=list, verbose_name="Типы квартир")
     builder = models.ForeignKey(Builder, on_delete=models.CASCADE, related_name='apartments', verbose_name="Застройщик")
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name="Дата изменения")
     
     def __str__(self):
         return self.name
@@ -105,6 +196,89 @@ class Apartment(models.Model):
         verbose_name = "Квартира"
         verbose_name_plural = "Квартиры"
         ordering = ['name']
+        indexes = [
+            models.Index(fields=['name', 'id'], name='apartment_name_id_idx'),
+            models.Index(fields=['material'], name='apartment_material_idx'),
+            models.Index(fields=['home_type'], name='apartment_home_type_idx'),
+            models.Index(fields=['security'], name='apartment_security_idx'),
+            models.Index(fields=['parking_type'], name='apartment_parking_type_idx'),
+            models.Index(fields=['floor'], name='apartment_floor_idx'),
+            models.Index(fields=['start_date'], name='apartment_start_date_idx'),
+            models.Index(fields=['end_date'], name='apartment_end_date_idx'),
+        ]
+
+    def sync_unit_types(self):
+        """Пересобирает ApartmentUnitType из JSON-поля apartment_types."""
+        ApartmentUnitType.rebuild([self])
+
+
+def _to_decimal(value):
+    try:
+        number = Decimal(str(value))
+    except (InvalidOperation, TypeError, ValueError):
+        return Decimal(0)
+    # NaN и бесконечность не помещаются в DecimalField
+    return number if number.is_finite() else Decimal(0)
+
+
+class ApartmentUnitType(models.Model):
+    """
+    Нормализованная копия элемента Apartment.apartment_types.
+
+    Источником данных остаётся JSON-поле квартиры, таблица пересобирается
+    при каждом сохранении Apartment (см. signals.py) и нужна только для
+    индексированного поиска по комнатности, площади и цене.
+    """
+    apartment = models.ForeignKey(Apartment, on_delete=models.CASCADE, related_name='unit_types', verbose_name="Квартира")
+    label = models.CharField(max_length=255, blank=True, verbose_name="Название")
+    room_count = models.PositiveSmallIntegerField(verbose_name="Количество комнат")
+    min_area = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Минимальная площадь")
+    max_area = models.DecimalField(max_digits=8, decimal_places=2, verbose_name="Максимальная площадь")
+    cost_per_square_meter = models.DecimalField(max_digits=14, decimal_places=2, verbose_name="Стоимость за м²")
+    available_count = models.PositiveIntegerField(default=0, verbose_name="Доступно квартир")
+    min_price = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Минимальная стоимость")
+    max_price = models.DecimalField(max_digits=16, decimal_places=2, verbose_name="Максимальная стоимость")
+
+    def __str__(self):
+        return f"{self.apartment} — {self.label or self.room_count}"
+
+    @classmethod
+    def rebuild(cls, apartments):
+        """Пересобирает типы квартир для набора уже сохранённых квартир."""
+        cls.objects.filter(apartment__in=[apartment.pk for apartment in apartments]).delete()
+        cls.objects.bulk_create(
+            cls.from_json(apartment, data)
+            for apartment in apartments
+            for data in apartment.apartment_types or []
+            if isinstance(data, dict)
+        )
+
+    @classmethod
+    def from_json(cls, apartment, data):
+        min_area = _to_decimal(data.get('min_area'))
+        max_area = _to_decimal(data.get('max_area'))
+        cost = _to_decimal(data.get('cost_per_square_meter'))
+        return cls(
+            apartment=apartment,
+            label=str(data.get('label') or '')[:255],
+            room_count=max(int(_to_decimal(data.get('room_count'))), 0),
+            min_area=min_area,
+            max_area=max_area,
+            cost_per_square_meter=cost,
+            available_count=max(int(_to_decimal(data.get('available_count'))), 0),
+            min_price=min_area * cost,
+            max_price=max_area * cost,
+        )
+
+    class Meta:
+        verbose_name = "Тип квартиры"
+        verbose_name_plural = "Типы квартир"
+        ordering = ['apartment', 'room_count']
+        indexes = [
+            models.Index(fields=['room_count', 'min_price'], name='unit_type_rooms_price_idx'),
+            models.Index(fields=['min_price'], name='unit_type_min_price_idx'),
+            models.Index(fields=['max_area'], name='unit_type_max_area_idx'),
+        ]
 
 
 class Application(models.Model):
@@ -124,6 +298,14 @@ class Application(models.Model):
     status = models.CharField(max_length=50, choices=STATUS_CHOICES, verbose_name="Статус")
     creation_date = models.DateField(verbose_name="Дата создания")
     document_url = models.URLField(blank=True, verbose_name="Ссылка на подтверждающий документ")
+    document = models.ForeignKey(
+        UploadedFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='applications',
+        verbose_name="Подтверждающий документ"
+    )
 
     def __str__(self):
         return f"{self.name} — {self.user}"
@@ -139,6 +321,46 @@ class UserProfile(models.Model):
     phone_number = models.CharField(max_length=20, blank=True, null=True)
     social_categories = models.CharField(max_length=255, blank=True, null=True)
     iin = models.CharField(max_length=255, blank=True, null=True)
+    # Растёт при отзыве токенов; токены с другой версией не принимаются
+    token_version = models.PositiveIntegerField(default=0, verbose_name="Версия токенов")
+
+    def __str__(self):
+        return f"Профиль: {self.user.username}"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача очереди в БД (см. jobs.py, команда run_workers).
+
+    name — имя зарегистрированной функции, payload — её аргументы.
+    Задача берётся воркером не раньше run_after; при ошибке повторяется
+    с экспоненциальной задержкой, пока attempts < max_attempts.
+    """
+    STATUS_CHOICES = (
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    )
+
+    name = models.CharField(max_length=100, verbose_name="Задача")
+    payload = models.JSONField(default=dict, blank=True, verbose_name="Аргументы")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name="Статус")
+    attempts = models.PositiveIntegerField(default=0, verbose_name="Попыток")
+    max_attempts = models.PositiveIntegerField(default=5, verbose_name="Максимум попыток")
+    run_after = models.DateTimeField(default=timezone.now, verbose_name="Выполнить после")
+    locked_by = models.CharField(max_length=100, blank=True, verbose_name="Воркер")
+    locked_at = models.DateTimeField(null=True, blank=True, verbose_name="Взята в работу")
+    last_error = models.TextField(blank=True, verbose_name="Последняя ошибка")
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name="Создана")
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Обновлена")
 
     def __str__(self):
-        return f"Профиль: {self.user.username}"
\ No newline at end of file
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='job_queue_idx'),
+        ]
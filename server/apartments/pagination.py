@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination
+
+
+class ApartmentCursorPagination(CursorPagination):
+    """
+    Курсорная пагинация каталога квартир.
+
+    Стоимость запроса страницы не зависит от её номера: вместо OFFSET
+    используется условие по индексированным полям (name, id). Результаты
+    полнотекстового поиска (?q=) упорядочиваются по релевантности.
+    """
+    ordering = ('name', 'id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+    def get_ordering(self, request, queryset, view):
+        if 'search_rank' in queryset.query.annotations:
+            return ('-search_rank', 'id')
+        return super().get_ordering(request, queryset, view)
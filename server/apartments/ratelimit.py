@@ -0,0 +1,163 @@
+"""
+Защита входа от перебора паролей.
+
+Каждая проверка пароля — полный PBKDF2, поэтому поток попыток входа может
+занять все воркеры. login_view до хэширования:
+
+1. проверяет число неудачных попыток с этого IP и для этого имени в
+   скользящем окне LOGIN_RATE_WINDOW и сразу отвечает 429, если лимит
+   исчерпан. Счётчики лежат в кэше LOGIN_RATE_CACHE_ALIAS: по умолчанию
+   файловом, общем для воркеров хоста, для нескольких узлов — общий бэкенд
+   (Redis, Memcached). За обратным прокси адрес клиента берётся из
+   X-Forwarded-For (client_ip, TRUSTED_PROXY_COUNT);
+2. занимает один из LOGIN_HASH_SLOTS слотов хэширования на хосте. Слоты —
+   блокировки flock на файлах, общие для всех воркеров; если слот не
+   освободился за LOGIN_HASH_WAIT секунд, ответ 503. Так вход занимает
+   не больше заданного числа ядер, а каталог продолжает обслуживаться.
+"""
+import hashlib
+import math
+import os
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+
+try:
+    import fcntl
+except ImportError:
+    # Нет flock (Windows): слоты хэширования не ограничиваются
+    fcntl = None
+
+
+def get_cache():
+    return caches[getattr(settings, 'LOGIN_RATE_CACHE_ALIAS', 'default')]
+
+
+def client_ip(request):
+    """
+    Адрес клиента с учётом TRUSTED_PROXY_COUNT доверенных прокси перед
+    приложением. Каждый прокси дописывает в X-Forwarded-For адрес, с которого
+    пришёл запрос, поэтому клиент — запись, добавленная самым внешним из них;
+    всё левее неё клиент мог прислать сам.
+    """
+    remote = request.META.get('REMOTE_ADDR', '')
+    hops = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    if not hops:
+        return remote
+    forwarded = request.META.get('HTTP_X_FORWARDED_FOR', '')
+    chain = [address.strip() for address in forwarded.split(',') if address.strip()] + [remote]
+    # Цепочка короче числа прокси: запрос пришёл в обход части из них
+    return chain[max(len(chain) - 1 - hops, 0)]
+
+
+class SlidingWindow:
+    """
+    Счётчик событий в скользящем окне: текущее окно фиксированной длины
+    плюс предыдущее с весом оставшейся в окне доли. Два ключа кэша на
+    идентификатор, точность достаточна для ограничения частоты.
+    """
+
+    def __init__(self, scope, limit, window):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+
+    def _keys(self, ident, now):
+        digest = hashlib.md5(ident.encode()).hexdigest()
+        index = int(now // self.window)
+        base = f'ratelimit:{self.scope}:{digest}'
+        return f'{base}:{index}', f'{base}:{index - 1}', now % self.window
+
+    def count(self, ident, now=None):
+        current, previous, elapsed = self._keys(ident, time.time() if now is None else now)
+        values = get_cache().get_many([current, previous])
+        return values.get(previous, 0) * (1 - elapsed / self.window) + values.get(current, 0)
+
+    def retry_after(self, ident, now=None):
+        """Через сколько секунд счётчик опустится ниже лимита; 0 — уже можно."""
+        now = time.time() if now is None else now
+        if self.count(ident, now) < self.limit:
+            return 0
+        current, previous, elapsed = self._keys(ident, now)
+        values = get_cache().get_many([current, previous])
+        if values.get(current, 0) >= self.limit:
+            # Лимит исчерпан в текущем окне: ждать, пока его вес не спадёт
+            return math.ceil(self.window - elapsed + self.window * (1 - self.limit / values[current]))
+        # Вес предыдущего окна убывает линейно до конца текущего
+        excess = self.limit - values.get(current, 0)
+        return max(1, math.ceil((1 - excess / values[previous]) * self.window - elapsed))
+
+    def hit(self, ident, now=None):
+        current, _, _ = self._keys(ident, time.time() if now is None else now)
+        cache = get_cache()
+        cache.add(current, 0, timeout=2 * self.window)
+        try:
+            cache.incr(current)
+        except ValueError:
+            # Ключ мог быть вытеснен между add и incr
+            cache.set(current, 1, timeout=2 * self.window)
+
+    def reset(self, ident, now=None):
+        current, previous, _ = self._keys(ident, time.time() if now is None else now)
+        get_cache().delete_many([current, previous])
+
+
+def _limiters(ip, username):
+    window = settings.LOGIN_RATE_WINDOW
+    return [
+        (SlidingWindow('login-ip', settings.LOGIN_RATE_LIMIT_PER_IP, window), ip),
+        (SlidingWindow('login-username', settings.LOGIN_RATE_LIMIT_PER_USERNAME, window), username.lower()),
+    ]
+
+
+def login_retry_after(ip, username):
+    """Сколько секунд ждать до следующей попытки входа; 0 — попытка разрешена."""
+    return max(limiter.retry_after(ident) for limiter, ident in _limiters(ip, username))
+
+
+def login_failed(ip, username):
+    for limiter, ident in _limiters(ip, username):
+        limiter.hit(ident)
+
+
+def login_succeeded(ip, username):
+    # Счётчик по IP не сбрасывается: с одного адреса могут подбирать много имён
+    limiter, ident = _limiters(ip, username)[1]
+    limiter.reset(ident)
+
+
+@contextmanager
+def hashing_slot():
+    """
+    Занимает слот хэширования; возвращает False, если за LOGIN_HASH_WAIT
+    секунд все LOGIN_HASH_SLOTS слотов заняты. 0 слотов — без ограничения.
+    """
+    slots = getattr(settings, 'LOGIN_HASH_SLOTS', 0)
+    if not slots or fcntl is None:
+        yield True
+        return
+
+    lock_dir = settings.LOGIN_HASH_LOCK_DIR
+    os.makedirs(lock_dir, exist_ok=True)
+    deadline = time.monotonic() + settings.LOGIN_HASH_WAIT
+    while True:
+        for slot in range(slots):
+            f = open(os.path.join(lock_dir, f'slot-{slot}.lock'), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            # Блокировка снимается и при падении процесса: файл закрывает ОС
+            try:
+                yield True
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+                f.close()
+            return
+        if time.monotonic() >= deadline:
+            yield False
+            return
+        time.sleep(0.01)
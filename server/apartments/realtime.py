@@ -0,0 +1,164 @@
+"""
+Push-уведомления об изменении заявок (Socket.IO поверх WebSocket).
+
+Клиент подключается к /socket.io/ и передаёт access-токен в auth: {token}.
+Соединение попадает в комнату пользователя; после сохранения или удаления
+его заявки (signals.py) всем его соединениям уходит событие application
+(данные как в /api/applications/) или application_deleted ({id}). Опрашивать
+/api/applications/ не нужно: клиент перечитывает список по событию.
+После смены пароля соединения получают tokens_revoked и выводятся из комнаты.
+
+Событие может возникнуть в любом процессе: в воркере uvicorn, синхронном
+воркере, run_workers, админке. Доставка между процессами — локальная
+замена pub/sub брокера: каждый воркер с подключениями слушает свой
+unix-датаграммный сокет в REALTIME_PUBSUB_DIR, publish() отправляет
+сообщение во все сокеты каталога. Работает в пределах одного хоста; для
+нескольких хостов LocalPubSubManager заменяется менеджером python-socketio
+для Redis/Kafka с тем же форматом сообщений.
+
+Сервер доступен только под ASGI (SERVER_MODE=asgi, см. asgi.py) и только
+с транспортом websocket: long-polling потребовал бы привязки клиента к
+одному воркеру.
+"""
+import asyncio
+import glob
+import json
+import logging
+import os
+import socket
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import authentication
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_SIZE = 64 * 1024
+# Unix-датаграммных сокетов нет, например, в Windows: рассылка только внутри процесса
+PUBSUB_AVAILABLE = hasattr(socket, 'AF_UNIX')
+
+
+def user_room(user_id):
+    return f'user:{user_id}'
+
+
+def _pubsub_dir():
+    return settings.REALTIME_PUBSUB_DIR
+
+
+def publish(message):
+    """Отправляет сообщение всем слушающим процессам хоста. Не блокирует."""
+    if not PUBSUB_AVAILABLE:
+        return
+    data = json.dumps(message, cls=DjangoJSONEncoder).encode()
+    if len(data) > MAX_MESSAGE_SIZE:
+        logger.error('Realtime message too large (%s bytes), dropped', len(data))
+        return
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.setblocking(False)
+        for path in glob.glob(os.path.join(_pubsub_dir(), '*.sock')):
+            try:
+                sock.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Процесс завершился, не удалив сокет
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            except BlockingIOError:
+                logger.warning('Realtime listener %s is not keeping up, message dropped', path)
+
+
+def emit(event, data, room):
+    """Событие для клиентов в комнате room, из любого процесса (и синхронного кода)."""
+    publish({'method': 'emit', 'event': event, 'data': data, 'namespace': '/', 'room': room,
+             'skip_sid': None, 'callback': None, 'host_id': None})
+
+
+def application_changed(application):
+    from .serializers import ApplicationSerializer
+
+    emit('application', ApplicationSerializer(application).data, user_room(application.user_id))
+
+
+def application_deleted(application):
+    emit('application_deleted', {'id': application.pk}, user_room(application.user_id))
+
+
+def tokens_revoked(user_id):
+    room = user_room(user_id)
+    emit('tokens_revoked', {}, room)
+    publish({'method': 'close_room', 'room': room, 'namespace': '/', 'host_id': None})
+
+
+class LocalPubSubManager(AsyncPubSubManager):
+    """Менеджер клиентов python-socketio, получающий сообщения через publish()."""
+    name = 'localpubsub'
+
+    def _socket_path(self):
+        return os.path.join(_pubsub_dir(), f'{self.host_id}.sock')
+
+    async def _publish(self, data):
+        publish(data)
+
+    async def _listen(self):
+        if not PUBSUB_AVAILABLE:
+            # Сообщений из других процессов не будет
+            await asyncio.Future()
+        os.makedirs(_pubsub_dir(), exist_ok=True)
+        path = self._socket_path()
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(path)
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                data = await loop.sock_recv(sock, MAX_MESSAGE_SIZE)
+                try:
+                    yield json.loads(data)
+                except ValueError:
+                    logger.warning('Malformed realtime message ignored')
+        finally:
+            sock.close()
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+def _cors_origins():
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        return '*'
+    return list(getattr(settings, 'CORS_ALLOWED_ORIGINS', []))
+
+
+sio = socketio.AsyncServer(
+    async_mode='asgi',
+    client_manager=LocalPubSubManager(),
+    transports=['websocket'],
+    cors_allowed_origins=_cors_origins(),
+)
+
+
+@sio.event
+async def connect(sid, environ, auth):
+    token = (auth or {}).get('token')
+    if not isinstance(token, str) or not token:
+        raise socketio.exceptions.ConnectionRefusedError('Требуется токен')
+    backend = authentication.CachedJWTAuthentication()
+    try:
+        await authentication.async_sync_revocations()
+        user = await backend.aget_user(backend.get_validated_token(token.encode()))
+    except (AuthenticationFailed, InvalidToken, TokenError):
+        raise socketio.exceptions.ConnectionRefusedError('Недействительный токен')
+    await sio.enter_room(sid, user_room(user.pk))
+
+
+def asgi_app(django_app):
+    """ASGI-приложение: /socket.io/ обслуживает sio, остальное — Django."""
+    return socketio.ASGIApp(sio, other_asgi_app=django_app)
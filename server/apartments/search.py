@@ -0,0 +1,132 @@
+"""
+Полнотекстовый поиск по квартирам.
+
+Индекс хранится в отдельной таблице, которую создаёт миграция 0013:
+на SQLite это виртуальная таблица FTS5, на PostgreSQL — таблица с колонкой
+tsvector и GIN-индексом. Индекс обновляется сигналами при сохранении и
+удалении Apartment (см. signals.py). На других СУБД поиск сводится к icontains.
+
+Морфология русского и казахского языков учитывается упрощённо: у слов
+запроса отбрасываются типичные окончания, и оставшаяся основа ищется как
+префикс. Буква «ё» приравнивается к «е».
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+SQLITE_TABLE = 'apartments_apartment_search'
+POSTGRES_TABLE = 'apartments_apartmentsearch'
+
+# Веса полей: название важнее адреса, адрес важнее описания
+SQLITE_WEIGHTS = (10.0, 5.0, 1.0)
+POSTGRES_CONFIG = 'russian'
+
+ENDINGS = sorted((
+    # Русские падежные и родовые окончания
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ая', 'яя', 'ое', 'ее',
+    'ые', 'ие', 'ой', 'ей', 'ом', 'ем', 'ах', 'ях', 'ов', 'ев', 'ам', 'ям',
+    'а', 'я', 'ы', 'и', 'о', 'е', 'у', 'ю', 'ь',
+    # Казахские окончания множественного числа и падежей
+    'лар', 'лер', 'дар', 'дер', 'тар', 'тер', 'ның', 'нің', 'дың', 'дің', 'тың', 'тің',
+    'ға', 'ге', 'қа', 'ке', 'да', 'де', 'та', 'те',
+), key=len, reverse=True)
+MIN_STEM_LENGTH = 4
+
+WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return (text or '').lower().replace('ё', 'е')
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def query_terms(query):
+    return [stem(word) for word in WORD_RE.findall(normalize(query))]
+
+
+def index_apartment(apartment):
+    index_apartments([apartment])
+
+
+def index_apartments(apartments):
+    """Добавляет или обновляет записи индекса для набора квартир."""
+    rows = [
+        (apartment.pk, normalize(apartment.name), normalize(apartment.address),
+         normalize(apartment.description))
+        for apartment in apartments
+    ]
+    if not rows:
+        return
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.executemany(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [row[:1] for row in rows])
+            cursor.executemany(
+                f'INSERT INTO {SQLITE_TABLE} (rowid, name, address, description) VALUES (%s, %s, %s, %s)',
+                rows,
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.executemany(
+                f'INSERT INTO {POSTGRES_TABLE} (apartment_id, document) VALUES (%s, '
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'A') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'B') || "
+                f"setweight(to_tsvector('{POSTGRES_CONFIG}', %s), 'C')) "
+                f'ON CONFLICT (apartment_id) DO UPDATE SET document = EXCLUDED.document',
+                rows,
+            )
+
+
+def remove_apartment(pk):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'DELETE FROM {SQLITE_TABLE} WHERE rowid = %s', [pk])
+        elif connection.vendor == 'postgresql':
+            cursor.execute(f'DELETE FROM {POSTGRES_TABLE} WHERE apartment_id = %s', [pk])
+
+
+def search(queryset, query):
+    """
+    Фильтрует queryset квартир по запросу и добавляет аннотацию search_rank
+    (чем больше, тем релевантнее).
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset
+
+    table = queryset.model._meta.db_table
+    if connection.vendor == 'sqlite':
+        match = ' AND '.join(f'"{term}"*' for term in terms)
+        weights = ', '.join(str(weight) for weight in SQLITE_WEIGHTS)
+        ids = RawSQL(f'SELECT rowid FROM {SQLITE_TABLE} WHERE {SQLITE_TABLE} MATCH %s', [match])
+        rank = RawSQL(
+            f'SELECT -bm25({SQLITE_TABLE}, {weights}) FROM {SQLITE_TABLE} '
+            f'WHERE {SQLITE_TABLE} MATCH %s AND rowid = {table}.id',
+            [match], output_field=FloatField(),
+        )
+    elif connection.vendor == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        ids = RawSQL(
+            f"SELECT apartment_id FROM {POSTGRES_TABLE} "
+            f"WHERE document @@ to_tsquery('{POSTGRES_CONFIG}', %s)",
+            [tsquery],
+        )
+        rank = RawSQL(
+            f"SELECT ts_rank(document, to_tsquery('{POSTGRES_CONFIG}', %s))::double precision "
+            f'FROM {POSTGRES_TABLE} WHERE apartment_id = {table}.id',
+            [tsquery], output_field=FloatField(),
+        )
+    else:
+        condition = Q()
+        for term in terms:
+            condition &= (Q(name__icontains=term) | Q(address__icontains=term)
+                          | Q(description__icontains=term))
+        return queryset.filter(condition)
+
+    return queryset.filter(pk__in=ids).annotate(search_rank=rank)
@@ -1,18 +1,48 @@
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.urls import reverse
 from rest_framework import serializers
 
-from .models import Apartment, Builder, UploadedFile, Application, UserProfile, User
+from . import images, uploads
+from .models import Apartment, Builder, UploadedFile, UploadSession, Application, UserProfile, User
 
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField(max_length=150)
     password = serializers.CharField(max_length=128, write_only=True)
 
+class DynamicFieldsMixin:
+    """
+    Выбор полей через query-параметры при чтении.
+
+    ?fields=a,b оставляет только перечисленные поля, ?expand=c,d добавляет
+    поля к default_fields сериализатора. Без default_fields по умолчанию
+    выводятся все поля.
+    """
+    default_fields = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method != 'GET':
+            return
+
+        def param(name):
+            return {f.strip() for f in request.query_params.get(name, '').split(',') if f.strip()}
+
+        allowed = param('fields')
+        if not allowed:
+            allowed = set(self.default_fields or self.fields) | param('expand')
+        for field_name in set(self.fields) - allowed:
+            self.fields.pop(field_name)
+
 class BuilderSerializer(serializers.ModelSerializer):
     class Meta:
         model = Builder
         fields = ['icon', 'name', 'contacts', 'phone_number', 'site', 'email']
 
-class ApartmentSerializer(serializers.ModelSerializer):
+class ApartmentSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     builder = BuilderSerializer(read_only=True)
     builder_id = serializers.PrimaryKeyRelatedField(
         queryset=Builder.objects.all(),
@@ -28,25 +58,141 @@ class ApartmentSerializer(serializers.ModelSerializer):
                  'home_type', 'bathroom_type', 'security', 'parking_type', 'elevator_type',
                  'apartment_types', 'builder', 'builder_id']
 
+    UNIT_TYPE_NUMBERS = ('room_count', 'min_area', 'max_area', 'cost_per_square_meter', 'available_count')
+
+    def validate_apartment_types(self, value):
+        # Из JSON и CSV приходят NaN и Infinity: Decimal их принимает, а
+        # ApartmentUnitType сохранить не сможет
+        for item in value if isinstance(value, list) else []:
+            if not isinstance(item, dict):
+                continue
+            for key in self.UNIT_TYPE_NUMBERS:
+                try:
+                    number = Decimal(str(item[key]))
+                except (KeyError, InvalidOperation):
+                    continue
+                if not number.is_finite():
+                    raise serializers.ValidationError(f'{key}: ожидается конечное число.')
+        return value
+
+class ApartmentListSerializer(ApartmentSerializer):
+    """
+    Компактное представление квартиры для карточек в списке.
+
+    Цены берутся из аннотаций queryset'а (см. ApartmentViewSet.get_queryset),
+    остальные поля ApartmentSerializer доступны через ?expand= или ?fields=.
+    """
+    default_fields = ['id', 'name', 'address', 'thumbnail', 'min_price', 'max_price',
+                      'min_cost_per_square_meter']
+
+    thumbnail = serializers.SerializerMethodField()
+    min_price = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False, read_only=True)
+    max_price = serializers.DecimalField(max_digits=16, decimal_places=2, coerce_to_string=False, read_only=True)
+    min_cost_per_square_meter = serializers.DecimalField(
+        max_digits=14, decimal_places=2, coerce_to_string=False, read_only=True)
+
+    class Meta(ApartmentSerializer.Meta):
+        fields = ApartmentSerializer.Meta.fields + ['thumbnail', 'min_price', 'max_price',
+                                                    'min_cost_per_square_meter']
+
+    def get_thumbnail(self, obj):
+        return obj.images[0] if obj.images else None
+
 class FileUploadSerializer(serializers.ModelSerializer):
     file_url = serializers.SerializerMethodField()
+    download_url = serializers.SerializerMethodField(
+        help_text="Адрес для скачивания с проверкой доступа и поддержкой Range"
+    )
+    derivatives = serializers.SerializerMethodField(
+        help_text="URL уменьшенных копий и WebP для изображений (строятся в фоне после загрузки)"
+    )
     
     class Meta:
         model = UploadedFile
-        fields = ['id', 'file', 'uploaded_at', 'file_url']
-        read_only_fields = ['uploaded_at', 'file_url']
+        fields = ['id', 'file', 'uploaded_at', 'file_url', 'download_url', 'derivatives']
+        read_only_fields = ['uploaded_at', 'file_url', 'download_url', 'derivatives']
     
     def get_file_url(self, obj):
         request = self.context.get('request')
         file_url = obj.file.url
         return request.build_absolute_uri(file_url) if request else file_url
 
+    def get_download_url(self, obj):
+        request = self.context.get('request')
+        url = reverse('uploadedfile-download', args=[obj.pk])
+        return request.build_absolute_uri(url) if request else url
+
+    def get_derivatives(self, obj):
+        return images.derivative_urls(obj.blob, self.context.get('request'))
+
+    def create(self, validated_data):
+        # Одинаковое содержимое хранится один раз (см. uploads.save_upload)
+        user = getattr(self.context.get('request'), 'user', None)
+        return uploads.save_upload(validated_data['file'], user=user if user and user.is_authenticated else None)
+
+    def update(self, instance, validated_data):
+        if 'file' in validated_data:
+            return uploads.save_upload(validated_data['file'], instance)
+        return instance
+
+class UploadSessionSerializer(serializers.ModelSerializer):
+    checksum = serializers.RegexField(r'^[0-9a-fA-F]{64}$', help_text="SHA-256 файла в hex")
+    file = serializers.SerializerMethodField(help_text="Готовый файл, если такое содержимое уже загружалось")
+
+    class Meta:
+        model = UploadSession
+        fields = ['id', 'filename', 'size', 'checksum', 'received', 'created_at', 'file']
+        read_only_fields = ['received', 'created_at']
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f'Размер файла должен быть от 1 до {settings.UPLOAD_MAX_SIZE} байт.')
+        return value
+
+    def validate_checksum(self, value):
+        return value.lower()
+
+    def get_file(self, obj):
+        file_obj = obj.uploaded_file
+        if file_obj is None:
+            return None
+        request = self.context.get('request')
+        return {
+            'id': file_obj.pk,
+            'file_url': request.build_absolute_uri(file_obj.file.url) if request else file_obj.file.url,
+            'path': file_obj.file.name,
+        }
+
+class DirectUploadSerializer(UploadSessionSerializer):
+    upload = serializers.SerializerMethodField(
+        help_text="Куда отправить файл: method, url, headers, expires_at; null, если файл уже хранится"
+    )
+
+    class Meta(UploadSessionSerializer.Meta):
+        fields = UploadSessionSerializer.Meta.fields + ['upload']
+
+    def get_upload(self, obj):
+        if obj.uploaded_file_id is not None:
+            return None
+        return uploads.direct_upload_target(obj, self.context['request'])
+
 class ApplicationSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField(read_only=True)
+    document = serializers.PrimaryKeyRelatedField(
+        queryset=UploadedFile.objects.all(), required=False, allow_null=True,
+        help_text="Загруженный пользователем файл (id из /api/direct-uploads/ или /api/uploads/)"
+    )
 
     class Meta:
         model = Application
-        fields = ['id', 'user', 'name', 'status', 'creation_date', 'document_url']
+        fields = ['id', 'user', 'name', 'status', 'creation_date', 'document_url', 'document']
+
+    def validate_document(self, value):
+        # Владелец записан в самом файле: сессии загрузки удаляются
+        # cleanup_upload_sessions, а у multipart-загрузок их нет вовсе
+        if value is not None and value.user_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Файл загружен другим пользователем.')
+        return value
 
 class NestedUserSerializer(serializers.ModelSerializer):
     class Meta:
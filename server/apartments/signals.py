@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 from django.contrib.auth import get_user_model
-from .models import UserProfile
+from baspana_project.metrics import UPLOAD_BYTES, UPLOAD_SIZE
+from . import authentication, cache, images, realtime, search, uploads
+from .models import Apartment, Application, Builder, FileBlob, UploadedFile, UserProfile
 
 User = get_user_model()
 
@@ -10,4 +13,63 @@ def create_or_update_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
     else:
-        instance.profile.save()
\ No newline at end of file
+        instance.profile.save()
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_cached_user(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.pk)
+
+@receiver([post_save, post_delete], sender=UserProfile)
+def invalidate_cached_profile(sender, instance, **kwargs):
+    authentication.invalidate_user(instance.user_id)
+
+@receiver(post_save, sender=Apartment)
+def sync_apartment_unit_types(sender, instance, update_fields=None, **kwargs):
+    if update_fields is None or 'apartment_types' in update_fields:
+        instance.sync_unit_types()
+
+@receiver([post_save, post_delete], sender=Apartment)
+def invalidate_apartment_cache(sender, **kwargs):
+    cache.invalidate('apartments')
+
+@receiver([post_save, post_delete], sender=Builder)
+def invalidate_builder_cache(sender, **kwargs):
+    cache.invalidate('builders')
+
+@receiver(post_save, sender=Apartment)
+def update_apartment_search_index(sender, instance, **kwargs):
+    search.index_apartment(instance)
+
+@receiver(post_delete, sender=Apartment)
+def remove_apartment_from_search_index(sender, instance, **kwargs):
+    search.remove_apartment(instance.pk)
+
+@receiver(post_save, sender=UploadedFile)
+def count_uploaded_bytes(sender, instance, created, **kwargs):
+    if created:
+        UPLOAD_BYTES.inc(instance.file.size)
+        UPLOAD_SIZE.observe(instance.file.size)
+
+@receiver(post_save, sender=UploadedFile)
+def reference_file_blob(sender, instance, created, **kwargs):
+    # Загрузки (uploads.link_blob) учитывают ссылку сами, ещё до вставки
+    if created and instance.blob_id and not getattr(instance, 'blob_referenced', False):
+        uploads.reference_blob(instance.blob_id)
+
+@receiver(post_delete, sender=UploadedFile)
+def release_file_blob(sender, instance, **kwargs):
+    uploads.release_blob(instance.blob_id)
+
+@receiver(post_save, sender=FileBlob)
+def schedule_image_derivatives(sender, instance, created, **kwargs):
+    if created and images.is_image(instance.file.name):
+        images.schedule(instance)
+
+@receiver(post_save, sender=Application)
+def push_application_change(sender, instance, **kwargs):
+    # Клиент перечитает список, поэтому событие уходит после фиксации транзакции
+    transaction.on_commit(lambda: realtime.application_changed(instance))
+
+@receiver(post_delete, sender=Application)
+def push_application_deletion(sender, instance, **kwargs):
+    transaction.on_commit(lambda: realtime.application_deleted(instance))
@@ -0,0 +1,268 @@
+"""
+Хранилище загруженных файлов: локальный диск или S3-совместимое объектное
+хранилище (AWS S3, MinIO, ...).
+
+Бэкенд выбирается переменной окружения STORAGE_BACKEND (см. STORAGES в
+settings.py). Код загрузок работает только через default_storage, поэтому
+при s3 любой узел приложения отдаёт любой файл без общего диска.
+
+S3Storage сохраняет файлы через TransferManager boto3: файл больше
+multipart_threshold отправляется multipart-загрузкой частями по
+multipart_chunksize в max_concurrency потоков. Чтение идёт через локальный
+дисковый кэш (cache_dir): объект скачивается один раз (тоже параллельно, по
+диапазонам) и дальше открывается с диска. Имена blob'ов и их производных
+определяются содержимым, так что кэш не устаревает; когда он превышает
+cache_max_size, удаляются файлы, которые дольше всего не читали.
+"""
+import base64
+import mimetypes
+import os
+import posixpath
+import tempfile
+import time
+import uuid
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import Storage
+from django.utils._os import safe_join
+from django.utils.deconstruct import deconstructible
+from django.utils.functional import cached_property
+
+MB = 1024 * 1024
+
+
+def _touch(path):
+    # Время изменения — отметка последнего чтения для вытеснения; время
+    # файловой системы бывает грубым, поэтому ставим точное явно
+    now = time.time_ns()
+    try:
+        os.utime(path, ns=(now, now))
+    except FileNotFoundError:
+        pass
+
+
+def _not_found(error):
+    return error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound')
+
+
+@deconstructible
+class S3Storage(Storage):
+    def __init__(self, bucket, endpoint_url=None, region_name=None, access_key=None, secret_key=None,
+                 location='', querystring_expire=3600, multipart_threshold=8 * MB, multipart_chunksize=8 * MB,
+                 max_concurrency=4, cache_dir=None, cache_max_size=1024 * MB):
+        self.bucket = bucket
+        self.endpoint_url = endpoint_url
+        self.region_name = region_name
+        self.access_key = access_key
+        self.secret_key = secret_key
+        self.location = location.strip('/')
+        self.querystring_expire = querystring_expire
+        self.multipart_threshold = multipart_threshold
+        self.multipart_chunksize = multipart_chunksize
+        self.max_concurrency = max_concurrency
+        self.cache_dir = cache_dir
+        self.cache_max_size = cache_max_size
+
+    @cached_property
+    def client(self):
+        return boto3.client(
+            's3',
+            endpoint_url=self.endpoint_url,
+            region_name=self.region_name,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            config=Config(signature_version='s3v4', max_pool_connections=max(10, self.max_concurrency)),
+        )
+
+    @cached_property
+    def transfer_config(self):
+        return TransferConfig(
+            multipart_threshold=self.multipart_threshold,
+            multipart_chunksize=self.multipart_chunksize,
+            max_concurrency=self.max_concurrency,
+        )
+
+    def _key(self, name):
+        name = name.replace('\\', '/')
+        if name.startswith('/') or '..' in name.split('/'):
+            raise SuspiciousFileOperation(f'Недопустимое имя файла {name!r}')
+        return posixpath.join(self.location, name) if self.location else name
+
+    def _head(self, name):
+        return self.client.head_object(Bucket=self.bucket, Key=self._key(name))
+
+    def _save(self, name, content):
+        if hasattr(content, 'seek'):
+            content.seek(0)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        self.client.upload_fileobj(content, self.bucket, self._key(name),
+                                   ExtraArgs={'ContentType': content_type}, Config=self.transfer_config)
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Объект перезаписывается: имена blob'ов и так уникальны по содержимому
+        if max_length is not None and len(name) > max_length:
+            raise SuspiciousFileOperation(f'Имя файла {name!r} длиннее {max_length} символов')
+        return name
+
+    def _download(self, name, path):
+        """Скачивает объект в path атомарно: читатели не видят недокачанный файл."""
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        partial = f'{path}.{uuid.uuid4().hex}.part'
+        try:
+            self.client.download_file(self.bucket, self._key(name), partial, Config=self.transfer_config)
+            os.replace(partial, path)
+        except ClientError as e:
+            if _not_found(e):
+                raise FileNotFoundError(name) from e
+            raise
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _cache_path(self, name):
+        return safe_join(self.cache_dir, self._key(name))
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode or '+' in mode:
+            raise ValueError('S3Storage открывает файлы только для чтения')
+        if self.cache_dir is None:
+            f = tempfile.NamedTemporaryFile()
+            try:
+                self.client.download_fileobj(self.bucket, self._key(name), f, Config=self.transfer_config)
+            except ClientError as e:
+                f.close()
+                if _not_found(e):
+                    raise FileNotFoundError(name) from e
+                raise
+            f.seek(0)
+            return File(f, name=name)
+
+        path = self._cache_path(name)
+        try:
+            f = open(path, 'rb')
+        except FileNotFoundError:
+            self._download(name, path)
+            f = open(path, 'rb')
+            _touch(path)
+            self.evict()
+        else:
+            _touch(path)
+        return File(f, name=name)
+
+    def evict(self):
+        """Удаляет давно не читавшиеся файлы, пока кэш больше cache_max_size."""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for filename in files:
+                if filename.endswith('.part'):
+                    continue
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        for _, size, path in sorted(entries):
+            if total <= self.cache_max_size:
+                break
+            try:
+                # Уже открытые файлы дочитываются: в POSIX удаление их не прерывает
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def exists(self, name):
+        try:
+            self._head(name)
+        except ClientError as e:
+            if _not_found(e):
+                return False
+            raise
+        return True
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(name))
+        if self.cache_dir is not None:
+            try:
+                os.remove(self._cache_path(name))
+            except FileNotFoundError:
+                pass
+
+    def size(self, name):
+        if self.cache_dir is not None:
+            try:
+                return os.path.getsize(self._cache_path(name))
+            except FileNotFoundError:
+                pass
+        return self._head(name)['ContentLength']
+
+    def get_modified_time(self, name):
+        return self._head(name)['LastModified']
+
+    def listdir(self, path):
+        prefix = (self._key(path) if path else self.location).rstrip('/')
+        prefix = prefix + '/' if prefix else ''
+        directories, files = [], []
+        paginator = self.client.get_paginator('list_objects_v2')
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=prefix, Delimiter='/'):
+            directories += [p['Prefix'][len(prefix):].rstrip('/') for p in page.get('CommonPrefixes', [])]
+            files += [obj['Key'][len(prefix):] for obj in page.get('Contents', [])]
+        return directories, files
+
+    def presigned_put(self, name, expires, size=None, sha256=None):
+        """
+        Подписанная ссылка, по которой клиент сам кладёт объект name запросом
+        PUT, и заголовки, которые он должен передать. Размер (Content-Length)
+        и SHA-256 входят в подпись: объект другого размера или содержимого
+        хранилище не примет.
+        """
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        params = {'Bucket': self.bucket, 'Key': self._key(name), 'ContentType': content_type}
+        headers = {'Content-Type': content_type}
+        if size is not None:
+            # Заголовок браузер выставляет сам по длине тела
+            params['ContentLength'] = size
+        if sha256 is not None:
+            checksum = base64.b64encode(bytes.fromhex(sha256)).decode()
+            params['ChecksumSHA256'] = headers['x-amz-checksum-sha256'] = checksum
+        url = self.client.generate_presigned_url('put_object', Params=params, ExpiresIn=expires)
+        return url, headers
+
+    def stored_sha256(self, name):
+        """
+        SHA-256 объекта в hex, проверенный хранилищем при загрузке, или None,
+        если объект загружен без контрольной суммы (или по частям).
+        """
+        checksum = self.client.head_object(Bucket=self.bucket, Key=self._key(name),
+                                           ChecksumMode='ENABLED').get('ChecksumSHA256')
+        if not checksum or '-' in checksum:
+            return None
+        return base64.b64decode(checksum).hex()
+
+    def move(self, old_name, new_name):
+        """Переносит объект копированием внутри хранилища, байты не идут через приложение."""
+        self.client.copy({'Bucket': self.bucket, 'Key': self._key(old_name)}, self.bucket, self._key(new_name),
+                         Config=self.transfer_config)
+        if self.cache_dir is not None:
+            new_path = self._cache_path(new_name)
+            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            try:
+                os.replace(self._cache_path(old_name), new_path)
+            except FileNotFoundError:
+                pass
+        self.delete(old_name)
+        return new_name
+
+    def url(self, name):
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self._key(name)}, ExpiresIn=self.querystring_expire,
+        )
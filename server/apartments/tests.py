@@ -1,3 +1,1611 @@
-from django.test import TestCase
+import asyncio
+import csv
+import datetime
+import hashlib
+import io
+import itertools
+import json
+import os
+import socket
+import tempfile
+import time
+from contextlib import nullcontext
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.files.base import ContentFile
+from django.core.management import call_command
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve
+import requests
+import socketio
+from PIL import Image
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+try:
+    from moto import mock_s3
+except ImportError:
+    mock_s3 = None
+
+from baspana_project import metrics
+from baspana_project.metrics import REGISTRY
+from baspana_project.profiling import RequestProfile
+
+from . import authentication, cache, images, importer, jobs, ratelimit, realtime, search, uploads
+from .models import Apartment, ApartmentUnitType, Application, Builder, FileBlob, Job, UploadedFile, UploadSession, \
+    UserProfile
+from .management import benchmark
+from .storage import S3Storage
+
+User = get_user_model()
+
+
+def make_builder(**kwargs):
+    data = {
+        'name': 'BI Group',
+        'contacts': 'Астана',
+        'phone_number': '+7 (717) 269-00-00',
+        'email': 'info@bi.group',
+    }
+    data.update(kwargs)
+    return Builder.objects.create(**data)
+
+
+_object_codes = itertools.count(1)
+
+
+def apartment_data(builder, **kwargs):
+    data = {
+        'name': 'ЖК Test',
+        'address': 'Алматы',
+        'object_code': f'TST-{next(_object_codes):05d}',
+        'floor': 10,
+        'building_count': 1,
+        'material': 'brick',
+        'start_date': datetime.date(2024, 1, 1),
+        'end_date': datetime.date(2025, 1, 1),
+        'description': 'Описание',
+        'building_start_date': datetime.date(2023, 1, 1),
+        'home_type': 'apartment',
+        'bathroom_type': 'combined',
+        'security': 'none',
+        'parking_type': 'none',
+        'elevator_type': 'none',
+        'builder': builder,
+    }
+    data.update(kwargs)
+    return data
+
+
+def make_apartment(builder, **kwargs):
+    return Apartment.objects.create(**apartment_data(builder, **kwargs))
+
+
+class AuthenticatedAPITestCase(TestCase):
+    def setUp(self):
+        cache.get_cache().clear()
+        self.user = User.objects.create_user(username='tester', password='secret-pass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        authentication.clear()
+        self.user = User.objects.create_user(username='tester', password='secret-pass')
+        self.token = self.client.post('/api/login/', {'username': 'tester', 'password': 'secret-pass'}).json()['access']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.token}')
+
+    def test_repeated_requests_make_no_queries(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/profile/')
+        self.assertEqual(response.data['user']['username'], 'tester')
+
+    def test_profile_and_user_changes_are_visible(self):
+        self.client.get('/api/profile/')
+        UserProfile.objects.filter(user=self.user).update(address='Астана')
+        # Изменение в обход сигналов видно только после TTL
+        self.assertIsNone(self.client.get('/api/profile/').data['address'])
+
+        profile = UserProfile.objects.get(user=self.user)
+        profile.address = 'Алматы'
+        profile.save()
+        self.assertEqual(self.client.get('/api/profile/').data['address'], 'Алматы')
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_snapshots_are_independent(self):
+        auth = authentication.CachedJWTAuthentication()
+        token = auth.get_validated_token(self.token.encode())
+        first = auth.get_user(token)
+        first.first_name = 'Изменено'
+        first.profile.address = 'Изменено'
+        second = auth.get_user(token)
+        self.assertEqual((second.first_name, second.profile.address), ('', None))
+        self.assertIs(second.profile.user, second)
+
+    def test_login_returns_short_lived_access_and_refresh(self):
+        # Пользователь загружается вместе с профилем: версия токенов не стоит запроса
+        with self.assertNumQueries(1):
+            tokens = APIClient().post('/api/login/', {'username': 'tester', 'password': 'secret-pass'}).data
+        access = AccessToken(tokens['access'])
+        self.assertEqual(access['exp'] - access['iat'], 15 * 60)
+        self.assertEqual(access[authentication.TOKEN_VERSION_CLAIM], self.user.profile.token_version)
+
+        response = APIClient().post('/api/token/refresh/', {'refresh': tokens['refresh']})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(AccessToken(response.data['access'])['user_id'], self.user.pk)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': tokens['access']}).status_code, 401)
+
+    def test_password_change_revokes_tokens(self):
+        refresh = APIClient().post('/api/login/', {'username': 'tester', 'password': 'secret-pass'}).data['refresh']
+        response = self.client.post('/api/change-password/', {'old_password': 'secret-pass',
+                                                              'new_password': 'new-secret'})
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': response.data['refresh']}).status_code,
+                         200)
+
+    def test_revocation_in_other_process_is_picked_up(self):
+        self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        # Другой воркер отозвал токены: в этом процессе сигналов не было
+        UserProfile.objects.filter(user=self.user).update(token_version=F('token_version') + 1)
+        shared = authentication.get_shared_cache()
+        shared.set(authentication.EPOCH_KEY, shared.get(authentication.EPOCH_KEY, 0) + 1, timeout=None)
+
+        with override_settings(AUTH_REVOCATION_SYNC_INTERVAL=3600):
+            self.assertEqual(self.client.get('/api/profile/').status_code, 200)
+        with override_settings(AUTH_REVOCATION_SYNC_INTERVAL=0):
+            self.assertEqual(self.client.get('/api/profile/').status_code, 401)
+
+    def test_lru_bounds_and_expiry(self):
+        lru = authentication.LRUCache(maxsize=2, ttl=60)
+        lru.set('a', 1)
+        lru.set('b', 2)
+        lru.get('a')
+        lru.set('c', 3)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        lru.set('d', 4, ttl=0)
+        self.assertIsNone(lru.get('d'))
+
+
+class AsyncReadViewTests(TestCase):
+    READ_PATHS = ('/api/apartments/', '/api/builders/', '/api/profile/', '/api/applications/')
+
+    def setUp(self):
+        authentication.clear()
+        cache.get_cache().clear()
+        self.user = User.objects.create_user(username='tester', password='secret-pass')
+        self.apartment = make_apartment(make_builder())
+        Application.objects.create(user=self.user, name='Заявка', status='in_progress',
+                                   creation_date=datetime.date(2025, 1, 1))
+        token = self.client.post('/api/login/', {'username': 'tester', 'password': 'secret-pass'}).json()['access']
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+    def test_read_views_are_async(self):
+        for path in (*self.READ_PATHS, f'/api/apartments/{self.apartment.pk}/'):
+            self.assertTrue(iscoroutinefunction(resolve(path).func), path)
+        # Действия без асинхронной реализации остаются синхронными
+        self.assertFalse(iscoroutinefunction(resolve('/api/apartments/export/').func))
+        self.assertEqual(metrics.view_name(self.client.get('/api/builders/', headers=self.headers).wsgi_request),
+                         'BuilderViewSet.list')
+
+    async def test_concurrent_reads(self):
+        responses = await asyncio.gather(*(
+            self.async_client.get(path, headers=self.headers) for path in self.READ_PATHS * 5
+        ))
+        self.assertEqual({response.status_code for response in responses}, {200})
+        apartments, builders, profile, applications = [response.json() for response in responses[:4]]
+        self.assertEqual([item['id'] for item in apartments['results']], [self.apartment.pk])
+        self.assertEqual([item['name'] for item in builders], ['BI Group'])
+        self.assertEqual(profile['user']['username'], 'tester')
+        self.assertEqual([item['name'] for item in applications], ['Заявка'])
+
+    async def test_conditional_and_cached_responses(self):
+        path = f'/api/apartments/{self.apartment.pk}/'
+        first = await self.async_client.get(path, headers=self.headers)
+        self.assertEqual((first.status_code, first['X-Cache']), (200, 'MISS'))
+        second = await self.async_client.get(path, headers=self.headers)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        not_modified = await self.async_client.get(path, headers={**self.headers, 'If-None-Match': first['ETag']})
+        self.assertEqual(not_modified.status_code, 304)
+        head = await self.async_client.head(path, headers=self.headers)
+        self.assertEqual((head.status_code, head.content), (200, b''))
+
+    async def test_errors(self):
+        response = await self.async_client.get('/api/apartments/')
+        self.assertEqual(response.status_code, 401)
+        self.assertIn('WWW-Authenticate', response)
+        response = await self.async_client.get('/api/profile/', headers={'Authorization': 'Bearer invalid'})
+        self.assertEqual(response.status_code, 401)
+        for path in ('/api/apartments/0/', '/api/apartments/abc/'):
+            response = await self.async_client.get(path, headers=self.headers)
+            self.assertEqual(response.status_code, 404, path)
+
+    async def test_export_is_streamed(self):
+        response = await self.async_client.get('/api/apartments/export/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        # Синхронное тело Django под ASGI сначала прочитал бы целиком
+        self.assertTrue(response.is_async)
+        chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual([json.loads(chunk)['id'] for chunk in chunks], [self.apartment.pk])
+
+    def test_writes_use_sync_views(self):
+        data = {'name': 'Вторая', 'status': 'in_progress', 'creation_date': '2025-01-01'}
+        response = self.client.post('/api/applications/', data, headers=self.headers)
+        self.assertEqual(response.status_code, 201)
+        names = [item['name'] for item in self.client.get('/api/applications/', headers=self.headers).json()]
+        self.assertEqual(sorted(names), ['Вторая', 'Заявка'])
+
+
+@override_settings(LOGIN_RATE_WINDOW=60, LOGIN_RATE_LIMIT_PER_IP=5, LOGIN_RATE_LIMIT_PER_USERNAME=3)
+class LoginRateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit.get_cache().clear()
+        # Середина окна: попытки теста не разойдутся по двум окнам
+        now = time.time()
+        clock = mock.patch.object(ratelimit.time, 'time', return_value=now - now % 60 + 20)
+        clock.start()
+        self.addCleanup(clock.stop)
+        User.objects.create_user(username='tester', password='secret-pass')
+
+    def _login(self, username='tester', password='wrong', ip='10.0.0.1', **extra):
+        return self.client.post('/api/login/', {'username': username, 'password': password}, REMOTE_ADDR=ip,
+                                **extra)
+
+    def test_username_limit_rejects_before_hashing(self):
+        for _ in range(3):
+            self.assertEqual(self._login(ip='10.0.0.2').status_code, 401)
+        # Лимит по имени действует и с другого адреса, и для верного пароля
+        with self.assertNumQueries(0):
+            response = self._login(password='secret-pass', ip='10.0.0.3')
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(0 < int(response['Retry-After']) <= 120)
+        self.assertEqual(self._login(username='other').status_code, 401)
+
+    def test_ip_limit_and_reset_on_success(self):
+        self._login()
+        self._login()
+        self.assertEqual(self._login(password='secret-pass').status_code, 200)
+        # Успешный вход сбросил счётчик имени, но не адреса
+        for username in ('a', 'b', 'c'):
+            self.assertEqual(self._login(username=username).status_code, 401)
+        self.assertEqual(self._login(username='d').status_code, 429)
+        self.assertEqual(self._login(username='d', ip='10.0.0.9').status_code, 401)
+
+    def test_sliding_window(self):
+        window = ratelimit.SlidingWindow('test', limit=4, window=60)
+        for _ in range(4):
+            window.hit('key', now=30)
+        self.assertEqual(window.count('key', now=59), 4)
+        # Через половину следующего окна вес прошлых попыток вдвое меньше
+        self.assertEqual(window.count('key', now=90), 2)
+        self.assertEqual(window.retry_after('key', now=59), 1)
+        self.assertEqual(window.retry_after('key', now=90), 0)
+        self.assertEqual(window.count('key', now=121), 0)
+
+    def test_attempts_are_counted_across_workers(self):
+        # Отдельные экземпляры кэша по умолчанию — как в разных воркерах
+        workers = [caches.create_connection(settings.LOGIN_RATE_CACHE_ALIAS) for _ in range(2)]
+        self.assertNotIsInstance(workers[0], LocMemCache)
+        window = ratelimit.SlidingWindow('test', limit=4, window=60)
+        for worker in workers:
+            with mock.patch.object(ratelimit, 'get_cache', return_value=worker):
+                window.hit('key', now=30)
+        with mock.patch.object(ratelimit, 'get_cache', return_value=workers[0]):
+            self.assertEqual(window.count('key', now=30), 2)
+
+    @override_settings(TRUSTED_PROXY_COUNT=1)
+    def test_client_ip_behind_trusted_proxy(self):
+        # Клиент сам прислал X-Forwarded-For, nginx дописал его настоящий адрес
+        for n in range(5):
+            response = self._login(username=f'user-{n}', ip='172.18.0.5', HTTP_X_FORWARDED_FOR='10.0.0.1, 203.0.113.7')
+            self.assertEqual(response.status_code, 401)
+        # Лимит по адресу клиента, а не прокси и не подделанному заголовку
+        self.assertEqual(self._login(username='x', ip='172.18.0.5', HTTP_X_FORWARDED_FOR='203.0.113.7').status_code,
+                         429)
+        self.assertEqual(self._login(username='x', ip='172.18.0.5', HTTP_X_FORWARDED_FOR='10.0.0.1').status_code, 401)
+
+    @override_settings(LOGIN_HASH_SLOTS=1, LOGIN_HASH_WAIT=0)
+    def test_busy_hashing_slots(self):
+        with override_settings(LOGIN_HASH_LOCK_DIR=tempfile.mkdtemp()):
+            with ratelimit.hashing_slot() as acquired:
+                self.assertTrue(acquired)
+                response = self._login(password='secret-pass')
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response['Retry-After'], '1')
+            self.assertEqual(self._login(password='secret-pass').status_code, 200)
+
+
+class ApartmentCatalogTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.builder = make_builder()
+        self.other_builder = make_builder(name='BAZIS-A')
+
+    def test_list_is_cursor_paginated(self):
+        for i in range(25):
+            make_apartment(self.builder, name=f'ЖК {i:02d}')
+
+        response = self.client.get('/api/apartments/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['results']), 20)
+        self.assertIsNotNone(response.data['next'])
+
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+    def test_filters(self):
+        make_apartment(self.builder, name='A', material='brick', floor=5,
+                       start_date=datetime.date(2024, 3, 1))
+        make_apartment(self.builder, name='B', material='panel', floor=12,
+                       start_date=datetime.date(2024, 6, 1))
+        make_apartment(self.other_builder, name='C', material='brick', floor=20,
+                       start_date=datetime.date(2025, 1, 1))
+
+        def names(params):
+            response = self.client.get('/api/apartments/', params)
+            self.assertEqual(response.status_code, 200)
+            return [item['name'] for item in response.data['results']]
+
+        self.assertEqual(names({'material': 'brick'}), ['A', 'C'])
+        self.assertEqual(names({'floor_min': 10, 'floor_max': 15}), ['B'])
+        self.assertEqual(names({'builder': self.other_builder.pk}), ['C'])
+        self.assertEqual(names({'start_date_after': '2024-05-01',
+                                'start_date_before': '2024-12-31'}), ['B'])
+
+
+class ApartmentQueryCountTests(AuthenticatedAPITestCase):
+    def _seed(self, count):
+        builders = [make_builder(name=f'Builder {i}') for i in range(min(count, 10))]
+        Apartment.objects.bulk_create(
+            Apartment(**apartment_data(builders[i % len(builders)], name=f'ЖК {i:04d}'))
+            for i in range(count)
+        )
+
+    def _count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        counts = []
+        for size in (1, 100, 1000):
+            Apartment.objects.all().delete()
+            Builder.objects.all().delete()
+            self._seed(size)
+            counts.append(self._count_queries('/api/apartments/?page_size=100'))
+        self.assertEqual(counts, [counts[0]] * 3)
+        # Only the page query: validators come from the page itself
+        self.assertEqual(counts[0], 1)
+
+    def test_detail_loads_builder_in_one_query(self):
+        apartment = make_apartment(make_builder())
+        self.assertEqual(self._count_queries(f'/api/apartments/{apartment.pk}/'), 1)
+
+
+class ApartmentUnitTypeTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        builder = make_builder()
+        self.small = make_apartment(builder, name='Small', apartment_types=[
+            {'label': '2-комнатная', 'room_count': 2, 'min_area': 45, 'max_area': 55,
+             'cost_per_square_meter': 500000, 'available_count': 3},
+            {'label': '3-комнатная', 'room_count': 3, 'min_area': 70, 'max_area': 90,
+             'cost_per_square_meter': 300000, 'available_count': 3},
+        ])
+        self.large = make_apartment(builder, name='Large', apartment_types=[
+            {'label': '2-комнатная', 'room_count': 2, 'min_area': 60, 'max_area': 75,
+             'cost_per_square_meter': 400000, 'available_count': 0},
+        ])
+
+    def names(self, params):
+        response = self.client.get('/api/apartments/', params)
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_unit_types_follow_json_on_save(self):
+        unit_type = self.large.unit_types.get()
+        self.assertEqual(unit_type.min_price, 60 * 400000)
+        self.assertEqual(unit_type.max_price, 75 * 400000)
+
+        self.large.apartment_types = []
+        self.large.save()
+        self.assertFalse(self.large.unit_types.exists())
+
+    def test_unit_type_filters_match_a_single_unit_type(self):
+        # Small has a 2-room unit under 30M and a unit with >= 60 m², but not both at once
+        self.assertEqual(self.names({'rooms': 2, 'price_max': 30000000, 'area_min': 60}), ['Large'])
+        self.assertEqual(self.names({'rooms': 2, 'price_max': 30000000}), ['Large', 'Small'])
+        self.assertEqual(self.names({'rooms': 2, 'available': 'true'}), ['Small'])
+        self.assertEqual(self.names({'area_min': 80, 'material': 'brick'}), ['Small'])
+
+
+class CatalogCacheTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.builder = make_builder()
+        self.apartment = make_apartment(self.builder, name='ЖК Cached')
+
+    def test_list_is_served_from_cache_until_apartment_changes(self):
+        first = self.client.get('/api/apartments/')
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        with CaptureQueriesContext(connection) as ctx:
+            second = self.client.get('/api/apartments/')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        # Body and validators come from the cache
+        self.assertEqual(len(ctx.captured_queries), 0)
+        self.assertEqual(second.data, first.data)
+
+        self.apartment.name = 'ЖК Renamed'
+        self.apartment.save()
+        third = self.client.get('/api/apartments/')
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(third.data['results'][0]['name'], 'ЖК Renamed')
+
+    def test_query_params_are_part_of_the_key(self):
+        self.client.get('/api/apartments/')
+        response = self.client.get('/api/apartments/', {'material': 'panel'})
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['results'], [])
+
+    def test_builder_change_invalidates_apartment_detail(self):
+        url = f'/api/apartments/{self.apartment.pk}/'
+        self.client.get(url)
+        self.builder.name = 'BI Group Renamed'
+        self.builder.save()
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['builder']['name'], 'BI Group Renamed')
+
+    def test_stats(self):
+        self.client.get('/api/builders/')
+        self.client.get('/api/builders/')
+        self.assertEqual(self.client.get('/api/cache-stats/').status_code, 403)
+
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/cache-stats/')
+        self.assertEqual(response.data, {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+
+@override_settings(CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'catalog': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'catalog'},
+    'worker-a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-a'},
+    'worker-b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-b'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'versions'},
+}, CATALOG_VERSION_CACHE_ALIAS='versions')
+class SharedCatalogVersionTests(AuthenticatedAPITestCase):
+    """Ответы в памяти разных воркеров, версии в общем хранилище."""
+
+    def _get(self, worker, url):
+        with override_settings(CATALOG_CACHE_ALIAS=worker):
+            return self.client.get(url)
+
+    def test_invalidation_reaches_other_workers(self):
+        apartment = make_apartment(make_builder(), name='ЖК Shared')
+        url = f'/api/apartments/{apartment.pk}/'
+        for worker in ('worker-a', 'worker-b'):
+            self.assertEqual(self._get(worker, url)['X-Cache'], 'MISS')
+            self.assertEqual(self._get(worker, url)['X-Cache'], 'HIT')
+
+        with override_settings(CATALOG_CACHE_ALIAS='worker-a'):
+            apartment.name = 'ЖК Renamed'
+            apartment.save()
+        response = self._get('worker-b', url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['name'], 'ЖК Renamed')
+
+
+class ConditionalGetTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.builder = make_builder()
+        self.apartment = make_apartment(self.builder)
+        self.url = f'/api/apartments/{self.apartment.pk}/'
+
+    def test_detail_not_modified(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        self.builder.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_changes_on_delete(self):
+        make_apartment(self.builder, name='ЖК Other')
+        etag = self.client.get('/api/apartments/')['ETag']
+        self.assertEqual(self.client.get('/api/apartments/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get('/api/apartments/?material=brick',
+                                         HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.apartment.delete()
+        self.assertEqual(self.client.get('/api/apartments/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_validators_come_from_cached_snapshot(self):
+        first = self.client.get(self.url)
+        # Запись в обход сигналов: кэш не сброшен, тело и ETag остаются прежними
+        Apartment.objects.filter(pk=self.apartment.pk).update(name='ЖК Bypassed')
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(ctx.captured_queries), 0)
+
+        cache.invalidate('apartments')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['name'], 'ЖК Bypassed')
+        self.assertNotEqual(response['ETag'], first['ETag'])
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get('/api/builders/')['Last-Modified']
+        response = self.client.get('/api/builders/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_detail_is_404(self):
+        self.assertEqual(self.client.get('/api/apartments/0/').status_code, 404)
+
+
+class SparseFieldsetTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.apartment = make_apartment(make_builder(), images=['a.jpg', 'b.jpg'], apartment_types=[
+            {'room_count': 1, 'min_area': 40, 'max_area': 50, 'cost_per_square_meter': 500000},
+            {'room_count': 2, 'min_area': 60, 'max_area': 70, 'cost_per_square_meter': 400000},
+        ])
+
+    def test_list_is_compact_by_default(self):
+        item = self.client.get('/api/apartments/').data['results'][0]
+        self.assertEqual(set(item), {'id', 'name', 'address', 'thumbnail', 'min_price', 'max_price',
+                                     'min_cost_per_square_meter'})
+        self.assertEqual(item['thumbnail'], 'a.jpg')
+        self.assertEqual(item['min_price'], 40 * 500000)
+        self.assertEqual(item['max_price'], 70 * 400000)
+        self.assertEqual(item['min_cost_per_square_meter'], 400000)
+
+    def test_expand_and_fields(self):
+        item = self.client.get('/api/apartments/?expand=builder,description').data['results'][0]
+        self.assertIn('builder', item)
+        self.assertIn('description', item)
+        self.assertIn('thumbnail', item)
+
+        item = self.client.get('/api/apartments/?fields=id,name').data['results'][0]
+        self.assertEqual(set(item), {'id', 'name'})
+
+    def test_detail_is_full(self):
+        url = f'/api/apartments/{self.apartment.pk}/'
+        self.assertIn('apartment_types', self.client.get(url).data)
+        self.assertEqual(set(self.client.get(url, {'fields': 'id,floor'}).data), {'id', 'floor'})
+
+
+class ApartmentSearchTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        builder = make_builder()
+        self.garden = make_apartment(builder, name='ЖК Botanical Garden', address='Алматы, улица Тимирязева',
+                                     description='Просторные квартиры с видом на сад')
+        self.nova = make_apartment(builder, name='ЖК Nova City', address='Астана, проспект Туран',
+                                   description='Квартира у Ботанического сада в Алматы')
+        self.elem = make_apartment(builder, name='ЖК Әлем', address='Шымкент',
+                                   description='Ёлочная аллея, балконы')
+
+    def names(self, query):
+        response = self.client.get('/api/apartments/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [item['name'] for item in response.data['results']]
+
+    def test_morphology_and_case(self):
+        self.assertEqual(set(self.names('квартира')), {'ЖК Botanical Garden', 'ЖК Nova City'})
+        self.assertEqual(self.names('ЕЛОЧНЫЕ балкон'), ['ЖК Әлем'])
+        self.assertEqual(self.names('әлем'), ['ЖК Әлем'])
+
+    def test_results_are_ranked(self):
+        # Совпадение в адресе весит больше, чем в описании
+        self.assertEqual(self.names('алматы'), ['ЖК Botanical Garden', 'ЖК Nova City'])
+
+    def test_index_follows_saves_and_deletes(self):
+        self.nova.name = 'ЖК Тимирязевский'
+        self.nova.save()
+        self.assertEqual(set(self.names('тимирязева')), {'ЖК Botanical Garden', 'ЖК Тимирязевский'})
+
+        self.garden.delete()
+        self.assertEqual(self.names('тимирязева'), ['ЖК Тимирязевский'])
+
+    def test_search_combines_with_filters_and_pagination(self):
+        for i in range(25):
+            make_apartment(self.garden.builder, name=f'Квартал {i}', material='panel')
+        response = self.client.get('/api/apartments/', {'q': 'квартал', 'material': 'panel'})
+        self.assertEqual(len(response.data['results']), 20)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 5)
+
+
+class CatalogExportTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        builder = make_builder()
+        make_apartment(builder, name='A', material='brick', apartment_types=[
+            {'label': '1-комнатная', 'room_count': 1},
+            {'label': '2-комнатная', 'room_count': 2},
+        ])
+        make_apartment(builder, name='B', material='panel')
+
+    def test_ndjson(self):
+        response = self.client.get('/api/apartments/export/')
+        self.assertTrue(response.streaming)
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['name'] for row in rows], ['A', 'B'])
+        self.assertEqual(rows[0]['builder_name'], 'BI Group')
+        self.assertEqual(len(rows[0]['apartment_types']), 2)
+
+    def test_flattened_csv_with_filters(self):
+        response = self.client.get('/api/apartments/export/', {'output': 'csv', 'flatten': '1', 'material': 'brick'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.DictReader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([(row['name'], row['unit_room_count']) for row in rows], [('A', '1'), ('A', '2')])
+
+    def test_unknown_format(self):
+        self.assertEqual(self.client.get('/api/apartments/export/', {'output': 'xml'}).status_code, 400)
+
+    def test_command(self):
+        out = io.StringIO()
+        call_command('export_catalog', '--output-format', 'csv', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+
+
+class CatalogImportTests(TestCase):
+    def setUp(self):
+        self.builder = make_builder()
+
+    def _record(self, **kwargs):
+        record = apartment_data(None, **kwargs)
+        del record['builder']
+        return json.loads(json.dumps(record, cls=DjangoJSONEncoder))
+
+    def test_streaming_json_array(self):
+        records = [{'a': i, 'text': 'x' * 50} for i in range(20)]
+        stream = io.StringIO(json.dumps(records, indent=2))
+        self.assertEqual(list(importer.iter_json_array(stream, read_size=7)), records)
+
+    def test_upsert_apartments(self):
+        existing = make_apartment(self.builder, object_code='EX-1', name='Old name')
+        records = [
+            self._record(object_code='EX-1', name='New name', builder_id=self.builder.pk),
+            self._record(object_code='NEW-1', name='Квартал', builder_name='BI Group', apartment_types=[
+                {'room_count': 2, 'min_area': 50, 'max_area': 60, 'cost_per_square_meter': 100},
+            ]),
+            self._record(object_code='BAD-1', builder_name='Unknown'),
+            self._record(object_code='BAD-2', floor='many', builder_id=self.builder.pk),
+            self._record(object_code='BAD-3', builder_id=self.builder.pk, apartment_types=[
+                {'room_count': 1, 'min_area': 'NaN', 'max_area': 40, 'cost_per_square_meter': 'Infinity'},
+            ]),
+        ]
+        result = importer.import_apartments(iter(records), batch_size=3)
+
+        self.assertEqual((result.rows, result.saved), (5, 2))
+        self.assertEqual([row for row, _ in result.errors], [3, 4, 5])
+        self.assertIn('apartment_types', result.errors[2][1])
+        existing.refresh_from_db()
+        self.assertEqual(existing.name, 'New name')
+        self.assertEqual(Apartment.objects.count(), 2)
+        new = Apartment.objects.get(object_code='NEW-1')
+        self.assertEqual(ApartmentUnitType.objects.get(apartment=new).max_price, 6000)
+        self.assertEqual(list(search.search(Apartment.objects.all(), 'квартал')), [new])
+
+    def test_export_csv_round_trip(self):
+        make_apartment(self.builder, object_code='RT-1', images=['a.jpg'], apartment_types=[{'room_count': 1}])
+        path = os.path.join(tempfile.mkdtemp(), 'catalog.csv')
+        call_command('export_catalog', '--output-format', 'csv', '-o', path, stdout=io.StringIO())
+        Apartment.objects.update(name='Changed', images=[])
+
+        call_command('import_catalog', path, stdout=io.StringIO())
+        apartment = Apartment.objects.get(object_code='RT-1')
+        self.assertEqual(apartment.name, 'ЖК Test')
+        self.assertEqual(apartment.images, ['a.jpg'])
+
+    def test_import_builders_ndjson(self):
+        path = os.path.join(tempfile.mkdtemp(), 'builders.ndjson')
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps({'name': 'BI Group', 'contacts': 'Новые контакты', 'phone_number': '1',
+                                'email': 'new@bi.group'}) + '\n')
+            f.write(json.dumps({'name': 'G-Park', 'contacts': 'Алматы', 'phone_number': '2',
+                                'email': 'info@g-park.kz'}) + '\n')
+        call_command('import_catalog', path, '--model', 'builders', stdout=io.StringIO())
+        self.assertEqual(Builder.objects.count(), 2)
+        self.assertEqual(Builder.objects.get(name='BI Group').email, 'new@bi.group')
+
+
+class GenerateLoadDataTests(TestCase):
+    def _generate(self):
+        call_command('generate_load_data', '--builders', 3, '--apartments', 30, '--users', 10,
+                     '--applications', 20, '--seed', 7, '--batch-size', 8, stdout=io.StringIO())
+        return list(Apartment.objects.order_by('object_code').values_list('object_code', 'name', 'floor'))
+
+    def test_generates_consistent_deterministic_data(self):
+        first = self._generate()
+        self.assertEqual(len(first), 30)
+        self.assertEqual(User.objects.filter(profile__isnull=False).count(), 10)
+        self.assertEqual(Application.objects.count(), 20)
+        self.assertTrue(ApartmentUnitType.objects.exists())
+        self.assertTrue(User.objects.first().check_password('loadtest-password'))
+
+        Apartment.objects.all().delete()
+        self.assertEqual(self._generate(), first)
+
+
+class BenchmarkTests(TestCase):
+    def test_query_budgets(self):
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            report = benchmark.run_size(20, iterations=2)
+        measurements = {m.route: m for m in report.measurements}
+        self.assertEqual(set(measurements), {route.name for route in benchmark.ROUTES})
+        self.assertTrue(all(m.status < 400 for m in measurements.values()))
+
+        baseline = {m.key: m.as_dict() for m in report.measurements}
+        self.assertEqual([v for m in report.measurements for v in benchmark.compare(m, baseline)], [])
+
+        baseline['apartments-list@20']['queries'] -= 1
+        violations = benchmark.compare(measurements['apartments-list'], baseline)
+        self.assertEqual(len(violations), 1)
+        self.assertIn('queries', violations[0])
+
+    def test_run_restores_test_database_name(self):
+        name = connection.settings_dict['TEST']['NAME']
+        with mock.patch.object(connection.creation, 'create_test_db'), \
+                mock.patch.object(connection.creation, 'destroy_test_db'), \
+                mock.patch.object(benchmark, 'run_size', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                benchmark.run([20])
+        self.assertEqual(connection.settings_dict['TEST']['NAME'], name)
+
+
+class ProfilingMiddlewareTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.dump_dir = tempfile.mkdtemp()
+        builder = make_builder()
+        for i in range(3):
+            make_apartment(builder, name=f'ЖК {i}')
+
+    def test_disabled_by_default(self):
+        response = self.client.get('/api/apartments/')
+        self.assertNotIn('Server-Timing', response)
+
+    def test_server_timing_log_and_dump(self):
+        with override_settings(PROFILING_ENABLED=True, PROFILING_SAMPLE_RATE=1, PROFILING_DIR=self.dump_dir), \
+                self.assertLogs('baspana_project.profiling', 'INFO') as logs:
+            # Middleware подключается при первом запросе клиента, поэтому клиент новый
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            response = client.get('/api/apartments/')
+
+        self.assertEqual(response.status_code, 200)
+        timing = response['Server-Timing']
+        for metric in ('total;dur=', 'db;dur=', '1 queries', 'serialize;dur=', 'response;desc='):
+            self.assertIn(metric, timing)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['path'], '/api/apartments/')
+        self.assertEqual(record['queries'], 1)
+        self.assertEqual(record['response_bytes'], len(response.content))
+        self.assertGreater(record['serialize_ms'], 0)
+        self.assertTrue(os.path.exists(record['profile']))
+        self.assertEqual(os.listdir(self.dump_dir), [os.path.basename(record['profile'])])
+
+    def test_duplicate_queries(self):
+        profile = RequestProfile()
+        for sql, params in [('SELECT a WHERE id = %s', (1,)), ('SELECT a WHERE id = %s', (2,)),
+                            ('SELECT a WHERE id = %s', (1,)), ('SELECT b', ())]:
+            profile.execute_wrapper(lambda *args: None, sql, params, False, {})
+        self.assertEqual(profile.duplicates(), (1, 2, 'SELECT a WHERE id = %s'))
+
+
+class MetricsTests(AuthenticatedAPITestCase):
+    def _sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_requests_by_view_and_cache(self):
+        make_apartment(make_builder())
+        list_labels = {'view': 'ApartmentViewSet.list', 'method': 'GET', 'status': '200'}
+        before = self._sample('baspana_http_requests_total', **list_labels)
+        hits = self._sample('baspana_catalog_cache_requests_total', outcome='hits')
+        queries = self._sample('baspana_db_queries_per_request_sum', view='ApartmentViewSet.list')
+
+        self.client.get('/api/apartments/')
+        self.client.get('/api/apartments/')
+        self.client.post('/api/login/', {'username': 'tester', 'password': 'wrong'}, format='json')
+
+        self.assertEqual(self._sample('baspana_http_requests_total', **list_labels), before + 2)
+        self.assertEqual(self._sample('baspana_catalog_cache_requests_total', outcome='hits'), hits + 1)
+        self.assertGreater(self._sample('baspana_db_queries_per_request_sum', view='ApartmentViewSet.list'),
+                           queries)
+        self.assertGreater(self._sample('baspana_http_requests_total', view='login_view', method='POST',
+                                        status='401'), 0)
+
+    def test_endpoint(self):
+        with override_settings(MEDIA_ROOT=tempfile.mkdtemp()):
+            self.client.post('/api/upload/', {'file': io.BytesIO(b'x' * 100)}, format='multipart')
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('baspana_upload_bytes_total', body)
+        self.assertIn('baspana_http_request_duration_seconds_bucket{le="0.005",method="POST",view="upload_file"}',
+                      body)
+
+    def test_plain_views_are_labelled_by_route_name(self):
+        for path, name in [('/metrics', 'metrics'), ('/admin/', 'admin:index'), ('/api/nowhere/', 'unmatched')]:
+            self.assertEqual(metrics.view_name(self.client.get(path).wsgi_request), name, path)
+
+
+@override_settings(UPLOAD_CHUNK_MAX_SIZE=1024)
+class ResumableUploadTests(AuthenticatedAPITestCase):
+    content = bytes(range(256)) * 10
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _init(self, content=None, checksum=None):
+        content = self.content if content is None else content
+        response = self.client.post('/api/uploads/', {
+            'filename': 'scan.pdf',
+            'size': len(content),
+            'checksum': checksum or hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data['id']
+
+    def _put(self, upload_id, offset, data):
+        return self.client.generic('PUT', f'/api/uploads/{upload_id}/chunk/?offset={offset}', data,
+                                   content_type='application/octet-stream')
+
+    def test_resume_after_lost_chunk(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, self.content[:1000]).data['received'], 1000)
+
+        # Повтор с устаревшим смещением: сервер сообщает, с какого места продолжить
+        response = self._put(upload_id, 0, self.content[:1000])
+        self.assertEqual(response.status_code, 409)
+        received = self.client.get(f'/api/uploads/{upload_id}/').data['received']
+        self.assertEqual(received, response.data['received'])
+
+        self.assertEqual(self.client.post(f'/api/uploads/{upload_id}/finalize/').status_code, 409)
+        for offset in range(received, len(self.content), 1000):
+            response = self._put(upload_id, offset, self.content[offset:offset + 1000])
+            self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 201)
+        uploaded = UploadedFile.objects.get(pk=response.data['id'])
+        self.assertEqual(uploaded.file.name, f'blobs/{uploaded.blob_id[:2]}/{uploaded.blob_id[2:4]}/'
+                                             f'{hashlib.sha256(self.content).hexdigest()}.pdf')
+        with uploaded.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        # Завершённая сессия больше не принимает части
+        self.assertEqual(self._put(upload_id, len(self.content), b'x').status_code, 404)
+
+    def test_body_is_received_before_the_session_is_locked(self):
+        upload_id = self._init()
+        depth = len(connection.atomic_blocks)
+        receive = uploads.received_chunk
+        depths = []
+
+        def receiving(stream, length):
+            depths.append(len(connection.atomic_blocks))
+            if len(depths) == 1:
+                # Параллельная попытка с тем же смещением успевает раньше
+                self.assertEqual(self._put(upload_id, 0, self.content[:1000]).status_code, 200)
+            return receive(stream, length)
+
+        with mock.patch.object(uploads, 'received_chunk', side_effect=receiving):
+            response = self._put(upload_id, 0, self.content[:1000])
+        self.assertEqual(depths, [depth, depth])
+        self.assertEqual((response.status_code, response.data['received']), (409, 1000))
+        # Принятые части убраны, на диске только файл сессии
+        self.assertEqual(os.listdir(uploads.temp_dir()), [os.path.basename(uploads.part_path(
+            UploadSession.objects.get(pk=upload_id)))])
+
+    def test_limits(self):
+        upload_id = self._init()
+        self.assertEqual(self._put(upload_id, 0, b'x' * 1025).status_code, 413)
+        self.assertEqual(self._put(upload_id, 2000, b'x' * 1000).status_code, 409)
+        for length in ('abc', '-1'):
+            response = self.client.generic('PUT', f'/api/uploads/{upload_id}/chunk/?offset=0', b'x',
+                                           content_type='application/octet-stream', CONTENT_LENGTH=length)
+            self.assertEqual(response.status_code, 400)
+        response = self.client.post('/api/uploads/', {'filename': 'a.pdf', 'size': 0, 'checksum': '0' * 64},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_checksum_mismatch_resets_session(self):
+        upload_id = self._init(content=b'abc', checksum='0' * 64)
+        self._put(upload_id, 0, b'abc')
+        response = self.client.post(f'/api/uploads/{upload_id}/finalize/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(UploadSession.objects.get(pk=upload_id).received, 0)
+        self.assertFalse(UploadedFile.objects.exists())
+
+    def test_session_belongs_to_user(self):
+        upload_id = self._init()
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='secret-pass'))
+        self.assertEqual(other.get(f'/api/uploads/{upload_id}/').status_code, 404)
+
+    def test_cleanup_command(self):
+        upload_id = self._init()
+        self._put(upload_id, 0, self.content[:100])
+        part_path = uploads.part_path(UploadSession.objects.get(pk=upload_id))
+        self.assertTrue(os.path.exists(part_path))
+
+        UploadSession.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        call_command('cleanup_upload_sessions', stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+        self.assertFalse(os.path.exists(part_path))
+
+
+class FileDeduplicationTests(AuthenticatedAPITestCase):
+    content = b'%PDF-1.4 scan' * 100
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _upload(self, name='scan.pdf', content=None):
+        upload = io.BytesIO(self.content if content is None else content)
+        upload.name = name
+        response = self.client.post('/api/upload/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return UploadedFile.objects.latest('pk')
+
+    def test_same_content_is_stored_once(self):
+        first = self._upload()
+        second = self._upload(name='copy.PDF')
+        self.assertNotEqual(first.pk, second.pk)
+        self.assertEqual(first.file.name, second.file.name)
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(self.content).hexdigest())
+        self.assertEqual((blob.size, blob.ref_count), (len(self.content), 2))
+        self.assertEqual(len(os.listdir(os.path.dirname(blob.file.path))), 1)
+
+    def test_known_content_costs_two_queries(self):
+        uploaded = self._upload()
+        with CaptureQueriesContext(connection) as ctx:
+            self._upload(name='copy.pdf')
+        # Захват blob'а (UPDATE ... RETURNING) и вставка UploadedFile; latest() в _upload
+        self.assertEqual(len(ctx.captured_queries), 3)
+
+        uploads.save_upload(ContentFile(self.content, name='same.pdf'), uploaded)
+        self.assertEqual(FileBlob.objects.get().ref_count, 2)
+
+    def test_refcount_and_garbage_collection(self):
+        first = self._upload()
+        second = self._upload()
+        path = first.blob.file.path
+
+        first.delete()
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+        second.delete()
+        self.assertEqual(FileBlob.objects.get().ref_count, 0)
+
+        # Освобождённый только что blob переживает сборку в течение периода ожидания
+        self.assertEqual(uploads.collect_garbage(datetime.timedelta(hours=1)), (0, 0))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(uploads.collect_garbage(datetime.timedelta(0)), (1, len(self.content)))
+        self.assertFalse(FileBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_garbage_collection_repairs_refcount(self):
+        uploaded = self._upload()
+        FileBlob.objects.update(ref_count=0, released_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        self.assertEqual(uploads.collect_garbage(datetime.timedelta(0)), (0, 0))
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+        self.assertTrue(os.path.exists(uploaded.file.path))
+
+    def test_resumable_upload_of_known_content_is_instant(self):
+        self._upload()
+        response = self.client.post('/api/uploads/', {
+            'filename': 'again.pdf',
+            'size': len(self.content),
+            'checksum': hashlib.sha256(self.content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['received'], len(self.content))
+        self.assertEqual(response.data['file']['path'], FileBlob.objects.get().file.name)
+        self.assertEqual(FileBlob.objects.get().ref_count, 2)
+
+    def test_known_content_of_others_must_be_uploaded(self):
+        self._upload()
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='secret-pass'))
+        for client in (other, APIClient()):
+            response = client.post('/api/uploads/', {
+                'filename': 'probe.pdf',
+                'size': len(self.content),
+                'checksum': hashlib.sha256(self.content).hexdigest(),
+            }, format='json')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual((response.data['received'], response.data['file']), (0, None))
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+
+    def test_adopt_legacy_uploads(self):
+        from django.core.files.base import ContentFile
+
+        legacy = [UploadedFile.objects.create(file=ContentFile(self.content, name='old.pdf')) for _ in range(2)]
+        old_paths = [uploaded.file.path for uploaded in legacy]
+        call_command('gc_file_blobs', adopt_legacy=True, stdout=io.StringIO())
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(blob.ref_count, 2)
+        self.assertEqual(set(UploadedFile.objects.values_list('file', flat=True)), {blob.file.name})
+        self.assertFalse(any(os.path.exists(path) for path in old_paths))
+
+
+class ImageDerivativeTests(AuthenticatedAPITestCase):
+    def setUp(self):
+        super().setUp()
+        override = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def _upload(self, content, name):
+        upload = io.BytesIO(content)
+        upload.name = name
+        response = self.client.post('/api/files/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.data)
+        jobs.run_pending()
+        return response.data['id']
+
+    def _png(self, size=(2000, 1000)):
+        output = io.BytesIO()
+        Image.new('RGB', size, (200, 30, 30)).save(output, 'PNG')
+        return output.getvalue()
+
+    def test_variants_are_built_after_upload(self):
+        file_id = self._upload(self._png(), 'plan.png')
+
+        blob = FileBlob.objects.get()
+        self.assertEqual(set(blob.derivatives), set(images.VARIANTS))
+        with Image.open(blob.file.storage.path(blob.derivatives['thumbnail'])) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (320, 160)))
+        with Image.open(blob.file.storage.path(blob.derivatives['webp'])) as webp:
+            self.assertEqual(webp.size, (2000, 1000))
+
+        response = self.client.get(f'/api/files/{file_id}/')
+        derivatives = response.data['derivatives']
+        self.assertTrue(derivatives['thumbnail'].startswith('http://testserver/media/blobs/'))
+        self.assertTrue(derivatives['thumbnail'].endswith('.thumbnail.webp'))
+
+    def test_non_images_and_broken_images(self):
+        file_id = self._upload(b'%PDF-1.4', 'scan.pdf')
+        with self.assertLogs('apartments.images', 'WARNING'):
+            self._upload(b'not really a png', 'broken.png')
+        self.assertEqual(self.client.get(f'/api/files/{file_id}/').data['derivatives'], {})
+        self.assertFalse(FileBlob.objects.exclude(derivatives={}).exists())
+
+    def test_garbage_collection_removes_variants(self):
+        self._upload(self._png(), 'plan.png')
+        blob = FileBlob.objects.get()
+        paths = [blob.file.storage.path(name) for name in blob.derivatives.values()]
+        UploadedFile.objects.all().delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            uploads.collect_garbage(datetime.timedelta(0))
+        self.assertFalse(any(os.path.exists(path) for path in paths))
+
+    def test_command_builds_missing_variants(self):
+        self._upload(self._png(), 'plan.png')
+        FileBlob.objects.update(derivatives={})
+        call_command('generate_image_derivatives', stdout=io.StringIO())
+        self.assertEqual(set(FileBlob.objects.get().derivatives), set(images.VARIANTS))
+
+
+class DirectUploadTests(AuthenticatedAPITestCase):
+    content = b'%PDF-1.4 direct' * 200
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        override.enable()
+        self.addCleanup(override.disable)
+        self.application = Application.objects.create(
+            user=self.user, name='Постановка на учет', status='in_progress', creation_date=datetime.date(2025, 1, 1),
+        )
+
+    def _init(self, content=None):
+        content = self.content if content is None else content
+        response = self.client.post('/api/direct-uploads/', {
+            'filename': 'scan.pdf', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return response.data
+
+    def _send(self, upload, content=None):
+        # Без авторизации: доступ даёт только токен в ссылке
+        return APIClient().generic(upload['method'], upload['url'], self.content if content is None else content,
+                                   content_type=upload['headers']['Content-Type'])
+
+    def test_upload_and_confirm(self):
+        session = self._init()
+        upload = session['upload']
+        self.assertIn('token=', upload['url'])
+
+        self.assertEqual(self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/').status_code, 409)
+        self.assertEqual(self._send(upload).data['received'], len(self.content))
+        response = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/',
+                                    {'application': self.application.pk}, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.document_id, response.data['id'])
+        with self.application.document.file.open('rb') as f:
+            self.assertEqual(f.read(), self.content)
+        self.assertEqual(FileBlob.objects.get().ref_count, 1)
+
+    def test_rejects_bad_token_size_and_checksum(self):
+        session = self._init()
+        upload = session['upload']
+        self.assertEqual(self._send({**upload, 'url': upload['url'][:-4] + 'abcd'}).status_code, 403)
+        self.assertEqual(self._send(upload, self.content[:-1]).status_code, 400)
+
+        self._send(upload, self.content[::-1])
+        response = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(UploadedFile.objects.exists())
+
+    def test_known_content_needs_no_upload(self):
+        session = self._init()
+        self._send(session['upload'])
+        self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/')
+
+        again = self._init()
+        self.assertIsNone(again['upload'])
+        self.assertEqual(again['file']['path'], FileBlob.objects.get().file.name)
+
+    def test_application_accepts_only_own_document(self):
+        session = self._init()
+        self._send(session['upload'])
+        file_id = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/').data['id']
+        data = {'name': 'Постановка на учет', 'status': 'in_progress', 'creation_date': '2025-01-01',
+                'document': file_id}
+        self.assertEqual(self.client.post('/api/applications/', data, format='json').data['document'], file_id)
+
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='secret-pass'))
+        self.assertEqual(other.post('/api/applications/', data, format='json').status_code, 400)
+
+    def test_own_document_without_upload_session(self):
+        upload = io.BytesIO(self.content)
+        upload.name = 'scan.pdf'
+        path = self.client.post('/api/upload/', {'file': upload}, format='multipart').data['path']
+        multipart_id = UploadedFile.objects.get(file=path).pk
+
+        session = self._init(self.content[::-1])
+        self._send(session['upload'], self.content[::-1])
+        direct_id = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/').data['id']
+        # Через сутки cleanup_upload_sessions удаляет и завершённые сессии
+        UploadSession.objects.update(updated_at=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+        call_command('cleanup_upload_sessions', stdout=io.StringIO())
+        self.assertFalse(UploadSession.objects.exists())
+
+        for file_id in (multipart_id, direct_id):
+            response = self.client.patch(f'/api/applications/{self.application.pk}/', {'document': file_id},
+                                         format='json')
+            self.assertEqual(response.status_code, 200, response.data)
+            self.assertEqual(response.data['document'], file_id)
+
+    def test_malformed_content_length(self):
+        upload = self._init()['upload']
+        for length in ('abc', '-1'):
+            response = APIClient().generic(upload['method'], upload['url'], self.content,
+                                           content_type=upload['headers']['Content-Type'], CONTENT_LENGTH=length)
+            self.assertEqual(response.status_code, 400)
+
+
+async def _read_async(response):
+    return [chunk async for chunk in response.streaming_content]
+
+
+class MediaServingTests(AuthenticatedAPITestCase):
+    content = bytes(range(256)) * 40
+
+    def setUp(self):
+        super().setUp()
+        override = override_settings(MEDIA_ROOT=tempfile.mkdtemp())
+        override.enable()
+        self.addCleanup(override.disable)
+        upload = io.BytesIO(self.content)
+        upload.name = 'contract.pdf'
+        response = self.client.post('/api/files/', {'file': upload}, format='multipart')
+        self.url = response.data['download_url']
+
+    def test_full_download(self):
+        response = self.client.get(self.url, HTTP_ACCEPT='application/pdf')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(self.content).hexdigest()}"')
+        self.assertTrue(response['Content-Disposition'].startswith('inline; filename='))
+
+    def test_download_is_streamed_under_asgi(self):
+        authentication.clear()
+        headers = {'Authorization': f'Bearer {authentication.tokens_for_user(self.user).access_token}'}
+        for extra, status_code, content in [({}, 200, self.content),
+                                            ({'Range': 'bytes=100-199'}, 206, self.content[100:200])]:
+            response = async_to_sync(self.async_client.get)(self.url, headers={**headers, **extra})
+            self.assertEqual(response.status_code, status_code)
+            self.assertTrue(response.is_async)
+            self.assertEqual(response['Content-Length'], str(len(content)))
+            self.assertEqual(b''.join(async_to_sync(_read_async)(response)), content)
+
+    def test_files_of_other_users_are_not_found(self):
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='secret-pass'))
+        self.assertEqual(other.get(self.url).status_code, 404)
+        self.assertEqual(other.get('/api/files/').data, [])
+
+        with override_settings(MEDIA_SENDFILE='nginx', MEDIA_SENDFILE_PREFIX='/protected/'):
+            self.assertEqual(other.get(self.url).status_code, 404)
+        staff = User.objects.create_user(username='staff', password='secret-pass', is_staff=True)
+        other.force_authenticate(staff)
+        self.assertEqual(other.get(self.url).status_code, 200)
+
+    def test_range_requests(self):
+        size = len(self.content)
+        for header, (start, end) in [('bytes=100-199', (100, 199)), ('bytes=10000-', (10000, size - 1)),
+                                     ('bytes=-24', (size - 24, size - 1)), ('bytes=5000-99999', (5000, size - 1))]:
+            response = self.client.get(self.url, HTTP_RANGE=header)
+            self.assertEqual(response.status_code, 206, header)
+            self.assertEqual(b''.join(response.streaming_content), self.content[start:end + 1])
+            self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+            self.assertEqual(int(response['Content-Length']), end - start + 1)
+
+        response = self.client.get(self.url, HTTP_RANGE=f'bytes={size}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        # Несколько диапазонов не поддерживаются — отдаётся весь файл
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-1,5-6').status_code, 200)
+
+    def test_if_range_and_conditional_get(self):
+        etag = self.client.get(self.url)['ETag']
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE=etag).status_code, 206)
+        self.assertEqual(self.client.get(self.url, HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"old"').status_code, 200)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(user=None)
+        self.assertEqual(self.client.get(self.url).status_code, 401)
+
+    @override_settings(MEDIA_SENDFILE='nginx', MEDIA_SENDFILE_PREFIX='/protected-media/')
+    def test_x_accel_redirect(self):
+        response = self.client.get(self.url + '?download=1', HTTP_RANGE='bytes=0-9')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + FileBlob.objects.get().file.name)
+        self.assertNotIn('Content-Type', response)
+        self.assertEqual(response.content, b'')
+        self.assertTrue(response['Content-Disposition'].startswith('attachment; filename='))
+
+    @override_settings(MEDIA_SENDFILE='apache')
+    def test_x_sendfile(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], FileBlob.objects.get().file.path)
+
+
+@skipUnless(mock_s3, 'Для тестов S3Storage нужен moto')
+class S3StorageTests(AuthenticatedAPITestCase):
+    bucket = 'baspana-test'
+
+    def setUp(self):
+        super().setUp()
+        s3 = mock_s3()
+        s3.start()
+        self.addCleanup(s3.stop)
+        self.options = {
+            'bucket': self.bucket,
+            'region_name': 'us-east-1',
+            'access_key': 'testing',
+            'secret_key': 'testing',
+            'cache_dir': tempfile.mkdtemp(),
+        }
+        self.storage = S3Storage(**self.options)
+        self.storage.client.create_bucket(Bucket=self.bucket)
+
+    def test_multipart_upload_and_read_through_cache(self):
+        storage = S3Storage(**self.options, multipart_threshold=5 * 1024 ** 2, multipart_chunksize=5 * 1024 ** 2)
+        content = bytes(range(256)) * (11 * 4096)
+        name = storage.save('blobs/ab/cd/scan.pdf', ContentFile(content))
+        self.assertEqual(name, 'blobs/ab/cd/scan.pdf')
+        # ETag объекта из multipart-загрузки заканчивается числом частей
+        self.assertTrue(storage._head(name)['ETag'].endswith('-3"'))
+        self.assertTrue(storage.exists(name))
+        self.assertEqual(storage.size(name), len(content))
+
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), content)
+        # Повторное чтение идёт из кэша, не из хранилища
+        storage.client.delete_object(Bucket=self.bucket, Key=name)
+        with storage.open(name) as f:
+            self.assertEqual(f.read(), content)
+
+        storage.delete(name)
+        self.assertFalse(storage.exists(name))
+        with self.assertRaises(FileNotFoundError):
+            storage.open(name)
+
+    def test_cache_evicts_least_recently_read(self):
+        storage = S3Storage(**{**self.options, 'cache_max_size': 250})
+        for name in ('a.pdf', 'b.pdf', 'c.pdf'):
+            storage.save(name, ContentFile(b'x' * 100))
+        for name in ('a.pdf', 'b.pdf', 'a.pdf', 'c.pdf'):
+            storage.open(name).close()
+        self.assertEqual(sorted(os.listdir(self.options['cache_dir'])), ['a.pdf', 'c.pdf'])
+
+    def test_direct_upload_to_bucket(self):
+        storages = {
+            'default': {'BACKEND': 'apartments.storage.S3Storage', 'OPTIONS': self.options},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        content = b'%PDF-1.4 direct' * 100
+        with override_settings(STORAGES=storages):
+            session = self.client.post('/api/direct-uploads/', {
+                'filename': 'scan.pdf', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+            }, format='json').data
+            upload = session['upload']
+            self.assertTrue(upload['url'].startswith(f'https://{self.bucket}.s3.amazonaws.com/uploads/tmp/'))
+            self.assertIn('content-length%3Bcontent-type%3Bhost%3Bx-amz-checksum-sha256', upload['url'])
+            self.assertEqual(requests.put(upload['url'], content, headers=upload['headers']).status_code, 200)
+
+            # moto не хранит контрольные суммы объектов: confirm читает объект сам
+            response = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/')
+            self.assertEqual(response.status_code, 201, response.data)
+            keys = [obj['Key'] for obj in self.storage.client.list_objects_v2(Bucket=self.bucket)['Contents']]
+            self.assertEqual(keys, [FileBlob.objects.get().file.name])
+
+    def test_direct_upload_is_checked_without_download(self):
+        storages = {
+            'default': {'BACKEND': 'apartments.storage.S3Storage', 'OPTIONS': self.options},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        content = b'%PDF-1.4 direct' * 100
+        with override_settings(STORAGES=storages):
+            session = self.client.post('/api/direct-uploads/', {
+                'filename': 'scan.pdf', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+            }, format='json').data
+            # Подпись ссылки не пускает другой размер; в обход неё объект кладут напрямую
+            name = f'uploads/tmp/{session["id"]}.pdf'
+            self.storage.client.put_object(Bucket=self.bucket, Key=name, Body=content[:-1])
+
+            with mock.patch.object(S3Storage, 'open') as storage_open:
+                response = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/')
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn('Contents', self.storage.client.list_objects_v2(Bucket=self.bucket))
+
+                # SHA-256, проверенный хранилищем при загрузке, повторно не считается
+                self.storage.client.put_object(Bucket=self.bucket, Key=name, Body=content)
+                with mock.patch.object(S3Storage, 'stored_sha256', return_value=hashlib.sha256(content).hexdigest()):
+                    response = self.client.post(f'/api/direct-uploads/{session["id"]}/confirm/')
+                self.assertEqual(response.status_code, 201, response.data)
+            storage_open.assert_not_called()
+
+    def test_uploads_are_stored_in_bucket(self):
+        storages = {
+            'default': {'BACKEND': 'apartments.storage.S3Storage', 'OPTIONS': self.options},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        content = b'%PDF-1.4 scan' * 100
+        with override_settings(STORAGES=storages, MEDIA_ROOT=tempfile.mkdtemp()):
+            upload_id = self.client.post('/api/uploads/', {
+                'filename': 'scan.pdf', 'size': len(content), 'checksum': hashlib.sha256(content).hexdigest(),
+            }, format='json').data['id']
+            self.client.generic('PUT', f'/api/uploads/{upload_id}/chunk/?offset=0', content,
+                                content_type='application/octet-stream')
+            file_id = self.client.post(f'/api/uploads/{upload_id}/finalize/').data['id']
+
+            blob = FileBlob.objects.get()
+            body = self.storage.client.get_object(Bucket=self.bucket, Key=blob.file.name)['Body'].read()
+            self.assertEqual(body, content)
+            response = self.client.get(f'/api/files/{file_id}/download/', HTTP_RANGE='bytes=0-7')
+            self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4')
+
+            UploadedFile.objects.all().delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                uploads.collect_garbage(datetime.timedelta(0))
+            self.assertFalse(self.storage.exists(blob.file.name))
+
+
+_job_calls = []
+
+
+@jobs.task('tests.flaky')
+def flaky_job(fail_times):
+    _job_calls.append(fail_times)
+    if len(_job_calls) <= fail_times:
+        raise RuntimeError('temporary failure')
+
+
+class JobQueueTests(TestCase):
+    def setUp(self):
+        _job_calls.clear()
+
+    def _make_due(self):
+        Job.objects.update(run_after=datetime.datetime(2020, 1, 1, tzinfo=datetime.timezone.utc))
+
+    def test_retry_with_backoff(self):
+        job = jobs.enqueue('tests.flaky', {'fail_times': 1})
+        with self.assertLogs('apartments.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 1)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertIn('temporary failure', job.last_error)
+        self.assertGreater(job.run_after, job.updated_at)
+        # Повтор ещё не наступил
+        self.assertEqual(jobs.run_pending(), 0)
+
+        self._make_due()
+        self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error), ('done', 2, ''))
+
+    def test_fails_after_max_attempts(self):
+        job = jobs.enqueue('tests.flaky', {'fail_times': 10}, max_attempts=2)
+        with self.assertLogs('apartments.jobs', 'WARNING') as logs:
+            jobs.run_pending()
+            self._make_due()
+            jobs.run_pending()
+        self.assertEqual(logs.records[-1].levelname, 'ERROR')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('failed', 2))
+
+    def test_claim_is_exclusive_and_stale_jobs_are_requeued(self):
+        job = jobs.enqueue('tests.flaky', {'fail_times': 0})
+        self.assertEqual(jobs.claim('a').pk, job.pk)
+        self.assertIsNone(jobs.claim('b'))
+
+        self.assertEqual(jobs.requeue_stale(datetime.timedelta(hours=1)), 0)
+        self.assertEqual(jobs.requeue_stale(datetime.timedelta(0)), 1)
+        self.assertEqual(jobs.claim('b').locked_by, 'b')
+
+    def test_stale_job_without_attempts_left_fails(self):
+        job = jobs.enqueue('tests.flaky', {'fail_times': 0}, max_attempts=2)
+        for attempt in (1, 2):
+            # Воркер взял задачу и упал, не записав результат
+            self.assertEqual(jobs.claim('a').attempts, attempt)
+            with self.assertLogs('apartments.jobs', 'ERROR') if attempt == 2 else nullcontext():
+                requeued = jobs.requeue_stale(datetime.timedelta(0))
+            self.assertEqual(requeued, 2 - attempt)
+
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('failed', 2, ''))
+        self.assertIsNone(jobs.claim('b'))
+
+    def test_backoff_grows(self):
+        self.assertLess(jobs.backoff(1), jobs.backoff(4))
+        self.assertLessEqual(jobs.backoff(50), jobs.BACKOFF_MAX * 1.25)
+
+    def test_unknown_job(self):
+        with self.assertRaises(KeyError):
+            jobs.enqueue('tests.missing')
+
+    def test_run_workers_once(self):
+        jobs.enqueue('tests.flaky', {'fail_times': 0})
+        out = io.StringIO()
+        call_command('run_workers', once=True, stdout=out)
+        self.assertIn('Processed 1 jobs', out.getvalue())
+        self.assertEqual(Job.objects.get().status, 'done')
+
+
+class RealtimeTests(TestCase):
+    def setUp(self):
+        authentication.clear()
+        override = override_settings(REALTIME_PUBSUB_DIR=tempfile.mkdtemp())
+        override.enable()
+        self.addCleanup(override.disable)
+        self.user = User.objects.create_user(username='tester', password='secret-pass')
+
+    def _listener(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.bind(os.path.join(settings.REALTIME_PUBSUB_DIR, 'test.sock'))
+        sock.setblocking(False)
+        self.addCleanup(sock.close)
+
+        def messages():
+            received = []
+            while True:
+                try:
+                    received.append(json.loads(sock.recv(realtime.MAX_MESSAGE_SIZE)))
+                except BlockingIOError:
+                    return received
+        return messages
+
+    def test_application_changes_are_published_after_commit(self):
+        messages = self._listener()
+        with self.captureOnCommitCallbacks(execute=True):
+            application = Application.objects.create(
+                user=self.user, name='Постановка на учет', status='in_progress', creation_date=datetime.date(2025, 1, 1),
+            )
+            self.assertEqual(messages(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            application.status = 'success'
+            application.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            application.delete()
+
+        events = [(m['method'], m['event'], m['room']) for m in messages()]
+        self.assertEqual(events, [('emit', 'application', f'user:{self.user.pk}')] * 2
+                         + [('emit', 'application_deleted', f'user:{self.user.pk}')])
+
+    def test_stale_sockets_are_removed(self):
+        path = os.path.join(settings.REALTIME_PUBSUB_DIR, 'stale.sock')
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.bind(path)
+        messages = self._listener()
+        realtime.emit('application', {'id': 1}, 'user:1')
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(len(messages()), 1)
+
+    async def test_manager_receives_published_messages(self):
+        manager = realtime.LocalPubSubManager()
+        listen = manager._listen()
+        received = asyncio.ensure_future(listen.__anext__())
+        while not os.path.exists(manager._socket_path()):
+            await asyncio.sleep(0.01)
+        realtime.emit('application', {'id': 1}, 'user:1')
+        message = await asyncio.wait_for(received, 5)
+        self.assertEqual((message['event'], message['data']), ('application', {'id': 1}))
+        await listen.aclose()
+        self.assertFalse(os.path.exists(manager._socket_path()))
+
+    async def test_connect_requires_valid_token(self):
+        messages = self._listener()
+        for auth in (None, {'token': 'invalid'}):
+            with self.assertRaises(socketio.exceptions.ConnectionRefusedError):
+                await realtime.connect('sid', {}, auth)
+        token = str(AccessToken.for_user(self.user))
+        await realtime.connect('sid', {}, {'token': token})
+        # Клиент не подключён к этому процессу, поэтому вход в комнату уходит в pub/sub
+        self.assertEqual([(m['method'], m['room']) for m in messages()], [('enter_room', f'user:{self.user.pk}')])
+
+    def test_password_change_revokes_push_subscriptions(self):
+        messages = self._listener()
+        client = APIClient()
+        client.force_authenticate(user=self.user)
+        response = client.post('/api/change-password/', {'old_password': 'secret-pass',
+                                                          'new_password': 'An0ther-secret-pass'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([(m['method'], m.get('event'), m['room']) for m in messages()], [
+            ('emit', 'tokens_revoked', f'user:{self.user.pk}'),
+            ('close_room', None, f'user:{self.user.pk}'),
+        ])
@@ -0,0 +1,461 @@
+"""
+Возобновляемая загрузка файлов по частям.
+
+Протокол (эндпоинты /api/uploads/, см. ResumableUploadViewSet):
+
+1. POST /api/uploads/ {filename, size, checksum} — создаёт UploadSession;
+2. PUT /api/uploads/<id>/chunk/?offset=N — тело запроса (сырые байты)
+   записывается во временный файл с позиции N. N должен совпадать с
+   received сессии, иначе 409 с актуальным received. Тело принимается до
+   блокировки сессии, под блокировкой — только проверка N и запись на диск;
+3. GET /api/uploads/<id>/ — после обрыва связи узнать received и
+   продолжить с этого места;
+4. POST /api/uploads/<id>/finalize/ — проверка размера и SHA-256,
+   перенос файла в uploads/ и создание UploadedFile.
+
+Каждый запрос короткий (не больше UPLOAD_CHUNK_MAX_SIZE), поэтому воркер
+не занят на всё время передачи, а повтор отправляет только недостающие части.
+
+Прямая загрузка (/api/direct-uploads/, DirectUploadViewSet) убирает
+передачу файла из воркеров приложения: сервер выдаёт короткоживущую
+подписанную ссылку хранилища (S3Storage.presigned_put) с размером и
+SHA-256 в подписи, клиент отправляет файл туда сам, а confirm сверяет их
+по метаданным объекта, не скачивая его, и переносит объект на место
+копированием внутри хранилища. Для локального диска ссылкой служит
+PUT /api/direct-uploads/<id>/content/ с подписанным токеном.
+
+Содержимое хранится без дублей: файл лежит один раз по пути из SHA-256
+(FileBlob), а UploadedFile ссылается на него. Если при init у
+пользователя уже есть файл с такой суммой, сессия завершается сразу, без
+передачи данных; чужие загрузки требуют передать файл целиком. Обычная
+multipart-загрузка считает SHA-256 в обработчиках загрузки, пока файл
+принимается (Hashing*UploadHandler, см. FILE_UPLOAD_HANDLERS).
+"""
+import datetime
+import hashlib
+import os
+import posixpath
+import shutil
+import tempfile
+from contextlib import contextmanager, suppress
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, connection, transaction
+from django.db.models import F, Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import FileBlob, UploadedFile, blob_path
+
+READ_SIZE = 64 * 1024
+# Бэкенды, где UPDATE поддерживает RETURNING (SQLite с 3.35, как и для INSERT)
+UPDATE_RETURNING_VENDORS = ('postgresql', 'sqlite')
+TOKEN_SALT = 'apartments.uploads.direct'
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class HashingUploadHandlerMixin:
+    """Считает SHA-256 принимаемого файла и кладёт его в file.sha256."""
+
+    def new_file(self, *args, **kwargs):
+        self.sha256 = hashlib.sha256()
+        return super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadHandlerMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadHandlerMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def temp_dir():
+    return os.path.join(settings.MEDIA_ROOT, getattr(settings, 'UPLOAD_TEMP_DIR', 'uploads/tmp'))
+
+
+def part_path(session):
+    return os.path.join(temp_dir(), f'{session.pk}.part')
+
+
+@contextmanager
+def received_chunk(stream, length):
+    """
+    Принимает до length байт из stream во временный файл и отдаёт
+    (путь, число байт). Чтение из сети идёт до транзакции: медленный клиент
+    не держит блокировку сессии. Если клиент оборвал передачу, сохраняется
+    то, что успело прийти: повтор продолжит с этого места.
+    """
+    os.makedirs(temp_dir(), exist_ok=True)
+    fd, path = tempfile.mkstemp(suffix='.chunk', dir=temp_dir())
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            try:
+                while written < length:
+                    block = stream.read(min(READ_SIZE, length - written))
+                    if not block:
+                        break
+                    f.write(block)
+                    written += len(block)
+            except OSError:
+                # UnreadablePostError: соединение оборвалось посреди части
+                pass
+        yield path, written
+    finally:
+        # write_chunk мог уже перенести файл на место
+        with suppress(FileNotFoundError):
+            os.remove(path)
+
+
+def write_chunk(session, offset, chunk):
+    """
+    Записывает часть, принятую received_chunk, во временный файл сессии с
+    позиции offset и возвращает новое значение received. Вызывается под
+    блокировкой сессии; данные копируются в пределах локального диска.
+    """
+    chunk_path, length = chunk
+    path = part_path(session)
+    if offset == 0:
+        os.replace(chunk_path, path)
+        return length
+    with open(path, 'r+b' if os.path.exists(path) else 'wb') as f, open(chunk_path, 'rb') as source:
+        f.seek(offset)
+        shutil.copyfileobj(source, f, READ_SIZE)
+        # Хвост от предыдущей неудачной попытки больше не нужен
+        f.truncate()
+    return offset + length
+
+
+def stream_checksum(f):
+    digest = hashlib.sha256()
+    for block in iter(lambda: f.read(READ_SIZE), b''):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+def file_checksum(path):
+    with open(path, 'rb') as f:
+        return stream_checksum(f)
+
+
+def _reference_existing(sha256):
+    """
+    Увеличивает ref_count blob'а с данной суммой и возвращает его (с полями
+    file и size) или None, если такого нет. Одна инструкция UPDATE ...
+    RETURNING: запрос и захват ссылки не разделены, блокировка не нужна.
+    """
+    if connection.vendor in UPDATE_RETURNING_VENDORS and connection.features.can_return_columns_from_insert:
+        quote = connection.ops.quote_name
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {quote(FileBlob._meta.db_table)} SET {quote("ref_count")} = {quote("ref_count")} + 1 '
+                f'WHERE {quote("sha256")} = %s RETURNING {quote("file")}, {quote("size")}',
+                [sha256],
+            )
+            row = cursor.fetchone()
+        if row is None:
+            return None
+        return FileBlob.from_db(connection.alias, ['sha256', 'file', 'size'], [sha256, *row])
+    with transaction.atomic():
+        if not FileBlob.objects.filter(pk=sha256).update(ref_count=F('ref_count') + 1):
+            return None
+        return FileBlob.objects.only('sha256', 'file', 'size').get(pk=sha256)
+
+
+def acquire_blob(sha256, size, filename, write):
+    """
+    Возвращает FileBlob с данной суммой, создавая его при необходимости, и
+    уже учитывает в ref_count одну новую ссылку на него: её создаёт
+    вызывающий код (link_blob) или, при ошибке, снимает release_blob.
+    write(name) сохраняет содержимое и возвращает итоговое имя; вызывается
+    только для нового содержимого.
+
+    Счётчик увеличивается раньше, чем появляется ссылка, поэтому
+    gc_file_blobs (удаляет только blob'ы с ref_count=0) не удалит blob в
+    промежутке, и для уже хранящегося содержимого транзакция не нужна.
+    """
+    blob = _reference_existing(sha256)
+    if blob is not None:
+        return blob
+    name = blob_path(sha256, filename)
+    # Файл мог остаться от blob, удалённого до завершения очистки диска
+    if not default_storage.exists(name):
+        name = write(name)
+    try:
+        with transaction.atomic():
+            return FileBlob.objects.create(sha256=sha256, file=name, size=size, ref_count=1)
+    except IntegrityError:
+        # Тот же файл параллельно загрузил кто-то ещё
+        return acquire_blob(sha256, size, filename, write)
+
+
+def link_blob(blob, user=None):
+    """Создаёт UploadedFile со ссылкой на blob, полученный из acquire_blob."""
+    uploaded_file = UploadedFile(file=blob.file.name, blob=blob, user=user)
+    # Ссылка уже учтена, сигнал post_save не увеличивает ref_count повторно
+    uploaded_file.blob_referenced = True
+    uploaded_file.save(force_insert=True)
+    return uploaded_file
+
+
+def save_upload(file, instance=None, user=None):
+    """
+    Сохраняет принятый файл (UploadedFile из request.FILES) без дублей и
+    возвращает UploadedFile: новый (владелец — user) или instance с
+    заменённым содержимым.
+    Для уже хранящегося содержимого это два запроса: захват blob'а и
+    вставка UploadedFile.
+    """
+    sha256 = getattr(file, 'sha256', None)
+    if sha256 is None:
+        sha256 = stream_checksum(file)
+        file.seek(0)
+
+    def write(name):
+        return default_storage.save(name, file)
+
+    blob = acquire_blob(sha256, file.size, file.name, write)
+    if instance is None:
+        try:
+            return link_blob(blob, user)
+        except Exception:
+            release_blob(blob.pk)
+            raise
+    with transaction.atomic():
+        previous_blob_id = instance.blob_id
+        instance.file = blob.file.name
+        instance.blob = blob
+        instance.save()
+        # Прежний blob теряет ссылку; если он тот же, снимается лишняя
+        release_blob(previous_blob_id)
+    return instance
+
+
+def reference_blob(blob_id):
+    FileBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') + 1)
+
+
+def release_blob(blob_id):
+    if blob_id is not None:
+        FileBlob.objects.filter(pk=blob_id).update(ref_count=F('ref_count') - 1, released_at=timezone.now())
+
+
+def _complete(session, blob):
+    uploaded_file = link_blob(blob, session.user)
+    session.received = session.size
+    session.uploaded_file = uploaded_file
+    session.save(update_fields=['received', 'uploaded_file', 'updated_at'])
+    return uploaded_file
+
+
+def complete_if_stored(session):
+    """
+    Если у владельца сессии уже есть файл с такой суммой и размером,
+    завершает сессию без передачи данных и возвращает UploadedFile, иначе
+    None. Чужое содержимое так не связывается: мгновенное завершение
+    сообщило бы, что такой документ хранится на сервере, и дало бы ссылку
+    на него, не требуя самих байт. Анонимные сессии всегда передают файл.
+    """
+    if session.user_id is None:
+        return None
+    owned = UploadedFile.objects.filter(user_id=session.user_id, blob_id=session.checksum, blob__size=session.size)
+    if not owned.exists():
+        return None
+    with transaction.atomic():
+        blob = _reference_existing(session.checksum)
+        if blob is None:
+            return None
+        if blob.size != session.size:
+            transaction.set_rollback(True)
+            return None
+        return _complete(session, blob)
+
+
+def finalize(session):
+    """
+    Проверяет SHA-256 собранного файла и создаёт UploadedFile. При
+    несовпадении временный файл удаляется и загрузку нужно начать заново.
+    """
+    path = part_path(session)
+    if file_checksum(path) != session.checksum:
+        discard(session)
+        raise ChecksumMismatch
+
+    def write(name):
+        try:
+            destination = default_storage.path(name)
+        except NotImplementedError:
+            # Объектное хранилище: большой файл уйдёт multipart-загрузкой
+            with open(path, 'rb') as f:
+                return default_storage.save(name, File(f))
+        # Файл уже лежит на том же диске: переносим его, а не копируем через storage
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.replace(path, destination)
+        return name
+
+    with transaction.atomic():
+        blob = acquire_blob(session.checksum, session.size, session.filename, write)
+        uploaded_file = _complete(session, blob)
+    # Содержимое уже хранилось — временная копия не нужна
+    remove_part(session)
+    return uploaded_file
+
+
+def remove_part(session):
+    try:
+        os.remove(part_path(session))
+    except FileNotFoundError:
+        pass
+
+
+def discard(session):
+    """Удаляет временный файл и сбрасывает прогресс сессии."""
+    remove_part(session)
+    session.received = 0
+    session.save(update_fields=['received', 'updated_at'])
+
+
+def staging_name(session):
+    # Расширение сохраняется, чтобы хранилище выставило верный Content-Type
+    extension = os.path.splitext(session.filename)[1].lower()
+    return posixpath.join(settings.UPLOAD_TEMP_DIR, f'{session.pk}{extension}')
+
+
+def direct_upload_target(session, request):
+    """Куда и как клиент отправляет файл прямой загрузки."""
+    expires = settings.DIRECT_UPLOAD_EXPIRES
+    if hasattr(default_storage, 'presigned_put'):
+        url, headers = default_storage.presigned_put(staging_name(session), expires, session.size, session.checksum)
+    else:
+        token = signing.dumps(str(session.pk), salt=TOKEN_SALT)
+        url = request.build_absolute_uri(reverse('direct-uploads-content', args=[session.pk]))
+        url = f'{url}?{urlencode({"token": token})}'
+        headers = {'Content-Type': 'application/octet-stream'}
+    return {
+        'method': 'PUT',
+        'url': url,
+        'headers': headers,
+        'expires_at': timezone.now() + datetime.timedelta(seconds=expires),
+    }
+
+
+def check_upload_token(session, token):
+    try:
+        value = signing.loads(token, salt=TOKEN_SALT, max_age=settings.DIRECT_UPLOAD_EXPIRES)
+    except signing.BadSignature:
+        return False
+    return value == str(session.pk)
+
+
+def confirm_direct(session):
+    """
+    Проверяет файл, который клиент загрузил сам, и создаёт UploadedFile.
+    FileNotFoundError — файл загружен не полностью; ChecksumMismatch —
+    размер или SHA-256 не совпали, загруженное удаляется.
+    """
+    if not hasattr(default_storage, 'presigned_put'):
+        # Локальный диск: файл уже принят в part-файл сессии
+        if session.received != session.size:
+            raise FileNotFoundError(part_path(session))
+        return finalize(session)
+
+    name = staging_name(session)
+    if not default_storage.exists(name):
+        raise FileNotFoundError(name)
+    # Размер известен из метаданных: объект другого размера не скачивается
+    valid = default_storage.size(name) == session.size
+    if valid:
+        # SHA-256 проверило хранилище (он входит в подпись ссылки); объект
+        # без контрольной суммы приходится прочитать. Чтение идёт через
+        # дисковый кэш S3Storage и заодно прогревает его
+        checksum = default_storage.stored_sha256(name)
+        if checksum is None:
+            with default_storage.open(name) as f:
+                checksum = stream_checksum(f)
+        valid = checksum == session.checksum
+    if not valid:
+        default_storage.delete(name)
+        raise ChecksumMismatch
+
+    with transaction.atomic():
+        blob = acquire_blob(session.checksum, session.size, session.filename,
+                            lambda blob_name: default_storage.move(name, blob_name))
+        uploaded_file = _complete(session, blob)
+    # Такое содержимое уже хранилось — загруженная копия не нужна
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    return uploaded_file
+
+
+def collect_garbage(grace_period):
+    """
+    Удаляет blob'ы без ссылок, освобождённые раньше чем grace_period назад.
+
+    Перед удалением строка блокируется и число ссылок перепроверяется по
+    самим UploadedFile; расхождение в ref_count исправляется, а не ведёт к
+    удалению. Файл удаляется после фиксации транзакции. Возвращает
+    (число удалённых blob'ов, освобождённые байты).
+    """
+    cutoff = timezone.now() - grace_period
+    expired = Q(ref_count=0) & (Q(released_at__lt=cutoff) | Q(released_at__isnull=True, created_at__lt=cutoff))
+    deleted = freed = 0
+    for sha256 in FileBlob.objects.filter(expired).values_list('pk', flat=True).iterator():
+        with transaction.atomic():
+            blob = FileBlob.objects.select_for_update().filter(expired, pk=sha256).first()
+            if blob is None:
+                continue
+            references = blob.uploaded_files.count()
+            if references:
+                FileBlob.objects.filter(pk=sha256).update(ref_count=references)
+                continue
+            blob.delete()
+            names = [blob.file.name, *blob.derivatives.values()]
+            transaction.on_commit(lambda names=names: [default_storage.delete(name) for name in names])
+        deleted += 1
+        freed += blob.size
+    return deleted, freed
+
+
+def adopt_legacy_uploads():
+    """
+    Переводит UploadedFile, загруженные до появления FileBlob, на общее
+    хранение по SHA-256 и удаляет их прежние копии. Возвращает число файлов.
+    """
+    count = 0
+    for uploaded_file in UploadedFile.objects.filter(blob__isnull=True).iterator():
+        old_name = uploaded_file.file.name
+        if not default_storage.exists(old_name):
+            continue
+        with default_storage.open(old_name, 'rb') as f:
+            sha256 = stream_checksum(f)
+
+        def write(name):
+            with default_storage.open(old_name, 'rb') as f:
+                return default_storage.save(name, f)
+
+        with transaction.atomic():
+            blob = acquire_blob(sha256, default_storage.size(old_name), old_name, write)
+            UploadedFile.objects.filter(pk=uploaded_file.pk).update(file=blob.file.name, blob=blob)
+        if old_name != blob.file.name:
+            default_storage.delete(old_name)
+        count += 1
+    return count
@@ -1,18 +1,24 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import ApartmentViewSet, BuilderViewSet, FileUploadViewSet, ApplicationViewSet, login_view, upload_file, \
-    profile_view, change_password_view
+    refresh_token_view, \
+    profile_view, change_password_view, cache_stats_view, ResumableUploadViewSet, \
+    DirectUploadViewSet
 
 router = DefaultRouter()
 router.register(r'apartments', ApartmentViewSet)
 router.register(r'builders', BuilderViewSet)
 router.register(r'files', FileUploadViewSet)
 router.register(r'applications', ApplicationViewSet, basename='applications')
+router.register(r'uploads', ResumableUploadViewSet, basename='uploads')
+router.register(r'direct-uploads', DirectUploadViewSet, basename='direct-uploads')
 
 urlpatterns = [
     path('', include(router.urls)),
     path('login/', login_view, name='login'),
+    path('token/refresh/', refresh_token_view, name='token-refresh'),
     path('upload/', upload_file, name='upload-file'),
     path('profile/', profile_view, name='profile'),
     path('change-password/', change_password_view, name='change-password'),
+    path('cache-stats/', cache_stats_view, name='cache-stats'),
 ]
@@ -1,12 +1,27 @@
-from rest_framework import viewsets, status, parsers
-from rest_framework.decorators import api_view, permission_classes, parser_classes
+from rest_framework import generics, mixins, viewsets, status, parsers
+from rest_framework.decorators import action, api_view, permission_classes, parser_classes
+from rest_framework.generics import get_object_or_404
 from rest_framework.response import Response
-from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import TokenError
+from django.conf import settings
 from django.contrib.auth import authenticate
-from .models import Apartment, Builder, UploadedFile, Application
-from .serializers import ApartmentSerializer, BuilderSerializer, LoginSerializer, FileUploadSerializer, \
-    ApplicationSerializer, UserProfileSerializer, ChangePasswordSerializer
+from django.db import transaction
+from django.http import Http404, StreamingHttpResponse
+from django.db.models import Max, Min, OuterRef, Subquery
+from django_filters.rest_framework import DjangoFilterBackend
+from baspana_project.metrics import LOGIN_REJECTED
+
+from . import asynchronous, authentication, cache, export, media, ratelimit, realtime, uploads
+from .asynchronous import AsyncReadMixin
+from .cache import CachedCatalogMixin
+from .conditional import ConditionalGetMixin
+from .filters import ApartmentFilter
+from .pagination import ApartmentCursorPagination
+from .models import Apartment, ApartmentUnitType, Builder, UploadedFile, UploadSession, Application, UserProfile
+from .serializers import ApartmentSerializer, ApartmentListSerializer, BuilderSerializer, LoginSerializer, FileUploadSerializer, \
+    ApplicationSerializer, UserProfileSerializer, ChangePasswordSerializer, UploadSessionSerializer, DirectUploadSerializer
 
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -14,63 +29,194 @@ def login_view(request):
     """
     Аутентификация пользователя.
     
-    Принимает имя пользователя и пароль, возвращает JWT токен доступа.
+    Принимает имя пользователя и пароль, возвращает короткоживущий JWT токен
+    доступа и refresh-токен для его обновления (/api/token/refresh/).
     """
     serializer = LoginSerializer(data=request.data)
     if serializer.is_valid():
         username = serializer.validated_data.get('username')
         password = serializer.validated_data.get('password')
-        user = authenticate(username=username, password=password)
+        ip = ratelimit.client_ip(request)
+
+        # Отказ до хэширования пароля (см. ratelimit.py)
+        retry_after = ratelimit.login_retry_after(ip, username)
+        if retry_after:
+            LOGIN_REJECTED.labels('rate_limited').inc()
+            return Response({'error': 'Слишком много попыток входа, попробуйте позже'},
+                            status=status.HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': str(retry_after)})
+        with ratelimit.hashing_slot() as acquired:
+            if not acquired:
+                LOGIN_REJECTED.labels('busy').inc()
+                return Response({'error': 'Сервис входа перегружен, попробуйте позже'},
+                                status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+            user = authenticate(username=username, password=password)
         
         if user is not None:
-            refresh = RefreshToken.for_user(user)
+            ratelimit.login_succeeded(ip, username)
+            refresh = authentication.tokens_for_user(user)
             return Response({
                 'access': str(refresh.access_token),
+                'refresh': str(refresh),
             })
+        ratelimit.login_failed(ip, username)
         return Response({'error': 'Неверные учетные данные'}, status=status.HTTP_401_UNAUTHORIZED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+@api_view(['POST'])
+@permission_classes([AllowAny])
+def refresh_token_view(request):
+    """
+    Обновление токена доступа.
+
+    Принимает refresh-токен и возвращает новый access-токен. Токены,
+    отозванные сменой пароля, не принимаются.
+    """
+    try:
+        access = authentication.refresh_access_token(request.data.get('refresh', ''))
+    except (TokenError, AuthenticationFailed):
+        return Response({'error': 'Недействительный refresh-токен'}, status=status.HTTP_401_UNAUTHORIZED)
+    return Response({'access': str(access)})
+
+class ProfileView(AsyncReadMixin, generics.RetrieveAPIView):
+    """
+    Профиль текущего пользователя.
+
+    Профиль загружается вместе с пользователем при аутентификации
+    (см. authentication.py), поэтому обычно ответ не требует запросов к БД.
+    """
+    serializer_class = UserProfileSerializer
+    permission_classes = [IsAuthenticated]  # AllowAny нельзя, иначе request.user — AnonymousUser
+
+    def get_object(self):
+        return self.request.user.profile  # обращаемся к UserProfile через related_name
+
+    async def aget_object(self):
+        profile = authentication.cached_profile(self.request.user)
+        if profile is None:
+            try:
+                profile = await UserProfile.objects.select_related('user').aget(user=self.request.user)
+            except UserProfile.DoesNotExist:
+                raise Http404
+        return profile
+
+    async def aget(self, request, *args, **kwargs):
+        return await self.aretrieve(request, *args, **kwargs)
+
+profile_view = ProfileView.as_view()
+
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])  # AllowAny нельзя, иначе request.user — AnonymousUser
-def profile_view(request):
-    profile = request.user.profile  # обращаемся к UserProfile через related_name
-    serializer = UserProfileSerializer(instance=profile)
-    return Response(serializer.data)
+@permission_classes([IsAdminUser])
+def cache_stats_view(request):
+    """
+    Статистика кэша каталога: число попаданий, промахов и доля попаданий.
+    """
+    return Response(cache.get_stats())
 
-class BuilderViewSet(viewsets.ModelViewSet):
+class BuilderViewSet(ConditionalGetMixin, CachedCatalogMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     API для работы с застройщиками.
     
     Предоставляет операции CRUD для данных застройщиков.
+    Ответы list/retrieve кэшируются до изменения застройщика
+    и поддерживают условные GET-запросы (ETag / Last-Modified).
+    Чтение асинхронное (см. asynchronous.py).
     """
     queryset = Builder.objects.all()
     serializer_class = BuilderSerializer
     permission_classes = [IsAuthenticated]
+    cache_namespaces = ('builders',)
 
-class ApartmentViewSet(viewsets.ModelViewSet):
+def _unit_type_aggregate(aggregate):
+    unit_types = ApartmentUnitType.objects.filter(apartment=OuterRef('pk')).order_by()
+    return Subquery(unit_types.values('apartment').annotate(value=aggregate).values('value'))
+
+class ApartmentViewSet(ConditionalGetMixin, CachedCatalogMixin, AsyncReadMixin, viewsets.ModelViewSet):
     """
     API для работы с квартирами.
     
     Предоставляет операции CRUD для данных о квартирах.
+    Список отдаётся постранично (курсорная пагинация) и поддерживает
+    фильтры по индексированным полям, см. ApartmentFilter.
+    Ответы list/retrieve кэшируются до изменения квартиры или застройщика
+    и поддерживают условные GET-запросы (ETag / Last-Modified).
+    Чтение асинхронное (см. asynchronous.py).
+
+    Список по умолчанию отдаёт компактное представление (ApartmentListSerializer),
+    детальная карточка — полное. Набор полей меняется через ?fields= и ?expand=.
     """
-    queryset = Apartment.objects.all()
+    queryset = Apartment.objects.select_related('builder')
     serializer_class = ApartmentSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = ApartmentCursorPagination
+    filter_backends = [DjangoFilterBackend]
+    filterset_class = ApartmentFilter
+    cache_namespaces = ('apartments', 'builders')
+    last_modified_fields = ('updated_at', 'builder__updated_at')
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_catalog(self, request):
+        """
+        Потоковая выгрузка каталога.
+
+        ?output=csv|ndjson (по умолчанию ndjson), ?flatten=1 — отдельная строка
+        на каждый тип квартиры. Поддерживает те же фильтры, что и список.
+        """
+        output_format = request.query_params.get('output', 'ndjson')
+        if output_format not in export.FORMATS:
+            return Response({'output': [f'Допустимые значения: {", ".join(export.FORMATS)}.']},
+                            status=status.HTTP_400_BAD_REQUEST)
+        flatten = request.query_params.get('flatten') in ('1', 'true')
+        rows = export.iter_export(self.filter_queryset(self.get_queryset()), output_format, flatten)
+        response = StreamingHttpResponse(asynchronous.streaming_content(request, rows),
+                                         content_type=export.CONTENT_TYPES[output_format])
+        response['Content-Disposition'] = f'attachment; filename="apartments.{output_format}"'
+        return response
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return ApartmentListSerializer
+        return ApartmentSerializer
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = queryset.annotate(
+                min_price=_unit_type_aggregate(Min('min_price')),
+                max_price=_unit_type_aggregate(Max('max_price')),
+                min_cost_per_square_meter=_unit_type_aggregate(Min('cost_per_square_meter')),
+            )
+        return queryset
 
 class FileUploadViewSet(viewsets.ModelViewSet):
     """
     API для работы с загруженными файлами.
     
-    Предоставляет операции CRUD для загруженных файлов.
+    Предоставляет операции CRUD для загруженных файлов. Пользователь видит
+    только свои файлы, сотрудники — все (документы заявок). Файлы,
+    загруженные без входа, владельца не имеют и через API недоступны.
     """
-    queryset = UploadedFile.objects.all()
+    queryset = UploadedFile.objects.select_related('blob')
     serializer_class = FileUploadSerializer
     parser_classes = [parsers.MultiPartParser, parsers.FormParser]
     permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.request.user.is_staff:
+            return queryset
+        return queryset.filter(user=self.request.user)
     
     def get_serializer_context(self):
         context = super().get_serializer_context()
         return context
+
+    @action(detail=True, methods=['get'], content_negotiation_class=media.IgnoreClientContentNegotiation)
+    def download(self, request, pk=None):
+        """
+        Содержимое файла с поддержкой Range (см. media.py).
+        ?variant=thumbnail|medium|webp — производная изображения.
+        """
+        return media.serve(request, self.get_object(), request.query_params.get('variant'))
     
 @api_view(['POST'])
 @permission_classes([AllowAny])
@@ -81,6 +227,7 @@ def upload_file(request):
     
     Загружает файл на сервер и возвращает URL и путь к файлу на сервере.
     Для загрузки используйте multipart/form-data с полем 'file'.
+    Большие файлы лучше загружать по частям через /api/uploads/.
     """
     if 'file' not in request.FILES:
         return Response({'error': 'Файл не был отправлен'}, status=status.HTTP_400_BAD_REQUEST)
@@ -94,12 +241,156 @@ def upload_file(request):
         }, status=status.HTTP_201_CREATED)
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-class ApplicationViewSet(viewsets.ModelViewSet):
+class ResumableUploadViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    """
+    Возобновляемая загрузка файла по частям: init / PUT chunk / finalize.
+
+    Протокол описан в uploads.py. Как и upload_file, доступна без входа;
+    сессия авторизованного пользователя видна только ему.
+    """
+    serializer_class = UploadSessionSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self):
+        queryset = UploadSession.objects.filter(uploaded_file__isnull=True)
+        if self.request.user.is_authenticated:
+            return queryset.filter(user=self.request.user)
+        return queryset.filter(user__isnull=True)
+
+    def perform_create(self, serializer):
+        user = self.request.user
+        session = serializer.save(user=user if user.is_authenticated else None)
+        # Такое содержимое уже хранится: передавать файл не нужно
+        uploads.complete_if_stored(session)
+
+    @action(detail=True, methods=['put'])
+    def chunk(self, request, pk=None):
+        try:
+            offset = int(request.query_params['offset'])
+        except (KeyError, ValueError):
+            return Response({'error': 'Укажите ?offset='}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return Response({'error': 'Некорректный Content-Length'}, status=status.HTTP_400_BAD_REQUEST)
+        if length > settings.UPLOAD_CHUNK_MAX_SIZE:
+            return Response({'error': f'Часть больше {settings.UPLOAD_CHUNK_MAX_SIZE} байт'},
+                            status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+
+        session = get_object_or_404(self.get_queryset(), pk=pk)
+        if offset != session.received:
+            return Response({'error': 'Неверное смещение', 'received': session.received},
+                            status=status.HTTP_409_CONFLICT)
+        if offset + length > session.size:
+            return Response({'error': 'Часть выходит за размер файла'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Тело читается из сети без блокировки: медленный клиент не держит запись в БД
+        with uploads.received_chunk(request.stream, length) as chunk, transaction.atomic():
+            # Блокировка строки: две параллельные попытки не пишут одну часть
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if offset != session.received:
+                return Response({'error': 'Неверное смещение', 'received': session.received},
+                                status=status.HTTP_409_CONFLICT)
+            session.received = uploads.write_chunk(session, offset, chunk)
+            session.save(update_fields=['received', 'updated_at'])
+        return Response({'received': session.received})
+
+    @action(detail=True, methods=['post'])
+    def finalize(self, request, pk=None):
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            if session.received != session.size:
+                return Response({'error': 'Файл загружен не полностью', 'received': session.received},
+                                status=status.HTTP_409_CONFLICT)
+            try:
+                file_obj = uploads.finalize(session)
+            except uploads.ChecksumMismatch:
+                return Response({'error': 'Контрольная сумма не совпадает, загрузите файл заново', 'received': 0},
+                                status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'id': file_obj.pk,
+            'file_url': request.build_absolute_uri(file_obj.file.url),
+            'path': file_obj.file.name
+        }, status=status.HTTP_201_CREATED)
+
+class DirectUploadViewSet(mixins.CreateModelMixin, viewsets.GenericViewSet):
+    """
+    Прямая загрузка файла в хранилище, минуя воркеры приложения.
+
+    POST /api/direct-uploads/ {filename, size, checksum} возвращает upload —
+    подписанную ссылку, по которой клиент отправляет файл (PUT, заголовки из
+    upload.headers, без Authorization). Затем POST confirm/ {application}
+    проверяет файл, создаёт UploadedFile и привязывает его к заявке.
+    """
+    serializer_class = DirectUploadSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadSession.objects.filter(direct=True, uploaded_file__isnull=True, user=self.request.user)
+
+    def perform_create(self, serializer):
+        session = serializer.save(user=self.request.user, direct=True)
+        uploads.complete_if_stored(session)
+
+    @action(detail=True, methods=['put'], permission_classes=[AllowAny], authentication_classes=[])
+    def content(self, request, pk=None):
+        """Приём файла по подписанному токену, если хранилище — локальный диск."""
+        sessions = UploadSession.objects.filter(direct=True, uploaded_file__isnull=True)
+        session = get_object_or_404(sessions, pk=pk)
+        if not uploads.check_upload_token(session, request.query_params.get('token', '')):
+            return Response({'error': 'Ссылка недействительна или устарела'}, status=status.HTTP_403_FORBIDDEN)
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = -1
+        if length < 0:
+            return Response({'error': 'Некорректный Content-Length'}, status=status.HTTP_400_BAD_REQUEST)
+        if length != session.size:
+            return Response({'error': f'Ожидается {session.size} байт'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Как и в chunk, файл принимается до блокировки сессии
+        with uploads.received_chunk(request.stream, length) as chunk, transaction.atomic():
+            session = get_object_or_404(sessions.select_for_update(), pk=pk)
+            session.received = uploads.write_chunk(session, 0, chunk)
+            session.save(update_fields=['received', 'updated_at'])
+        return Response({'received': session.received})
+
+    @action(detail=True, methods=['post'])
+    def confirm(self, request, pk=None):
+        application = None
+        if request.data.get('application'):
+            application = get_object_or_404(Application.objects.filter(user=request.user),
+                                            pk=request.data['application'])
+        with transaction.atomic():
+            session = get_object_or_404(self.get_queryset().select_for_update(), pk=pk)
+            try:
+                file_obj = uploads.confirm_direct(session)
+            except FileNotFoundError:
+                return Response({'error': 'Файл не загружен полностью'}, status=status.HTTP_409_CONFLICT)
+            except uploads.ChecksumMismatch:
+                return Response({'error': 'Размер или контрольная сумма не совпадают, загрузите файл заново'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            if application is not None:
+                application.document = file_obj
+                application.save(update_fields=['document'])
+        return Response({
+            'id': file_obj.pk,
+            'file_url': request.build_absolute_uri(file_obj.file.url),
+            'path': file_obj.file.name,
+            'application': application.pk if application else None,
+        }, status=status.HTTP_201_CREATED)
+
+class ApplicationViewSet(AsyncReadMixin, viewsets.ModelViewSet):
+    """
+    Заявки текущего пользователя. Чтение асинхронное (см. asynchronous.py).
+    """
     serializer_class = ApplicationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Application.objects.filter(user=self.request.user)
+        return Application.objects.filter(user=self.request.user).select_related('user')
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
@@ -116,7 +407,15 @@ def change_password_view(request):
 
         user.set_password(serializer.validated_data['new_password'])
         user.save()
+        # Старые токены (в том числе на других устройствах) больше не действуют
+        authentication.revoke_tokens(user)
+        realtime.tokens_revoked(user.pk)
+        refresh = authentication.tokens_for_user(user)
 
-        return Response({'detail': 'Пароль успешно изменён.'}, status=status.HTTP_200_OK)
+        return Response({
+            'detail': 'Пароль успешно изменён.',
+            'access': str(refresh.access_token),
+            'refresh': str(refresh),
+        }, status=status.HTTP_200_OK)
 
     return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
\ No newline at end of file
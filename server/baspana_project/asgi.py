@@ -2,6 +2,8 @@
 ASGI config for baspana_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests to /socket.io/ are served by the Socket.IO server from
+apartments.realtime, everything else by Django.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +15,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'baspana_project.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Импорт после настройки Django: модуль использует модели и настройки
+from apartments import realtime  # noqa: E402
+
+application = realtime.asgi_app(django_application)
@@ -0,0 +1,154 @@
+"""
+Метрики Prometheus и эндпоинт /metrics.
+
+MetricsMiddleware считает запросы и их длительность по DRF view/action
+(ApartmentViewSet.list, login_view, ...), число SQL-запросов и время БД на
+запрос. Попадания в кэш каталога и объём загруженных файлов считаются в
+apartments (cache.record, signals.py).
+
+Под gunicorn каждый воркер — отдельный процесс. Если задана переменная
+окружения PROMETHEUS_MULTIPROC_DIR, prometheus_client пишет значения в
+mmap-файлы этого каталога, а /metrics суммирует файлы всех воркеров.
+Каталог очищается при старте и убранные воркеры помечаются хуками
+из gunicorn.conf.py.
+"""
+import os
+import socket
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest,
+)
+from prometheus_client import multiprocess
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UPLOAD_SIZE_BUCKETS = (1024, 16 * 1024, 256 * 1024, 1024 ** 2, 10 * 1024 ** 2, 100 * 1024 ** 2)
+
+REQUESTS = Counter(
+    'baspana_http_requests_total', 'HTTP requests by view and response status',
+    ['view', 'method', 'status'],
+)
+REQUEST_LATENCY = Histogram(
+    'baspana_http_request_duration_seconds', 'Request latency by view',
+    ['view', 'method'], buckets=LATENCY_BUCKETS,
+)
+DB_QUERIES = Histogram(
+    'baspana_db_queries_per_request', 'SQL queries executed per request',
+    ['view'], buckets=QUERY_COUNT_BUCKETS,
+)
+DB_LATENCY = Histogram(
+    'baspana_db_duration_seconds', 'Time spent in the database per request',
+    ['view'], buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    'baspana_catalog_cache_requests_total', 'Catalog response cache lookups by outcome (hits/misses)',
+    ['outcome'],
+)
+UPLOAD_BYTES = Counter('baspana_upload_bytes_total', 'Bytes of uploaded files')
+UPLOAD_SIZE = Histogram('baspana_upload_size_bytes', 'Size of uploaded files', buckets=UPLOAD_SIZE_BUCKETS)
+LOGIN_REJECTED = Counter(
+    'baspana_login_rejected_total', 'Login attempts rejected before password hashing',
+    ['reason'],
+)
+WORKER_STARTED = Gauge(
+    'baspana_worker_start_time_seconds', 'Start time of a live worker process',
+    ['hostname'], multiprocess_mode='liveall',
+)
+
+
+def view_name(request):
+    """
+    Имя view для меток: ViewSet.action для ViewSet'ов, имя функции для
+    @api_view, имя маршрута (с пространством имён, 'admin:index') для
+    остальных view и 'unmatched' для 404.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    view_class = getattr(match.func, 'cls', None)
+    if view_class is None:
+        # У маршрута без name Django подставляет путь к функции
+        return match.view_name
+    actions = getattr(match.func, 'actions', None)
+    if actions:
+        return f'{view_class.__name__}.{actions.get(request.method.lower(), request.method.lower())}'
+    return view_class.__name__
+
+
+class _QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """
+    Отключается настройкой METRICS_ENABLED = False.
+    Работает и в синхронной, и в асинхронной цепочке (ASGI).
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        # В multiprocess-режиме prometheus_client сам добавляет метку pid воркера
+        WORKER_STARTED.labels(socket.gethostname()).set(time.time())
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        return self._observe(request, response, counter, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        counter = _QueryCounter()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = await self.get_response(request)
+        return self._observe(request, response, counter, time.perf_counter() - started)
+
+    def _observe(self, request, response, counter, duration):
+        view = view_name(request)
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        REQUEST_LATENCY.labels(view, request.method).observe(duration)
+        DB_QUERIES.labels(view).observe(counter.count)
+        DB_LATENCY.labels(view).observe(counter.duration)
+        return response
+
+
+def get_registry():
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def metrics_view(request):
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
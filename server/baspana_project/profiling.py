@@ -0,0 +1,212 @@
+"""
+Профилирование запросов (включается PROFILING_ENABLED=1).
+
+Для каждого запроса замеряются общее время, время и число SQL-запросов,
+повторяющиеся запросы, время сериализации DRF и размер ответа. Результат
+отдаётся в заголовке Server-Timing (виден во вкладке Network браузера) и
+пишется одной JSON-строкой в лог baspana_project.profiling.
+
+Доля PROFILING_SAMPLE_RATE запросов дополнительно выполняется под cProfile,
+дампы сохраняются в PROFILING_DIR (открываются snakeviz или pstats).
+"""
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_current = contextvars.ContextVar('request_profile', default=None)
+
+
+class RequestProfile:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = []
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries.append((sql, repr(params)))
+
+    def duplicates(self):
+        """
+        Возвращает (число точных повторов, число запросов, отличающихся
+        только параметрами, самый частый такой запрос). Второе — признак N+1.
+        """
+        exact = Counter(self.queries)
+        similar = Counter(sql for sql, _ in self.queries)
+        duplicate_count = sum(count - 1 for count in exact.values())
+        similar_count = sum(count - 1 for count in similar.values())
+        top_sql, top_count = similar.most_common(1)[0] if similar else (None, 0)
+        return duplicate_count, similar_count, top_sql if top_count > 1 else None
+
+
+def _timed_data(data_property):
+    def data(serializer):
+        profile = _current.get()
+        if profile is None:
+            return data_property.fget(serializer)
+        # Вложенные сериализаторы и super().data не считаются дважды
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data_property.fget(serializer)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_time += time.perf_counter() - started
+
+    data._profiling = True
+    return property(data)
+
+
+def instrument_serializers():
+    """Оборачивает Serializer.data и ListSerializer.data замером времени."""
+    from rest_framework import serializers
+
+    for cls in (serializers.BaseSerializer, serializers.Serializer, serializers.ListSerializer):
+        data_property = cls.__dict__.get('data')
+        if data_property is not None and not getattr(data_property.fget, '_profiling', False):
+            cls.data = _timed_data(data_property)
+
+
+def _response_size(response):
+    if getattr(response, 'streaming', False):
+        return None
+    return len(response.content)
+
+
+def _dump_name(request):
+    path = re.sub(r'[^\w-]+', '_', request.path).strip('_') or 'root'
+    return f'{time.strftime("%Y%m%d-%H%M%S")}-{request.method}-{path}-{uuid.uuid4().hex[:8]}.prof'
+
+
+class ProfilingMiddleware:
+    """
+    Ставится первым в MIDDLEWARE, чтобы замер охватывал весь запрос.
+    При выключенном PROFILING_ENABLED Django не подключает её вовсе.
+    Под ASGI cProfile захватывает и другие запросы, выполнявшиеся в это
+    время в том же цикле событий.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PROFILING_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.dump_dir = getattr(settings, 'PROFILING_DIR', None)
+        instrument_serializers()
+
+    def _profiler(self):
+        if self.dump_dir and self.sample_rate and random.random() < self.sample_rate:
+            return cProfile.Profile()
+        return None
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self._profiler()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, profiler, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = self._profiler()
+
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                if profiler:
+                    profiler.enable()
+                try:
+                    response = await self.get_response(request)
+                finally:
+                    if profiler:
+                        profiler.disable()
+        finally:
+            _current.reset(token)
+        return self._finish(request, response, profile, profiler, time.perf_counter() - started)
+
+    def _finish(self, request, response, profile, profiler, total):
+        dump = self._dump(profiler, request) if profiler else None
+        self._report(request, response, profile, total, dump)
+        return response
+
+    def _dump(self, profiler, request):
+        os.makedirs(self.dump_dir, exist_ok=True)
+        path = os.path.join(self.dump_dir, _dump_name(request))
+        profiler.dump_stats(path)
+        return path
+
+    def _report(self, request, response, profile, total, dump):
+        duplicate_count, similar_count, top_similar = profile.duplicates()
+        size = _response_size(response)
+
+        timings = [
+            f'total;dur={total * 1000:.1f}',
+            f'db;dur={profile.db_time * 1000:.1f};desc="{len(profile.queries)} queries, '
+            f'{duplicate_count} duplicate"',
+            f'serialize;dur={profile.serializer_time * 1000:.1f}',
+        ]
+        if size is not None:
+            timings.append(f'response;desc="{size} bytes"')
+        response.headers['Server-Timing'] = ', '.join(timings)
+
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            'db_ms': round(profile.db_time * 1000, 2),
+            'queries': len(profile.queries),
+            'duplicate_queries': duplicate_count,
+            'similar_queries': similar_count,
+            'serialize_ms': round(profile.serializer_time * 1000, 2),
+            'response_bytes': size,
+        }
+        if top_similar:
+            record['top_similar_sql'] = top_similar[:300]
+        if dump:
+            record['profile'] = dump
+        logger.info(json.dumps(record, ensure_ascii=False), extra={'profile': record})
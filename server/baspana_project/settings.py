@@ -1,4 +1,5 @@
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -26,6 +27,7 @@ INSTALLED_APPS = [
     # Third party apps
     'rest_framework',
     'rest_framework_simplejwt',
+    'django_filters',
     'drf_yasg',
     'corsheaders',
     # Local apps
@@ -33,8 +35,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'baspana_project.profiling.ProfilingMiddleware',
+    'baspana_project.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'baspana_project.static.WhiteNoiseMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -68,10 +72,76 @@ WSGI_APPLICATION = 'baspana_project.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        # Общий файл для сервера и воркеров очереди (см. docker-compose.yml)
+        'NAME': os.environ.get('SQLITE_PATH', BASE_DIR / 'db.sqlite3'),
     }
 }
 
+# Cache
+# Каталог (квартиры, застройщики) кэшируется в отдельном алиасе. По умолчанию
+# ответы лежат в памяти каждого процесса, а номера версий для инвалидации — в
+# общем для воркеров файловом кэше CATALOG_VERSION_CACHE_ALIAS. Для нескольких
+# хостов оба алиаса направьте в общий бэкенд, например
+# CATALOG_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        'BACKEND': os.environ.get('CATALOG_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', 'catalog'),
+        'TIMEOUT': int(os.environ.get('CATALOG_CACHE_TIMEOUT', 300)),
+    },
+    # Номера версий каталога (apartments/cache.py): после записи в одном
+    # воркере остальные должны перестать отдавать свои закэшированные ответы
+    'catalog_versions': {
+        'BACKEND': os.environ.get('CATALOG_VERSION_CACHE_BACKEND',
+                                  'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('CATALOG_VERSION_CACHE_LOCATION',
+                                   os.path.join(tempfile.gettempdir(), 'baspana-catalog-versions')),
+        'TIMEOUT': None,
+    },
+    # Эпоха отзыва JWT (apartments/authentication.py) должна быть общей для
+    # всех воркеров, поэтому по умолчанию — файловый кэш, а не память процесса
+    'auth': {
+        'BACKEND': os.environ.get('AUTH_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('AUTH_CACHE_LOCATION', os.path.join(tempfile.gettempdir(), 'baspana-auth')),
+        'TIMEOUT': None,
+    },
+    # Счётчики неудачных входов (apartments/ratelimit.py): в памяти процесса
+    # каждый воркер считал бы попытки сам и лимит умножался бы на их число
+    'ratelimit': {
+        'BACKEND': os.environ.get('LOGIN_RATE_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.environ.get('LOGIN_RATE_CACHE_LOCATION',
+                                   os.path.join(tempfile.gettempdir(), 'baspana-ratelimit')),
+    },
+}
+
+CATALOG_CACHE_ALIAS = 'catalog'
+CATALOG_VERSION_CACHE_ALIAS = 'catalog_versions'
+
+# Profiling
+# Server-Timing и JSON-строка в лог для каждого запроса (см. profiling.py),
+# плюс дамп cProfile для доли запросов PROFILING_SAMPLE_RATE (0..1).
+PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED') == '1'
+PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(BASE_DIR, 'profiles'))
+
+# Метрики Prometheus на /metrics (см. metrics.py). Под gunicorn задайте
+# PROMETHEUS_MULTIPROC_DIR, чтобы значения суммировались по всем воркерам.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'baspana_project.profiling': {'handlers': ['console'], 'level': 'INFO', 'propagate': False},
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -100,15 +170,68 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 # Media files (Uploaded files)
 MEDIA_URL = '/media/'
-MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_ROOT = os.environ.get('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
+# Хранилище загруженных файлов (apartments/storage.py): local — MEDIA_ROOT,
+# s3 — S3-совместимое объектное хранилище (AWS S3, MinIO) с multipart-загрузкой
+# и локальным дисковым кэшем чтения S3_CACHE_DIR размером до S3_CACHE_MAX_SIZE
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+if STORAGE_BACKEND == 's3':
+    STORAGES['default'] = {
+        'BACKEND': 'apartments.storage.S3Storage',
+        'OPTIONS': {
+            'bucket': os.environ['S3_BUCKET'],
+            'endpoint_url': os.environ.get('S3_ENDPOINT_URL') or None,
+            'region_name': os.environ.get('S3_REGION') or None,
+            'access_key': os.environ.get('S3_ACCESS_KEY') or None,
+            'secret_key': os.environ.get('S3_SECRET_KEY') or None,
+            'location': os.environ.get('S3_LOCATION', ''),
+            'max_concurrency': int(os.environ.get('S3_MAX_CONCURRENCY', 4)),
+            'cache_dir': os.environ.get('S3_CACHE_DIR', os.path.join(BASE_DIR, 'storage-cache')),
+            'cache_max_size': int(os.environ.get('S3_CACHE_MAX_SIZE', 1024 * 1024 * 1024)),
+        },
+    }
+
+# Отдача файлов через /api/files/<id>/download/ (apartments/media.py).
+# MEDIA_SENDFILE=nginx — байты отдаёт nginx по X-Accel-Redirect из internal-
+# локации MEDIA_SENDFILE_PREFIX (alias на MEDIA_ROOT), apache — по X-Sendfile,
+# redirect — переадресация на ссылку хранилища (для s3). Пусто — файл читает
+# сам Django
+MEDIA_SENDFILE = os.environ.get('MEDIA_SENDFILE', '')
+MEDIA_SENDFILE_PREFIX = os.environ.get('MEDIA_SENDFILE_PREFIX', '/protected-media/')
+
+# Возобновляемая загрузка (apartments/uploads.py): предел файла и одной части,
+# каталог незавершённых загрузок относительно MEDIA_ROOT
+UPLOAD_MAX_SIZE = 100 * 1024 * 1024
+UPLOAD_CHUNK_MAX_SIZE = 8 * 1024 * 1024
+UPLOAD_TEMP_DIR = 'uploads/tmp'
+# Срок действия подписанной ссылки прямой загрузки, секунд
+DIRECT_UPLOAD_EXPIRES = 15 * 60
+
+# SHA-256 считается, пока файл принимается: по нему файлы хранятся без дублей
+FILE_UPLOAD_HANDLERS = [
+    'apartments.uploads.HashingMemoryFileUploadHandler',
+    'apartments.uploads.HashingTemporaryFileUploadHandler',
+]
+
+# Очередь фоновых задач (apartments/jobs.py, manage.py run_workers):
+# задача, выполняющаяся дольше JOB_TIMEOUT секунд, считается брошенной
+JOB_TIMEOUT = 600
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Вход загружает пользователя вместе с профилем (apartments/authentication.py)
+AUTHENTICATION_BACKENDS = ['apartments.authentication.ProfileModelBackend']
+
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'apartments.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -118,6 +241,42 @@ REST_FRAMEWORK = {
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_CREDENTIALS = True
 
+# Кэш JWT-аутентификации (apartments/authentication.py): проверенные токены и
+# пользователи с профилем хранятся в памяти процесса, не больше
+# JWT_AUTH_CACHE_SIZE записей и не дольше JWT_AUTH_CACHE_TTL секунд
+JWT_AUTH_CACHE_SIZE = int(os.environ.get('JWT_AUTH_CACHE_SIZE', 10000))
+JWT_AUTH_CACHE_TTL = int(os.environ.get('JWT_AUTH_CACHE_TTL', 60))
+
+# Защита входа (apartments/ratelimit.py): неудачные попытки считаются в
+# скользящем окне LOGIN_RATE_WINDOW секунд по IP и по имени пользователя в кэше
+# LOGIN_RATE_CACHE_ALIAS (файловый кэш хоста; для нескольких узлов укажите
+# общий бэкенд). LOGIN_HASH_SLOTS > 0 ограничивает число одновременных
+# проверок пароля на хосте; ждущие дольше LOGIN_HASH_WAIT секунд получают 503
+LOGIN_RATE_CACHE_ALIAS = os.environ.get('LOGIN_RATE_CACHE_ALIAS', 'ratelimit')
+LOGIN_RATE_WINDOW = int(os.environ.get('LOGIN_RATE_WINDOW', 300))
+LOGIN_RATE_LIMIT_PER_IP = int(os.environ.get('LOGIN_RATE_LIMIT_PER_IP', 30))
+LOGIN_RATE_LIMIT_PER_USERNAME = int(os.environ.get('LOGIN_RATE_LIMIT_PER_USERNAME', 5))
+LOGIN_HASH_SLOTS = int(os.environ.get('LOGIN_HASH_SLOTS', 0))
+LOGIN_HASH_WAIT = float(os.environ.get('LOGIN_HASH_WAIT', 1))
+LOGIN_HASH_LOCK_DIR = os.environ.get('LOGIN_HASH_LOCK_DIR', os.path.join(tempfile.gettempdir(), 'baspana-login'))
+# Число обратных прокси (nginx, балансировщик) перед приложением: адрес клиента
+# для лимитов берётся из X-Forwarded-For, который они заполняют. 0 — прокси
+# нет и REMOTE_ADDR уже адрес клиента; больше реального числа ставить нельзя,
+# иначе клиент подставит адрес в заголовок сам
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))
+
+# Push-уведомления о заявках (apartments/realtime.py): процессы одного хоста
+# обмениваются событиями через unix-сокеты в каталоге REALTIME_PUBSUB_DIR
+REALTIME_PUBSUB_DIR = os.environ.get('REALTIME_PUBSUB_DIR', os.path.join(tempfile.gettempdir(), 'baspana-pubsub'))
+
+# Access-токены короткие, refresh-токен обновляет их через /api/token/refresh/.
+# Эпоха отзыва токенов хранится в кэше AUTH_CACHE_ALIAS (для нескольких хостов
+# укажите Redis/Memcached) и сверяется каждым процессом не чаще раза в
+# AUTH_REVOCATION_SYNC_INTERVAL секунд
+AUTH_CACHE_ALIAS = 'auth'
+AUTH_REVOCATION_SYNC_INTERVAL = float(os.environ.get('AUTH_REVOCATION_SYNC_INTERVAL', 1))
+
 SIMPLE_JWT = {
-    'ACCESS_TOKEN_LIFETIME': timedelta(days=365),
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=int(os.environ.get('ACCESS_TOKEN_LIFETIME_MINUTES', 15))),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=int(os.environ.get('REFRESH_TOKEN_LIFETIME_DAYS', 14))),
 }
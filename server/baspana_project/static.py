@@ -0,0 +1,38 @@
+"""
+WhiteNoise, который не переводит асинхронную цепочку middleware в синхронную.
+
+WhiteNoiseMiddleware умеет только синхронный режим: под ASGI Django обернул
+бы им каждый запрос в sync_to_async, и даже асинхронные view занимали бы
+поток и переключались между ним и циклом событий. Здесь статика
+по-прежнему отдаётся синхронным кодом WhiteNoise (в пуле потоков), а
+остальные запросы передаются дальше без переключений.
+"""
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise import middleware
+
+
+class WhiteNoiseMiddleware(middleware.WhiteNoiseMiddleware):
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def _static_file(self, request):
+        if self.autorefresh:
+            return self.find_file(request.path_info)
+        return self.files.get(request.path_info)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        static_file = self._static_file(request)
+        if static_file is not None:
+            # serve() читает файл с диска
+            return await sync_to_async(self.serve, thread_sensitive=False)(static_file, request)
+        return await self.get_response(request)
@@ -0,0 +1,44 @@
+"""
+Настройки gunicorn (подхватываются автоматически из рабочего каталога).
+
+Воркеры пишут метрики в общий каталог PROMETHEUS_MULTIPROC_DIR
+(см. baspana_project/metrics.py). Переменная задаётся здесь, а не в
+окружении контейнера, чтобы manage.py и тесты работали в обычном режиме.
+Каталог очищается при старте мастера, а gauge'и завершившегося воркера
+помечаются как мёртвые.
+
+SERVER_MODE выбирает режим обслуживания:
+- asgi (по умолчанию в Dockerfile) — uvicorn-воркеры с baspana_project.asgi.
+  Каждый воркер — цикл событий, который держит тысячи соединений; GET
+  каталога, застройщиков, профиля и заявок выполняются асинхронно
+  (apartments/asynchronous.py), остальные view — в потоке Django;
+- wsgi — синхронные воркеры gunicorn, по одному запросу на процесс.
+"""
+import os
+import shutil
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+if os.environ.get('SERVER_MODE', 'wsgi') == 'asgi':
+    wsgi_app = 'baspana_project.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # Медленные клиенты держат соединение, а не воркер; keep-alive экономит
+    # TCP/TLS-рукопожатия при частых запросах одного клиента
+    keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+else:
+    wsgi_app = 'baspana_project.wsgi:application'
+
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/baspana-metrics')
+
+
+def on_starting(server):
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)